@@ -0,0 +1,152 @@
+# async_database.py
+# Асинхронная обертка над database.py для обработчиков python-telegram-bot 20.
+# Вся работа с sqlite выполняется в отдельных потоках, поэтому event loop
+# не блокируется на диске: записи идут через поток-писатель своего мастера
+# (порядок сохраняется, нет конкуренции за блокировку, а запись одного салона
+# не стоит в очереди за другим), чтения — через общий небольшой пул
+# (в режиме WAL читатели не мешают писателю).
+#
+# Использование:
+#     import async_database as db
+#     services = await db.get_services()
+#     await db.add_booking(user_id, service, date, time, price)
+#
+# Синхронные функции database.py остаются доступны для скриптов.
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+READER_THREADS = 4
+
+_writers = {}  # мастер -> однопоточный executor
+_writers_lock = threading.Lock()
+_readers = ThreadPoolExecutor(max_workers=READER_THREADS, thread_name_prefix="db-reader")
+# Выгрузки читают всю историю: свой поток, чтобы не занимать пул чтений, и по одной за раз
+_exporter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-export")
+
+
+def _writer():
+    tenant_id = database.current_tenant()
+    writer = _writers.get(tenant_id)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(tenant_id)
+            if writer is None:
+                writer = _writers[tenant_id] = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix=f"db-writer-{tenant_id}")
+    return writer
+
+
+def _run_in(get_executor, func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Контекст (текущий мастер) уходит в поток вместе с вызовом
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        return await loop.run_in_executor(get_executor(), call)
+    return wrapper
+
+
+def _read(func):
+    return _run_in(lambda: _readers, func)
+
+
+def _write(func):
+    return _run_in(_writer, func)
+
+
+def _export(func):
+    return _run_in(lambda: _exporter, func)
+
+
+async def shutdown():
+    """Дождаться выполнения запросов в очереди и закрыть соединения"""
+    loop = asyncio.get_running_loop()
+    for writer in list(_writers.values()):
+        await loop.run_in_executor(None, writer.shutdown, True)
+    await loop.run_in_executor(None, _readers.shutdown, True)
+    await loop.run_in_executor(None, _exporter.shutdown, True)
+    database.close_connections()
+
+
+init_db = _write(database.init_db)
+
+# === Мастер ===
+get_barber = _read(database.get_barber)
+update_barber = _write(database.update_barber)
+get_barber_name = _read(database.get_barber_name)
+
+# === Услуги ===
+add_service = _write(database.add_service)
+delete_service = _write(database.delete_service)
+get_services = _read(database.get_services)
+
+# === Записи ===
+add_booking = _write(database.add_booking)
+get_user_bookings = _read(database.get_user_bookings)
+get_all_bookings = _read(database.get_all_bookings)
+get_user_bookings_page = _read(database.get_user_bookings_page)
+get_all_bookings_page = _read(database.get_all_bookings_page)
+get_booking_by_id_and_user = _read(database.get_booking_by_id_and_user)
+get_booking_by_id = _read(database.get_booking_by_id)
+get_bookings_by_date = _read(database.get_bookings_by_date)
+delete_booking = _write(database.delete_booking)
+
+# === Архив ===
+archive_bookings_batch = _write(database.archive_bookings_batch)
+
+# === Выгрузка записей ===
+export_bookings = _export(database.export_bookings)
+
+# === Сводки и отчеты ===
+rebuild_booking_stats = _write(database.rebuild_booking_stats)
+get_service_summary = _read(database.get_service_summary)
+get_hour_summary = _read(database.get_hour_summary)
+
+# === Время работы ===
+set_working_hours = _write(database.set_working_hours)
+get_working_hours = _read(database.get_working_hours)
+
+# === Закрытые слоты ===
+close_day = _write(database.close_day)
+close_time = _write(database.close_time)
+open_day = _write(database.open_day)
+open_time = _write(database.open_time)
+close_intervals = _write(database.close_intervals)
+open_intervals = _write(database.open_intervals)
+close_range = _write(database.close_range)
+open_range = _write(database.open_range)
+is_closed = _read(database.is_closed)
+get_closed_intervals = _read(database.get_closed_intervals)
+get_closed_intervals_page = _read(database.get_closed_intervals_page)
+
+# === Свободное время ===
+get_free_times = _read(database.get_free_times)
+get_month_availability = _read(database.get_month_availability)
+
+# === Бронирование ===
+book_slot = _write(database.book_slot)
+
+# === Напоминания ===
+get_upcoming_bookings = _read(database.get_upcoming_bookings)
+mark_reminder_sent = _write(database.mark_reminder_sent)
+get_last_booking_id = _read(database.get_last_booking_id)
+get_bookings_after_id = _read(database.get_bookings_after_id)
+
+# === Общие брони времени ===
+hold_slot = _write(database.hold_slot)
+release_slot_hold = _write(database.release_slot_hold)
+get_slot_holds = _read(database.get_slot_holds)
+
+# === Сессии записи ===
+save_sessions = _write(database.save_sessions)
+load_sessions = _write(database.load_sessions)
+
+# === Пользователи ===
+save_user = _write(database.save_user)
+get_user = _read(database.get_user)
+get_user_by_id = _read(database.get_user_by_id)
@@ -0,0 +1,56 @@
+# benchmarks/bench_bulk_slots.py
+# Закрытие периода: по одному слоту через close_time (как админ делал раньше — коммит
+# на каждый слот) против close_range, который пишет весь период одной транзакцией.
+# Запуск: python benchmarks/bench_bulk_slots.py [дней через запятую]
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+tmp_dir = tempfile.mkdtemp(prefix="bench_bulk_slots_")
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+os.environ["METRICS_ENABLED"] = "0"
+
+import database  # noqa: E402
+
+DAYS = [int(x) for x in sys.argv[1].split(",")] if len(sys.argv) > 1 else [7, 30, 90]
+
+
+def reset():
+    conn = database.get_connection()
+    with conn:
+        conn.execute("DELETE FROM closed_intervals")
+    database.invalidate_cache("closed_intervals")
+
+
+def main():
+    database.init_db()
+    work_start, work_end = database.get_working_hours()
+    start_date = date.today() + timedelta(days=1)
+    for days in DAYS:
+        date_to = start_date + timedelta(days=days - 1)
+        dates = database._range_dates(start_date.isoformat(), date_to.isoformat())
+        slots = range(database._to_minutes(work_start), database._to_minutes(work_end), database.TIME_SLOT_MINUTES)
+        rows = [(day, f"{m // 60:02d}:{m % 60:02d}") for day in dates for m in slots]
+
+        reset()
+        started = time.perf_counter()
+        for day, slot in rows:
+            database.close_time(day, slot)
+        single = time.perf_counter() - started
+
+        reset()
+        started = time.perf_counter()
+        added = database.close_range(start_date.isoformat(), date_to.isoformat(),
+                                     start=work_start, end=work_end)
+        bulk = time.perf_counter() - started
+        assert len(added) == len(dates)
+        print(f"дней {days:>3}, слотов {len(rows):>5}: по одному {single * 1000:8.1f} мс, "
+              f"одной транзакцией {bulk * 1000:6.1f} мс (x{single / bulk:.0f})")
+
+
+if __name__ == "__main__":
+    main()
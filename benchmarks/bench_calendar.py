@@ -0,0 +1,43 @@
+# benchmarks/bench_calendar.py
+# Время рендера календаря на месяц: полная сборка разметки и повторное обращение из кэша.
+# Запуск: python benchmarks/bench_calendar.py [повторов]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import calendar_keyboard  # noqa: E402
+
+ROUNDS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+
+def bench(func):
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        func(i)
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+def main():
+    today = calendar_keyboard.local_today()
+    months = [(today.year + (today.month - 1 + k) // 12, (today.month - 1 + k) % 12 + 1) for k in range(12)]
+
+    def uncached(i):
+        year, month = months[i % 12]
+        calendar_keyboard._render.__wrapped__(year, month, today, "user", ())
+
+    def cached(i):
+        year, month = months[i % 12]
+        calendar_keyboard.render_calendar("user", year, month, {})
+
+    before = bench(uncached)
+    after = bench(cached)
+    print(f"сборка с нуля:  {before:8.1f} мкс/месяц")
+    print(f"из кэша:        {after:8.1f} мкс/месяц")
+    print(f"ускорение:      {before / after:8.1f}x")
+    print(calendar_keyboard.cache_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_closed.py
+# Проверка закрытого времени: индекс интервалов в памяти (database.is_closed,
+# get_free_times) против запроса к closed_intervals на каждую проверку.
+# Закрытия — случайные дни и часы на год вперед.
+# Запуск: python benchmarks/bench_closed.py [закрытий через запятую]
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+tmp_dir = tempfile.mkdtemp(prefix="bench_closed_")
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+os.environ["METRICS_ENABLED"] = "0"
+
+import database  # noqa: E402
+
+SIZES = [int(x) for x in sys.argv[1].split(",")] if len(sys.argv) > 1 else [100, 1000, 10_000]
+CHECKS = 20_000
+DAYS = 365
+
+OVERLAP_SQL = """
+    SELECT 1 FROM closed_intervals
+    WHERE date = ? AND start_min < ? AND ? < end_min
+    LIMIT 1
+"""
+
+
+def fill(size, rng):
+    conn = database.get_connection()
+    with conn:
+        conn.execute("DELETE FROM closed_intervals")
+    database.invalidate_cache("closed_intervals")
+    first = date.today()
+    items = []
+    for _ in range(size):
+        day = (first + timedelta(days=rng.randrange(DAYS))).isoformat()
+        if rng.random() < 0.1:
+            items.append((day, 0, database.DAY_MINUTES))
+        else:
+            start = rng.randrange(9, 19) * 60
+            items.append((day, start, start + database.TIME_SLOT_MINUTES))
+    database.close_intervals(items)
+
+
+def per_call_us(func, args):
+    start = time.perf_counter()
+    for item in args:
+        func(*item)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+
+def main():
+    database.init_db()
+    rng = random.Random(1)
+    first = date.today()
+    checks = [((first + timedelta(days=rng.randrange(DAYS))).isoformat(), f"{rng.randrange(9, 19):02d}:00")
+              for _ in range(CHECKS)]
+    conn = database.get_connection()
+
+    def by_sql(day, slot):
+        start = database._to_minutes(slot)
+        return conn.execute(OVERLAP_SQL, (day, start + database.TIME_SLOT_MINUTES, start)).fetchone() is not None
+
+    for size in SIZES:
+        fill(size, rng)
+        rows = conn.execute("SELECT COUNT(*) FROM closed_intervals").fetchone()[0]
+        database.is_closed(*checks[0])  # загрузка индекса
+        index = statistics.median(per_call_us(database.is_closed, checks) for _ in range(3))
+        sql = statistics.median(per_call_us(by_sql, checks) for _ in range(3))
+        assert all(database.is_closed(*item) == by_sql(*item) for item in checks[:2000])
+        start = time.perf_counter()
+        database.invalidate_cache("closed_intervals")
+        database.get_closed_intervals(first.isoformat())
+        reload_ms = (time.perf_counter() - start) * 1000
+        print(f"закрытий {size:>6} (интервалов {rows:>5}): индекс {index:5.2f} мкс, "
+              f"запрос {sql:5.2f} мкс (x{sql / index:.1f}), перестройка индекса {reload_ms:.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_database.py
+# Сравнение ops/sec: старый режим (connect/close на каждый вызов) и долгоживущие соединения.
+# В старом режиме кэш справочников сбрасывается перед каждым вызовом — тогда его еще не было,
+# и get_barber, get_services и т.п. каждый раз шли в базу.
+# Запуск: python benchmarks/bench_database.py [секунд_на_функцию]
+import itertools
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+tmp_dir = tempfile.mkdtemp(prefix="bench_db_")
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+# Один процесс: сброс кэша не пишет эпохи в базу
+os.environ["WORKERS"] = "1"
+
+import database  # noqa: E402
+
+DURATION = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+
+# Одно время — одна запись (уникальный индекс), поэтому каждая запись
+# берет следующий час из общего счетчика: и начальные, и в замерах обоих режимов
+_slots = itertools.count()
+
+
+def next_slot():
+    n = next(_slots)
+    return (date(2031, 1, 1) + timedelta(days=n // 24)).isoformat(), f"{n % 24:02d}:00"
+
+
+CALLS = [
+    ("get_barber", lambda i: database.get_barber()),
+    ("get_barber_name", lambda i: database.get_barber_name()),
+    ("get_services", lambda i: database.get_services()),
+    ("get_working_hours", lambda i: database.get_working_hours()),
+    ("is_closed", lambda i: database.is_closed("2030-01-15", "10:00")),
+    ("get_closed_intervals", lambda i: database.get_closed_intervals("2030-01-16")),
+    ("get_user", lambda i: database.get_user(i % 100)),
+    ("get_user_bookings", lambda i: database.get_user_bookings(i % 100)),
+    ("get_booking_by_id", lambda i: database.get_booking_by_id(i % 100 + 1)),
+    ("save_user", lambda i: database.save_user(i % 100, "Иван", "+70000000000")),
+    ("add_booking", lambda i: database.add_booking(i % 100, "Мужская стрижка", *next_slot(), 899)),
+    ("close_time", lambda i: database.close_time("2030-01-16", "12:00")),
+    ("open_time", lambda i: database.open_time("2030-01-16", "12:00")),
+]
+
+
+def _old_style_connection():
+    # Так работал database.py раньше: новое соединение на каждый вызов,
+    # закрывается сборщиком мусора сразу после выхода из функции
+    return sqlite3.connect(database.DB_PATH)
+
+
+def run(cached=True):
+    results = {}
+    for name, call in CALLS:
+        ops = 0
+        deadline = time.perf_counter() + DURATION
+        start = time.perf_counter()
+        while time.perf_counter() < deadline:
+            if not cached:
+                database.invalidate_cache()
+            call(ops)
+            ops += 1
+        results[name] = ops / (time.perf_counter() - start)
+    return results
+
+
+def main():
+    database.init_db()
+    for i in range(100):
+        database.save_user(i, f"user{i}", "+70000000000")
+        database.add_booking(i, "Мужская стрижка", *next_slot(), 899)
+
+    pooled_get_connection = database.get_connection
+    database.get_connection = _old_style_connection
+    before = run(cached=False)
+    database.get_connection = pooled_get_connection
+    after = run()
+
+    print(f"{'функция':<22}{'до, ops/s':>14}{'после, ops/s':>16}{'x':>8}")
+    for name, _ in CALLS:
+        print(f"{name:<22}{before[name]:>14.0f}{after[name]:>16.0f}{after[name] / before[name]:>8.1f}")
+
+    database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
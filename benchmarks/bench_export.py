@@ -0,0 +1,85 @@
+# benchmarks/bench_export.py
+# Память и время выгрузки записей (database.export_bookings) в зависимости от длины истории:
+# потоковая запись с курсора против get_all_bookings, который собирает всю таблицу в список.
+# Память — пик выделений Python (tracemalloc) за время вызова.
+# История кладется в архив (там нет ограничения "одна запись на время"), клиентов 50 000.
+# Запуск: python benchmarks/bench_export.py [размеры истории через запятую]
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+tmp_dir = tempfile.mkdtemp(prefix="bench_export_")
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+os.environ["METRICS_ENABLED"] = "0"
+
+import database  # noqa: E402
+
+SIZES = [int(x) for x in sys.argv[1].split(",")] if len(sys.argv) > 1 else [10_000, 100_000, 1_000_000]
+CLIENTS = 50_000
+DAYS = 5 * 365
+VARIANTS = [("csv", False), ("csv", True), ("jsonl", False), ("jsonl", True)]
+
+
+def measure(func):
+    """(результат, секунд, пик памяти в МБ)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+def fill(size):
+    database.close_connections()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(database.DB_PATH + suffix):
+            os.remove(database.DB_PATH + suffix)
+    database.init_db()
+    services = [name for name, _, _ in database.get_services()]
+    first = date.today() - timedelta(days=DAYS)
+    rng = random.Random(size)
+    clients = ((user_id, f"Клиент {user_id}", f"+7 9{user_id:09d}") for user_id in range(1, CLIENTS + 1))
+    rows = (
+        (i, rng.randrange(1, CLIENTS + 1), rng.choice(services), (first + timedelta(days=rng.randrange(DAYS))).isoformat(),
+         f"{rng.randrange(9, 19):02d}:00", rng.choice((500, 700, 900)))
+        for i in range(1, size + 1)
+    )
+    conn = database.get_connection()
+    with conn:
+        conn.executemany("INSERT INTO users (user_id, full_name, phone) VALUES (?, ?, ?)", clients)
+        conn.executemany(
+            "INSERT INTO bookings_archive (id, user_id, service, date, time, price) VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+
+def main():
+    path = os.path.join(tmp_dir, "export")
+    for size in SIZES:
+        fill(size)
+        print(f"история {size}:")
+        for fmt, compress in VARIANTS:
+            count, elapsed, peak = measure(
+                lambda: database.export_bookings(path, fmt, compress, include_archive=True))
+            assert count == size, (count, size)
+            name = fmt + (".gz" if compress else "")
+            print(f"  выгрузка {name:<9} {elapsed:6.2f} с, пик памяти {peak:6.2f} МБ, "
+                  f"файл {os.path.getsize(path) / 2 ** 20:7.1f} МБ")
+        rows, elapsed, peak = measure(lambda: database.get_all_bookings(include_archive=True))
+        print(f"  get_all_bookings   {elapsed:6.2f} с, пик памяти {peak:6.2f} МБ (без клиентов и услуг, только список)")
+        del rows
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# benchmarks/bench_flood.py
+# Антифлуд и схлопывание листания календаря (bot/update_processor.py).
+# main.py запускается против заглушки Bot API (tools/fake_bot_api.py) дважды:
+# с выключенной защитой (FLOOD_RATE=0, NAV_DEBOUNCE_SECONDS=-1) и с настройками по умолчанию.
+# Сценарий: пользователи открывают календарь и быстро листают его туда-обратно
+# (NAV_TAPS нажатий подряд), а несколько флудеров шлют SPAM нажатий без остановки.
+# Считаются вызовы Bot API (editMessageText и editMessageReplyMarkup — перерисовки календаря;
+# листание меняет только клавиатуру, см. bot/render_cache.py), время до последнего ответа
+# и счетчики процессора из /metrics: схлопнутые листания и отброшенные антифлудом обновления.
+# Запуск: python benchmarks/bench_flood.py [пользователей] [нажатий листания]
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_bot_api import FakeBotAPI  # noqa: E402
+from load_test import SERVICE, USER_ID_BASE, UpdateFactory  # noqa: E402
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+NAV_TAPS = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+FLOODERS = 5
+SPAM = 100
+IDLE_SECONDS = 3
+READY_TIMEOUT = 60
+EDITS = ("editMessageText", "editMessageReplyMarkup")
+ANSWERS = EDITS + ("answerCallbackQuery", "sendMessage")
+# Счетчики из /metrics бота: (имя, метка или None — сумма по всем меткам) -> подпись
+COUNTERS = {
+    ("bot_callbacks_merged_total", None): "листаний схлопнуто",
+    ("bot_updates_throttled_total", None): "обновлений отброшено",
+    ("bot_edits_saved_total", "skip"): "правок не отправлено (без изменений)",
+}
+MODES = {
+    "без защиты": {"FLOOD_RATE": "0", "NAV_DEBOUNCE_SECONDS": "-1"},
+    "антифлуд": {},
+}
+
+
+def build_updates():
+    factory = UpdateFactory()
+    month = (date.today().replace(day=1) + timedelta(days=32)).replace(day=1)
+    next_month = (month + timedelta(days=32)).replace(day=1)
+    months = [month, next_month]
+    scripts = []
+    for i in range(USERS):
+        user_id = USER_ID_BASE + i
+        steps = [factory.command(user_id, "/start"), factory.callback(user_id, "book"),
+                 factory.callback(user_id, f"select_service:{SERVICE}")]
+        for tap in range(NAV_TAPS):
+            shown = months[tap % 2]
+            steps.append(factory.callback(user_id, f"user_calendar_nav:{shown.year}:{shown.month}"))
+        scripts.append(steps)
+    for f in range(FLOODERS):
+        user_id = USER_ID_BASE + USERS + f
+        scripts.append([factory.callback(user_id, "book") for _ in range(SPAM)])
+    # Шаги участников перемешаны, порядок внутри участника сохранен
+    updates = []
+    for step in range(max(len(steps) for steps in scripts)):
+        updates += [steps[step] for steps in scripts if step < len(steps)]
+    # getUpdates отдает обновления по возрастанию update_id — нумеруем после перемешивания
+    for update_id, update in enumerate(updates, 1):
+        update["update_id"] = update_id
+    return updates
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def read_counters(port):
+    """Значения COUNTERS из /metrics бота"""
+    totals = dict.fromkeys(COUNTERS, 0)
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=10) as response:
+        for line in response.read().decode().splitlines():
+            if line.startswith("#"):
+                continue
+            name, _, rest = line.partition("{")
+            label = rest.partition('"')[2].partition('"')[0]
+            value = int(float(line.rsplit(" ", 1)[1]))
+            for key in ((name, None), (name, label)):
+                if key in totals:
+                    totals[key] += value
+    return totals
+
+
+def run(env_extra, updates):
+    api = FakeBotAPI(port=0).start()
+    metrics_port = free_port()
+    tmp_dir = tempfile.mkdtemp(prefix="bench_flood_")
+    env = dict(
+        os.environ,
+        BOT_TOKEN="123:bench",
+        BOT_API_URL=api.base_url,
+        BOT_MODE="polling",
+        DB_PATH=os.path.join(tmp_dir, "bench.db"),
+        ADMINS="1",
+        WORKERS="1",
+        METRICS_PORT=str(metrics_port),
+        **env_extra,
+    )
+    env.pop("TENANTS_FILE", None)
+    bot = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + READY_TIMEOUT
+        while not api.calls["getUpdates"]:
+            if time.time() > deadline or bot.poll() is not None:
+                raise RuntimeError("бот не запустился")
+            time.sleep(0.05)
+        time.sleep(1)
+
+        start = time.perf_counter()
+        api.push_updates(updates)
+        last_total, last_change = 0, start
+        while time.perf_counter() - last_change < IDLE_SECONDS:
+            time.sleep(0.02)
+            total = sum(api.calls[method] for method in ANSWERS)
+            if total != last_total:
+                last_total, last_change = total, time.perf_counter()
+        return last_change - start, dict(api.calls), read_counters(metrics_port)
+    finally:
+        api.stop()
+        bot.terminate()
+        bot.wait(60)
+
+
+def main():
+    updates = build_updates()
+    print(f"пользователей {USERS} × {NAV_TAPS} нажатий листания, флудеров {FLOODERS} × {SPAM}, "
+          f"обновлений {len(updates)}")
+    for name, env_extra in MODES.items():
+        elapsed, calls, counters = run(env_extra, updates)
+        edits = sum(calls.get(method, 0) for method in EDITS)
+        print(f"{name:<11}: {elapsed:5.2f} с, правок {edits:>5} (editMessageText {calls.get('editMessageText', 0)}, "
+              f"editMessageReplyMarkup {calls.get('editMessageReplyMarkup', 0)}), "
+              f"answerCallbackQuery {calls.get('answerCallbackQuery', 0):>5}")
+        print(" " * 13 + ", ".join(f"{title} {counters[key]}" for key, title in COUNTERS.items()))
+
+
+if __name__ == "__main__":
+    main()
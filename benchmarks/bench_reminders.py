@@ -0,0 +1,99 @@
+# benchmarks/bench_reminders.py
+# Планировщик напоминаний на десятках тысяч будущих записей:
+# загрузка окна в min-heap против загрузки всей таблицы при старте.
+# Запуск: python benchmarks/bench_reminders.py [записей]
+import asyncio
+import heapq
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+tmp_dir = tempfile.mkdtemp(prefix="bench_rem_")
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+
+import async_database  # noqa: E402
+import database  # noqa: E402
+from bot.reminders import ReminderScheduler  # noqa: E402
+
+BOOKINGS = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+START = datetime(2030, 1, 1, 8, 0)
+
+
+def fill():
+    database.init_db()
+    conn = database.get_connection()
+    rows = []
+    for i in range(BOOKINGS):
+        start = START.replace(hour=0) + timedelta(days=i // 10, hours=9 + i % 10)
+        rows.append((i, "Мужская стрижка", start.strftime("%Y-%m-%d"), start.strftime("%H:%M"), 899))
+    with conn:
+        conn.executemany("INSERT INTO bookings (user_id, service, date, time, price) VALUES (?, ?, ?, ?, ?)", rows)
+
+
+def naive_load():
+    rows = database.get_connection().execute("SELECT id, user_id, service, date, time FROM bookings").fetchall()
+    heap = [(datetime.strptime(f"{d} {t}", "%Y-%m-%d %H:%M"), i, u, s, d, t) for i, u, s, d, t in rows]
+    heapq.heapify(heap)
+    return heap
+
+
+async def windowed():
+    clock = {"now": START}
+    sent = []
+
+    async def send(user_id, text):
+        sent.append(user_id)
+
+    # Лимит отправки снят: меряем сам планировщик, а не паузы token bucket
+    scheduler = ReminderScheduler(send, now=lambda: clock["now"], send_rate=10 ** 9)
+    start = time.perf_counter()
+    await scheduler.refill()
+    first = time.perf_counter() - start
+    first_size = len(scheduler.heap)
+
+    # Прокручиваем 30 дней по часу: догрузка страниц и отправка по мере наступления
+    start = time.perf_counter()
+    for _ in range(30 * 24):
+        clock["now"] += timedelta(hours=1)
+        if clock["now"] >= scheduler.next_refill_at():
+            await scheduler.refill()
+        await scheduler.pop_due()
+    advance = time.perf_counter() - start
+    return scheduler, first, first_size, advance, len(sent)
+
+
+def main():
+    fill()
+
+    start = time.perf_counter()
+    naive_size = len(naive_load())
+    naive_time = time.perf_counter() - start
+    tracemalloc.start()
+    naive_load()
+    naive_mem = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    scheduler, first, first_size, advance, sent = asyncio.run(windowed())
+    conn = database.get_connection()
+    with conn:
+        conn.execute("DELETE FROM reminders_sent")
+    tracemalloc.start()
+    asyncio.run(windowed())
+    window_mem = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(f"записей в БД:               {BOOKINGS}")
+    print(f"вся таблица в heap:         {naive_time * 1000:8.1f} мс, {naive_size} элементов, пик {naive_mem / 1e6:.1f} МБ")
+    print(f"окно при старте:            {first * 1000:8.1f} мс, {first_size} элементов")
+    print(f"30 дней по часу:            {advance * 1000:8.1f} мс, отправлено {sent}, пик памяти {window_mem / 1e3:.0f} КБ")
+    print(f"статистика: {scheduler.get_stats()}")
+    asyncio.run(async_database.shutdown())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/bench_render.py
+# Кэш показанного (bot/render_cache.py): сколько вызовов Bot API экономит пропуск
+# правок без изменений и замена editMessageText на editMessageReplyMarkup.
+# main.py запускается против заглушки Bot API (tools/fake_bot_api.py) с выключенным
+# кэшем (RENDER_CACHE_SIZE=0) и с включенным; антифлуд в обоих прогонах выключен.
+# Сценарий пользователя: меню с повторными нажатиями той же кнопки, листание
+# календаря туда-обратно и возврат в уже открытый месяц.
+# Запуск: python benchmarks/bench_render.py [пользователей]
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_bot_api import FakeBotAPI  # noqa: E402
+from load_test import SERVICE, USER_ID_BASE, UpdateFactory  # noqa: E402
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+IDLE_SECONDS = 3
+READY_TIMEOUT = 60
+EDIT_METHODS = ("editMessageText", "editMessageReplyMarkup")
+MODES = {
+    "без кэша": {"RENDER_CACHE_SIZE": "0"},
+    "с кэшем": {},
+}
+
+
+def build_updates():
+    factory = UpdateFactory()
+    month = date.today().replace(day=1)
+    next_month = (month + timedelta(days=32)).replace(day=1)
+    steps = [
+        "book", "book",
+        f"select_service:{SERVICE}",
+        f"user_calendar_nav:{next_month.year}:{next_month.month}",
+        f"user_calendar_nav:{month.year}:{month.month}",
+        f"user_calendar_nav:{month.year}:{month.month}",
+        "back_to_main", "back_to_main",
+        "my_bookings", "my_bookings",
+        "back_to_main",
+    ]
+    scripts = [[factory.command(USER_ID_BASE + i, "/start")] +
+               [factory.callback(USER_ID_BASE + i, data) for data in steps] for i in range(USERS)]
+    updates = []
+    for step in range(len(scripts[0])):
+        updates += [script[step] for script in scripts]
+    # getUpdates отдает обновления по возрастанию update_id — нумеруем после перемешивания
+    for update_id, update in enumerate(updates, 1):
+        update["update_id"] = update_id
+    return updates
+
+
+def run(env_extra, updates):
+    api = FakeBotAPI(port=0).start()
+    tmp_dir = tempfile.mkdtemp(prefix="bench_render_")
+    env = dict(
+        os.environ,
+        BOT_TOKEN="123:bench",
+        BOT_API_URL=api.base_url,
+        BOT_MODE="polling",
+        DB_PATH=os.path.join(tmp_dir, "bench.db"),
+        ADMINS="1",
+        WORKERS="1",
+        METRICS_PORT="0",
+        FLOOD_RATE="0",
+        NAV_DEBOUNCE_SECONDS="-1",
+        **env_extra,
+    )
+    env.pop("TENANTS_FILE", None)
+    bot = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + READY_TIMEOUT
+        while not api.calls["getUpdates"]:
+            if time.time() > deadline or bot.poll() is not None:
+                raise RuntimeError("бот не запустился")
+            time.sleep(0.05)
+        time.sleep(1)
+
+        start = time.perf_counter()
+        api.push_updates(updates)
+        last_total, last_change = 0, start
+        while time.perf_counter() - last_change < IDLE_SECONDS:
+            time.sleep(0.02)
+            total = sum(api.calls[method] for method in ("answerCallbackQuery", "sendMessage") + EDIT_METHODS)
+            if total != last_total:
+                last_total, last_change = total, time.perf_counter()
+        return last_change - start, dict(api.calls)
+    finally:
+        api.stop()
+        bot.terminate()
+        bot.wait(60)
+
+
+def main():
+    updates = build_updates()
+    print(f"пользователей {USERS}, обновлений {len(updates)}")
+    baseline = None
+    for name, env_extra in MODES.items():
+        elapsed, calls = run(env_extra, updates)
+        edits = sum(calls.get(method, 0) for method in EDIT_METHODS)
+        baseline = baseline if baseline is not None else edits
+        print(f"{name:<9}: {elapsed:5.2f} с, editMessageText {calls.get('editMessageText', 0):>5}, "
+              f"editMessageReplyMarkup {calls.get('editMessageReplyMarkup', 0):>5}, "
+              f"сэкономлено вызовов {baseline - edits}")
+
+
+if __name__ == "__main__":
+    main()
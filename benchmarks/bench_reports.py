@@ -0,0 +1,98 @@
+# benchmarks/bench_reports.py
+# Стоимость отчета админа в зависимости от длины истории: сводки booking_stats /
+# booking_hour_stats против подсчета по bookings + bookings_archive на лету.
+# История кладется в архив (там нет ограничения "одна запись на время") на 5 лет назад.
+# Запуск: python benchmarks/bench_reports.py [размеры истории через запятую]
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+tmp_dir = tempfile.mkdtemp(prefix="bench_reports_")
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+os.environ["METRICS_ENABLED"] = "0"
+
+import database  # noqa: E402
+
+SIZES = [int(x) for x in sys.argv[1].split(",")] if len(sys.argv) > 1 else [10_000, 100_000, 1_000_000]
+ROUNDS = 20
+DAYS = 5 * 365
+
+SCAN_SERVICES_SQL = """
+    SELECT b.service, COUNT(*), SUM(b.price), SUM(COALESCE(s.duration, 60))
+    FROM (SELECT service, date, price FROM bookings WHERE date BETWEEN :from AND :to
+          UNION ALL
+          SELECT service, date, price FROM bookings_archive WHERE date BETWEEN :from AND :to) b
+    LEFT JOIN services s ON s.name = b.service
+    GROUP BY b.service
+    ORDER BY SUM(b.price) DESC
+"""
+SCAN_HOURS_SQL = """
+    SELECT CAST(substr(time, 1, 2) AS INTEGER) AS hour, COUNT(*)
+    FROM (SELECT time FROM bookings WHERE date BETWEEN :from AND :to
+          UNION ALL
+          SELECT time FROM bookings_archive WHERE date BETWEEN :from AND :to)
+    GROUP BY hour
+    ORDER BY COUNT(*) DESC
+    LIMIT 3
+"""
+
+
+def median_ms(func):
+    samples = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def fill(size):
+    database.close_connections()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(database.DB_PATH + suffix):
+            os.remove(database.DB_PATH + suffix)
+    database.init_db()
+    services = [name for name, _, _ in database.get_services()]
+    first = date.today() - timedelta(days=DAYS)
+    rng = random.Random(size)
+    rows = (
+        (i, rng.randrange(10 ** 6), rng.choice(services), (first + timedelta(days=rng.randrange(DAYS))).isoformat(),
+         f"{rng.randrange(9, 19):02d}:00", rng.choice((500, 700, 900)))
+        for i in range(1, size + 1)
+    )
+    conn = database.get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO bookings_archive (id, user_id, service, date, time, price) VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+
+def main():
+    today = date.today()
+    periods = {
+        "месяц": ((today - timedelta(days=30)).isoformat(), today.isoformat()),
+        "год": ((today - timedelta(days=365)).isoformat(), today.isoformat()),
+    }
+    for size in SIZES:
+        fill(size)
+        start = time.perf_counter()
+        database.rebuild_booking_stats()
+        rebuild = time.perf_counter() - start
+        conn = database.get_connection()
+        print(f"история {size}: пересчет сводок {rebuild:.2f} с")
+        for name, (date_from, date_to) in periods.items():
+            params = {"from": date_from, "to": date_to}
+            summary = median_ms(lambda: (database.get_service_summary(date_from, date_to),
+                                         database.get_hour_summary(date_from, date_to)))
+            scan = median_ms(lambda: (conn.execute(SCAN_SERVICES_SQL, params).fetchall(),
+                                      conn.execute(SCAN_HOURS_SQL, params).fetchall()))
+            print(f"  {name:<6} сводки {summary:7.2f} мс, подсчет по записям {scan:8.2f} мс (x{scan / summary:.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# benchmarks/bench_router.py
+# Стоимость поиска обработчика callback_data при большом числе маршрутов:
+# CallbackRouter (словарь по префиксу) против цепочки startswith в одном обработчике.
+# Запуск: python benchmarks/bench_router.py [маршрутов]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.router import CallbackRouter  # noqa: E402
+
+ROUTES = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+ROUNDS = 200_000
+
+
+async def handler(update, context, *args):
+    pass
+
+
+def main():
+    router = CallbackRouter()
+    prefixes = [f"action_{i}" for i in range(ROUTES)]
+    for prefix in prefixes:
+        router.add(prefix, handler, str, int)
+    router.add("open_slot", handler, str, str)
+
+    payloads = [f"{prefixes[i % ROUTES]}:2030-01-{i % 28 + 1:02d}:{i}" for i in range(1000)]
+    payloads.append("open_slot:2030-01-01:10:00")
+
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        router.resolve(payloads[i % len(payloads)])
+    routed = (time.perf_counter() - start) / ROUNDS * 1e6
+
+    def chain(data):
+        # Как выглядел бы один button_handler с if/elif по префиксам
+        for prefix in prefixes:
+            if data.startswith(prefix + ":"):
+                _, date, number = data.split(":", 2)
+                return handler, (date, int(number))
+        return None
+
+    start = time.perf_counter()
+    for i in range(ROUNDS // 10):
+        chain(payloads[i % len(payloads)])
+    chained = (time.perf_counter() - start) / (ROUNDS // 10) * 1e6
+
+    print(f"маршрутов: {len(router)}")
+    print(f"CallbackRouter:   {routed:8.2f} мкс/callback")
+    print(f"цепочка if/elif:  {chained:8.2f} мкс/callback")
+
+
+if __name__ == "__main__":
+    main()
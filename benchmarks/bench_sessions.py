@@ -0,0 +1,76 @@
+# benchmarks/bench_sessions.py
+# Память на 100 000 активных сессий записи: SessionStore (__slots__) против
+# словарей user_data, как хранил бы PTB, и время снимка в SQLite одной пачкой.
+# Запуск: python benchmarks/bench_sessions.py [сессий]
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+tmp_dir = tempfile.mkdtemp(prefix="bench_sessions_")
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+
+import async_database  # noqa: E402
+import database  # noqa: E402
+from bot.sessions import SessionStore  # noqa: E402
+
+SESSIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+
+def measure(build):
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def build_store():
+    store = SessionStore()
+    for user_id in range(SESSIONS):
+        session = store.get(user_id)
+        session.service = "Мужская стрижка"
+        session.date = "2030-01-15"
+        session.time = "10:00"
+    return store
+
+
+def build_user_data():
+    user_data = {}
+    for user_id in range(SESSIONS):
+        user_data[user_id] = {"service": "Мужская стрижка", "date": "2030-01-15", "time": "10:00"}
+    return user_data
+
+
+async def snapshot_and_restore(store):
+    start = time.perf_counter()
+    written = await store.snapshot()
+    snapshot_time = time.perf_counter() - start
+
+    restored = SessionStore()
+    start = time.perf_counter()
+    await restored.restore()
+    restore_time = time.perf_counter() - start
+    await async_database.shutdown()
+    return written, snapshot_time, len(restored), restore_time
+
+
+def main():
+    database.init_db()
+    store, store_size = measure(build_store)
+    _, dict_size = measure(build_user_data)
+
+    print(f"сессий: {SESSIONS}")
+    print(f"SessionStore (__slots__):  {store_size / 1e6:7.1f} МБ, {store_size / SESSIONS:5.0f} байт/сессию")
+    print(f"dict user_data:            {dict_size / 1e6:7.1f} МБ, {dict_size / SESSIONS:5.0f} байт/сессию")
+
+    written, snapshot_time, restored, restore_time = asyncio.run(snapshot_and_restore(store))
+    print(f"снимок: {written} строк за {snapshot_time * 1000:.0f} мс, восстановление: {restored} за {restore_time * 1000:.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/bench_startup.py
+# Холодный старт бота: импорт модулей, init_db и время от запуска процесса
+# main.py до первого getUpdates (бот готов принимать обновления).
+# Бот работает против заглушки Bot API из tools/fake_bot_api.py.
+# Запуск: python benchmarks/bench_startup.py [повторов]
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+tmp_dir = tempfile.mkdtemp(prefix="bench_start_")
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+
+import database  # noqa: E402
+from fake_bot_api import FakeBotAPI  # noqa: E402
+
+ROUNDS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+
+def median_ms(func, rounds=ROUNDS, setup=None):
+    samples = []
+    for _ in range(rounds):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def run_python(code, env=None):
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def reset_db(path, version=None):
+    database.close_connections()
+    database.DB_PATH = path
+    if version is None:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    else:
+        database.get_connection().execute(f"PRAGMA user_version = {version}")
+
+
+def time_to_ready(api, env):
+    """От запуска процесса main.py до первого getUpdates"""
+    api.first_call.pop("getUpdates", None)
+    start = time.time()
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while "getUpdates" not in api.first_call:
+            if process.poll() is not None:
+                raise RuntimeError("main.py завершился до первого getUpdates")
+            time.sleep(0.005)
+        return (api.first_call["getUpdates"] - start) * 1000
+    finally:
+        process.terminate()
+        process.wait(10)
+
+
+def main():
+    env = dict(os.environ, BOT_TOKEN="123456:STARTUP", DB_PATH=database.DB_PATH, METRICS_PORT="0")
+    path = database.DB_PATH
+
+    interpreter = median_ms(lambda: run_python("pass"))
+    imports = median_ms(lambda: run_python(
+        "import main; main.build_application('123456:STARTUP')", env))
+
+    # Соединение открывается в setup, меряется только init_db
+    fresh = median_ms(database.init_db, setup=lambda: (reset_db(path), database.get_connection()))
+    # user_version = 0 — база до версионирования: все шаги схемы на каждом запуске
+    legacy = median_ms(database.init_db, setup=lambda: reset_db(path, 0))
+    current = median_ms(database.init_db, setup=lambda: reset_db(path, database.SCHEMA_VERSION))
+    database.close_connections()
+
+    api = FakeBotAPI(port=0).start()
+    env["BOT_API_URL"] = api.base_url
+    ready = statistics.median(time_to_ready(api, env) for _ in range(ROUNDS))
+    api.stop()
+
+    print(f"повторов:                          {ROUNDS}, медиана")
+    print(f"интерпретатор (python -c pass):    {interpreter:8.1f} мс")
+    print(f"импорт + build_application:        {imports:8.1f} мс (вместе с интерпретатором)")
+    print(f"init_db, новая база:               {fresh:8.2f} мс")
+    print(f"init_db, база без версии схемы:    {legacy:8.2f} мс")
+    print(f"init_db, актуальная схема:         {current:8.2f} мс")
+    print(f"запуск main.py -> первый getUpdates: {ready:6.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
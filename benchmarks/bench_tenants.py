@@ -0,0 +1,88 @@
+# benchmarks/bench_tenants.py
+# Запись в нескольких салонах одновременно: одна общая база (как до tenants.py)
+# против отдельной базы и потока-писателя на каждого мастера.
+# Клиенты всех салонов параллельно вызывают async_database.book_slot; нагрузка
+# (число записей) в обоих вариантах одинаковая.
+# Каждый вариант — в отдельном процессе, потому что список мастеров читается при импорте.
+# Запуск: python benchmarks/bench_tenants.py [клиентов на салон] [записей на клиента]
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TENANT_COUNTS = (1, 4, 16)
+CLIENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+PER_CLIENT = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+
+async def child(shops, separate):
+    import async_database as db
+    import database
+    import tenants
+
+    database.init_all_tenants()
+    ids = tenants.all_ids()
+    latencies = []
+
+    async def client(shop, n):
+        # В общей базе салоны различаются датами, чтобы записи не конфликтовали
+        tenant_id = ids[shop] if separate else ids[0]
+        with database.use_tenant(tenant_id):
+            for i in range(PER_CLIENT):
+                date = f"2031-{shop % 12 + 1:02d}-{i % 28 + 1:02d}"
+                time_ = f"{n % 10 + 9:02d}:{shop // 12 * 10 + i // 28:02d}"
+                start = time.perf_counter()
+                await db.book_slot(1000 * shop + n, "Мужская стрижка", date, time_, 899)
+                latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(shop, n) for shop in range(shops) for n in range(CLIENTS)))
+    elapsed = time.perf_counter() - started
+    await db.shutdown()
+    latencies.sort()
+    return {
+        "writes": len(latencies),
+        "per_second": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+    }
+
+
+def run(shops, separate):
+    tmp_dir = tempfile.mkdtemp(prefix="bench_tenants_")
+    env = dict(os.environ, DB_PATH=os.path.join(tmp_dir, "shared.db"), METRICS_ENABLED="0")
+    env.pop("TENANTS_FILE", None)
+    if separate:
+        path = os.path.join(tmp_dir, "tenants.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([{"id": f"shop{i}", "shop": f"Салон {i}", "master": f"Мастер {i}"}
+                       for i in range(shops)], f, ensure_ascii=False)
+        env["TENANTS_FILE"] = path
+    out = subprocess.run([sys.executable, __file__, str(CLIENTS), str(PER_CLIENT), "--child", str(shops), str(int(separate))],
+                         cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    print(f"клиентов на салон {CLIENTS}, записей на клиента {PER_CLIENT}")
+    for shops in TENANT_COUNTS:
+        for separate in (False, True):
+            result = run(shops, separate)
+            mode = "отдельные базы" if separate else "общая база"
+            print(f"салонов {shops:>2}, {mode:<14}: {result['writes']} записей, "
+                  f"{result['per_second']:.0f}/с, p50 {result['p50_ms']:.1f} мс, p95 {result['p95_ms']:.1f} мс")
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        i = sys.argv.index("--child")
+        print(json.dumps(asyncio.run(child(int(sys.argv[i + 1]), sys.argv[i + 2] == "1"))))
+    else:
+        main()
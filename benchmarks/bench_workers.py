@@ -0,0 +1,111 @@
+# benchmarks/bench_workers.py
+# Пропускная способность бота в зависимости от числа процессов-воркеров (WORKERS).
+# main.py запускается целиком (главный процесс + воркеры) против заглушки Bot API
+# из tools/fake_bot_api.py; сценарий — тот же, что в benchmarks/load_test.py.
+# Когда бот готов, все обновления разом отдаются через getUpdates; время — от этого
+# момента до последнего ответа бота (после него вызовов нет IDLE_SECONDS секунд).
+# Каждый прогон проверяет, что ни одно обновление не потерялось: на каждое нажатие
+# ровно один answerCallbackQuery, на каждую команду — ответ в чат пользователя.
+# Общее число вызовов Bot API растет с числом воркеров, и это ожидаемо: очередь
+# уведомлений админам (bot/notifications.py) у каждого процесса своя, поэтому каждый
+# воркер отправляет каждому админу свое первое уведомление и свою сводку. Кроме того,
+# при гонке за одно время ответ зависит от порядка (успех или "уже занято").
+# Запуск: python benchmarks/bench_workers.py [пользователей] [воркеров через запятую]
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_bot_api import FakeBotAPI  # noqa: E402
+from load_test import ADMIN_ID_BASE, build_scenarios  # noqa: E402
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+WORKER_COUNTS = [int(x) for x in sys.argv[2].split(",")] if len(sys.argv) > 2 else [1, 2, 4, 8]
+ADMINS = 5
+IDLE_SECONDS = 3
+READY_TIMEOUT = 60
+SERVICE_METHODS = ("getMe", "getUpdates", "deleteWebhook", "setWebhook")
+
+
+def answered(api):
+    return sum(n for method, n in api.calls.items() if method not in SERVICE_METHODS)
+
+
+def lost_updates(api, updates):
+    """(нажатий не ровно с одним ответом, команд без ответа в чат)"""
+    callbacks = [u["callback_query"]["id"] for u in updates if "callback_query" in u]
+    bad_callbacks = sum(1 for callback_id in callbacks if api.answered[callback_id] != 1)
+    commands = Counter(u["message"]["chat"]["id"] for u in updates if "message" in u)
+    unanswered = sum(max(0, n - api.sent_to[chat_id]) for chat_id, n in commands.items())
+    return bad_callbacks, unanswered
+
+
+def run(workers, updates):
+    api = FakeBotAPI(port=0).start()
+    tmp_dir = tempfile.mkdtemp(prefix="bench_workers_")
+    env = dict(
+        os.environ,
+        BOT_TOKEN="123:bench",
+        BOT_API_URL=api.base_url,
+        BOT_MODE="polling",
+        DB_PATH=os.path.join(tmp_dir, "bench.db"),
+        ADMINS=",".join(str(ADMIN_ID_BASE + a) for a in range(ADMINS)),
+        WORKERS=str(workers),
+        METRICS_PORT="0",
+    )
+    env.pop("TENANTS_FILE", None)
+    bot = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # Готов, когда главный процесс и все воркеры сделали getMe и начался getUpdates
+        deadline = time.time() + READY_TIMEOUT
+        expected_get_me = workers + 1 if workers > 1 else 1
+        while api.calls["getMe"] < expected_get_me or not api.calls["getUpdates"]:
+            if time.time() > deadline or bot.poll() is not None:
+                raise RuntimeError(f"бот с WORKERS={workers} не запустился")
+            time.sleep(0.05)
+        time.sleep(1)
+
+        start = time.perf_counter()
+        api.push_updates(updates)
+        last_count, last_change = 0, start
+        while time.perf_counter() - last_change < IDLE_SECONDS:
+            time.sleep(0.02)
+            count = answered(api)
+            if count != last_count:
+                last_count, last_change = count, time.perf_counter()
+        return last_change - start, last_count, lost_updates(api, updates)
+    finally:
+        # Заглушку останавливаем первой: иначе она пишет в уже закрытый long polling
+        api.stop()
+        bot.terminate()
+        bot.wait(60)
+
+
+def main():
+    updates, _ = build_scenarios(USERS, ADMINS)
+    print(f"пользователей {USERS}, админов {ADMINS}, обновлений {len(updates)}, CPU {os.cpu_count()}")
+    baseline = None
+    failed = []
+    for workers in WORKER_COUNTS:
+        elapsed, calls, (bad_callbacks, unanswered) = run(workers, updates)
+        rate = len(updates) / elapsed
+        baseline = baseline or rate
+        print(f"воркеров {workers}: {elapsed:.2f} с, {rate:.0f} обновлений/с (x{rate / baseline:.2f}), "
+              f"вызовов Bot API {calls}, нажатий не ровно с одним ответом {bad_callbacks}, "
+              f"команд без ответа {unanswered}")
+        if bad_callbacks or unanswered:
+            failed.append(workers)
+    if failed:
+        sys.exit(f"потеряны обновления при WORKERS={', '.join(map(str, failed))}")
+
+
+if __name__ == "__main__":
+    main()
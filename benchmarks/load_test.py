@@ -0,0 +1,387 @@
+# benchmarks/load_test.py
+# Нагрузочный тест бота целиком, без настоящего Telegram: приложение из main.py
+# (те же обработчики, фоновые задачи и PerUserUpdateProcessor) работает против
+# локальной заглушки Bot API из tools/fake_bot_api.py.
+#
+# Сценарий: тысячи пользователей проходят /start → запись → услуга → листание
+# календаря → дата → время → подтверждение, параллельно админы закрывают дни и время.
+# Обновления подаются через getUpdates (polling) или POST на webhook.
+#
+# Отчет: обновлений в секунду, p50/p95/p99 времени обработчика, вызовов БД и
+# SQL-запросов на обновление. Результат дописывается строкой JSON в --out,
+# чтобы сравнивать прогоны между коммитами.
+#
+# Запуск: python benchmarks/load_test.py [--users 1000] [--admins 5] [--mode polling|webhook]
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as date_cls, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+SERVICE = "Мужская стрижка"
+TIMES = [f"{hour:02d}:00" for hour in range(9, 19)]
+WEBHOOK_PATH = "load-test"
+WEBHOOK_SECRET = "load-test-secret"
+USER_ID_BASE = 1_000_000
+ADMIN_ID_BASE = 900
+STALL_SECONDS = 30
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота против заглушки Bot API")
+    parser.add_argument("--users", type=int, default=1000, help="сколько пользователей проходят запись")
+    parser.add_argument("--admins", type=int, default=5, help="сколько админов закрывают слоты")
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    parser.add_argument("--concurrency", type=int, default=64, help="CONCURRENT_UPDATES")
+    parser.add_argument("--clients", type=int, default=16, help="потоков-отправителей в режиме webhook")
+    parser.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "results", "load_test.jsonl"))
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# === Синтетические обновления ===
+class UpdateFactory:
+    def __init__(self):
+        self.update_id = 0
+
+    def _next_id(self):
+        self.update_id += 1
+        return self.update_id
+
+    @staticmethod
+    def _user(user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+    def command(self, user_id, text):
+        update_id = self._next_id()
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": self._user(user_id),
+                "text": text,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+            },
+        }
+
+    def callback(self, user_id, data):
+        update_id = self._next_id()
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "from": self._user(user_id),
+                "message": {
+                    "message_id": 1,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": {"id": 1, "is_bot": True, "first_name": "Barber"},
+                    "text": "menu",
+                },
+            },
+        }
+
+
+def build_scenarios(users, admins):
+    """Шаги каждого участника по порядку; между участниками шаги перемешаны"""
+    factory = UpdateFactory()
+    first = date_cls.today().replace(day=1) + timedelta(days=32)
+    month = first.replace(day=1)
+    next_month = (month + timedelta(days=32)).replace(day=1)
+    days = [month + timedelta(days=i) for i in range((next_month - month).days)]
+
+    scripts = []
+    for i in range(users):
+        user_id = USER_ID_BASE + i
+        day = days[i % len(days)].isoformat()
+        steps = [
+            ("command", "/start"),
+            ("callback", "book"),
+            ("callback", f"select_service:{SERVICE}"),
+            ("callback", f"user_calendar_nav:{next_month.year}:{next_month.month}"),
+            ("callback", f"user_calendar_nav:{month.year}:{month.month}"),
+            ("callback", f"user_calendar_select:{day}"),
+            ("callback", f"select_time:{TIMES[(i // len(days)) % len(TIMES)]}"),
+            ("callback", "confirm_booking"),
+        ]
+        scripts.append((user_id, steps))
+
+    for a in range(admins):
+        admin_id = ADMIN_ID_BASE + a
+        steps = [("callback", "admin_menu"), ("callback", "admin_close_slots")]
+        for k in range(max(1, users // (admins * 20))):
+            day = days[(a * 7 + k) % len(days)].isoformat()
+            steps += [
+                ("callback", "close_time"),
+                ("callback", f"select_date_for_close:{day}"),
+                ("callback", f"select_time_for_close:{TIMES[-1 - k % 3]}"),
+            ]
+        steps += [("callback", "close_day"), ("callback", f"select_date_for_close:{days[-1 - a].isoformat()}")]
+        steps.append(("callback", "open_slots"))
+        scripts.append((admin_id, steps))
+
+    # Чередуем шаги участников: так выглядит поток обновлений от многих людей сразу
+    per_user = {}
+    ordered = []
+    longest = max(len(steps) for _, steps in scripts)
+    for n in range(longest):
+        for user_id, steps in scripts:
+            if n < len(steps):
+                kind, payload = steps[n]
+                update = getattr(factory, kind)(user_id, payload)
+                ordered.append(update)
+                per_user.setdefault(user_id, []).append(update)
+    return ordered, per_user
+
+
+# === Замеры ===
+class Metrics:
+    def __init__(self):
+        self.latencies = []
+        self.db_calls = Counter()
+        self.sql_statements = 0
+        self._sql_lock = threading.Lock()
+        self.done = 0
+
+    def count_sql(self, statement):
+        with self._sql_lock:
+            self.sql_statements += 1
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def instrument_database(metrics):
+    """Считать вызовы async_database и SQL-запросы всех соединений"""
+    import async_database
+    import database
+
+    original_connect = database._connect
+
+    def traced_connect(path):
+        conn = original_connect(path)
+        conn.set_trace_callback(metrics.count_sql)
+        return conn
+
+    database._connect = traced_connect
+    database.close_connections()
+
+    for name, func in list(vars(async_database).items()):
+        if name.startswith("_") or name in ("shutdown", "init_db"):
+            continue
+        if not asyncio.iscoroutinefunction(func) or not hasattr(func, "__wrapped__"):
+            continue
+
+        def counted(func=func, name=name):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                metrics.db_calls[name] += 1
+                return await func(*args, **kwargs)
+            return wrapper
+
+        setattr(async_database, name, counted())
+
+
+def timed_processor(metrics, concurrency):
+    from bot.update_processor import PerUserUpdateProcessor
+
+    class TimedUpdateProcessor(PerUserUpdateProcessor):
+        """Меряет только обработку обновления, без ожидания очереди пользователя.
+
+        Обновления, которые антифлуд отбросил или схлопнул, тоже считаются завершенными.
+        """
+
+        async def do_process_update(self, update, coroutine):
+            async def timed():
+                start = time.perf_counter()
+                try:
+                    await coroutine
+                finally:
+                    metrics.latencies.append(time.perf_counter() - start)
+
+            try:
+                await super().do_process_update(update, timed())
+            finally:
+                # Схлопнутое листание закрывает timed() до запуска — закрываем и обработчик
+                coroutine.close()
+
+        async def process_update(self, update, coroutine):
+            try:
+                await super().process_update(update, coroutine)
+            finally:
+                metrics.done += 1
+
+    return TimedUpdateProcessor(concurrency)
+
+
+def post_updates(url, updates):
+    headers = {"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET}
+    for update in updates:
+        request = urllib.request.Request(url, data=json.dumps(update).encode(), headers=headers, method="POST")
+        with urllib.request.urlopen(request, timeout=30):
+            pass
+
+
+async def run(args, api, metrics, ordered, per_user):
+    import main
+
+    app = main.build_application(os.environ["BOT_TOKEN"])
+    # Тот же процессор, что в main.py, только с замером времени обработчиков
+    app._update_processor = timed_processor(metrics, args.concurrency)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # Последовательность run_polling/run_webhook, но внутри нашего event loop
+    await app.initialize()
+    await app.post_init(app)
+    webhook_port = free_port()
+    if args.mode == "polling":
+        await app.updater.start_polling(poll_interval=0, timeout=5)
+    else:
+        await app.updater.start_webhook(
+            listen="127.0.0.1",
+            port=webhook_port,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"http://127.0.0.1:{webhook_port}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+        )
+    await app.start()
+
+    total = len(ordered)
+    start = time.perf_counter()
+    if args.mode == "polling":
+        api.push_updates(ordered)
+        sender = None
+    else:
+        # Обновления одного пользователя шлет один поток, чтобы не нарушить их порядок
+        url = f"http://127.0.0.1:{webhook_port}/{WEBHOOK_PATH}"
+        buckets = [[] for _ in range(args.clients)]
+        for user_id, updates in per_user.items():
+            buckets[user_id % args.clients].extend(updates)
+        pool = ThreadPoolExecutor(max_workers=args.clients)
+        loop = asyncio.get_running_loop()
+        sender = asyncio.gather(*(loop.run_in_executor(pool, post_updates, url, b) for b in buckets))
+
+    last_done, last_progress = 0, time.perf_counter()
+    while metrics.done < total:
+        await asyncio.sleep(0.01)
+        if metrics.done != last_done:
+            last_done, last_progress = metrics.done, time.perf_counter()
+        elif time.perf_counter() - last_progress > STALL_SECONDS:
+            raise RuntimeError(f"обработка встала: {metrics.done} из {total}, не забрано {api.pending()}")
+    elapsed = time.perf_counter() - start
+    if sender is not None:
+        await sender
+
+    await app.updater.stop()
+    await app.stop()
+    await app.shutdown()
+    await app.post_shutdown(app)
+    return elapsed
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    from fake_bot_api import FakeBotAPI
+
+    api = FakeBotAPI(port=0).start()
+    tmp_dir = tempfile.mkdtemp(prefix="load_test_")
+    os.environ.update({
+        "BOT_TOKEN": "123456:LOADTEST",
+        "BOT_API_URL": api.base_url,
+        "DB_PATH": os.path.join(tmp_dir, "bot.db"),
+        "ADMINS": ",".join(str(ADMIN_ID_BASE + a) for a in range(args.admins)),
+        "CONCURRENT_UPDATES": str(args.concurrency),
+    })
+
+    import database
+
+    metrics = Metrics()
+    instrument_database(metrics)
+    database.init_db()
+    metrics.sql_statements = 0
+
+    ordered, per_user = build_scenarios(args.users, args.admins)
+    elapsed = asyncio.run(run(args, api, metrics, ordered, per_user))
+    api.stop()
+
+    total = len(ordered)
+    conn = database.get_connection()
+    bookings = conn.execute("SELECT COUNT(*) FROM bookings").fetchone()[0]
+    closed = conn.execute("SELECT COUNT(*) FROM closed_intervals").fetchone()[0]
+    db_calls = sum(metrics.db_calls.values())
+    api_calls = dict(api.calls)
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": int(time.time()),
+        "python": platform.python_version(),
+        "mode": args.mode,
+        "users": args.users,
+        "admins": args.admins,
+        "concurrency": args.concurrency,
+        "updates": total,
+        "seconds": round(elapsed, 3),
+        "updates_per_sec": round(total / elapsed, 1),
+        "latency_ms": {f"p{p}": round(metrics.percentile(p) * 1000, 2) for p in (50, 95, 99)},
+        "db_calls_per_update": round(db_calls / total, 2),
+        "sql_per_update": round(metrics.sql_statements / total, 2),
+        "db_calls": dict(metrics.db_calls.most_common()),
+        "api_calls": api_calls,
+        "bookings": bookings,
+        "closed_intervals": closed,
+    }
+
+    print(f"режим:                 {args.mode}, пользователей {args.users}, админов {args.admins}")
+    print(f"обновлений:            {total} за {elapsed:.2f} с, {result['updates_per_sec']} в секунду")
+    print(f"обработчик, мс:        p50 {result['latency_ms']['p50']}, p95 {result['latency_ms']['p95']}, "
+          f"p99 {result['latency_ms']['p99']}")
+    print(f"БД на обновление:      {result['db_calls_per_update']} вызовов, {result['sql_per_update']} SQL")
+    print(f"вызовы Bot API:        {api_calls}")
+    print(f"записей создано:       {bookings}, закрытых интервалов {closed}")
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        print(f"результат дописан в {args.out}")
+
+
+if __name__ == "__main__":
+    main()
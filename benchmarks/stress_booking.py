@@ -0,0 +1,74 @@
+# benchmarks/stress_booking.py
+# Нагрузочная проверка атомарной записи: много потоков одновременно пытаются
+# занять одни и те же времена через database.book_slot.
+# На каждое время должна пройти ровно одна запись, остальные получают None.
+# Запуск: python benchmarks/stress_booking.py [потоков] [дней]
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+tmp_dir = tempfile.mkdtemp(prefix="stress_booking_")
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "stress.db")
+
+import database  # noqa: E402
+from bot.slot_holds import SlotHolds  # noqa: E402
+
+THREADS = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+DAYS = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+
+def main():
+    database.init_db()
+    start_time, end_time = database.get_working_hours()
+    hours = range(int(start_time[:2]), int(end_time[:2]))
+    slots = [(f"2030-02-{day:02d}", f"{h:02d}:00") for day in range(1, DAYS + 1) for h in hours]
+
+    results = {"ok": 0, "taken": 0, "errors": 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(THREADS)
+
+    def worker(user_id):
+        barrier.wait()
+        for date, slot_time in slots:
+            try:
+                booking_id = database.book_slot(user_id, "Мужская стрижка", date, slot_time, 899)
+                key = "ok" if booking_id else "taken"
+            except Exception as e:
+                print(f"ошибка: {e!r}")
+                key = "errors"
+            with lock:
+                results[key] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    conn = database.get_connection()
+    booked = conn.execute("SELECT COUNT(*) FROM bookings").fetchone()[0]
+    duplicates = conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM bookings GROUP BY date, time HAVING COUNT(*) > 1)").fetchone()[0]
+
+    attempts = THREADS * len(slots)
+    print(f"потоков {THREADS}, времен {len(slots)}, попыток {attempts} за {elapsed:.2f} с ({attempts / elapsed:.0f}/с)")
+    print(f"успешно {results['ok']}, занято {results['taken']}, ошибок {results['errors']}")
+    print(f"записей в БД {booked}, дублей {duplicates}")
+    assert results["ok"] == len(slots) == booked, "каждое время должно быть занято ровно один раз"
+    assert duplicates == 0 and results["errors"] == 0
+
+    # Брони в памяти: конкуренты видят выбранное время занятым
+    holds = SlotHolds(ttl=60)
+    assert holds.hold(1, "2030-03-01", "10:00", 60)
+    assert not holds.hold(2, "2030-03-01", "10:30", 60)
+    assert holds.filter_free("2030-03-01", ["09:00", "10:00", "11:00"], 60, user_id=2) == ["09:00", "11:00"]
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
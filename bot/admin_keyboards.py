@@ -2,13 +2,22 @@
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton
 from datetime import datetime
 
-def admin_main_menu():
-    return InlineKeyboardMarkup([
+from bot.calendar_keyboard import local_today, render_calendar
+from bot.pagination import encode_cursor
+from config import TIME_SLOT_MINUTES
+
+def admin_main_menu(multi_tenant=False):
+    buttons = [
         [InlineKeyboardButton("1️⃣ Мои услуги", callback_data="admin_services")],
         [InlineKeyboardButton("2️⃣ Календарь", callback_data="admin_view_calendar")],
         [InlineKeyboardButton("3️⃣ Закрыть время", callback_data="admin_close_slots")],
-        [InlineKeyboardButton("4️⃣ График работы", callback_data="admin_working_hours")]
-    ])
+        [InlineKeyboardButton("4️⃣ График работы", callback_data="admin_working_hours")],
+        [InlineKeyboardButton("5️⃣ Все записи", callback_data="admin_bookings")],
+        [InlineKeyboardButton("6️⃣ Отчеты", callback_data="admin_reports")]
+    ]
+    if multi_tenant:
+        buttons.append([InlineKeyboardButton("👤 Сменить мастера", callback_data="admin_masters")])
+    return InlineKeyboardMarkup(buttons)
 
 def admin_services_menu():
     return InlineKeyboardMarkup([
@@ -23,83 +32,35 @@ def admin_working_hours_menu():
         [InlineKeyboardButton("⬅️ Назад", callback_data="admin_menu")]
     ])
 
+def admin_reports_menu():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("Сегодня", callback_data="admin_report:today"),
+         InlineKeyboardButton("7 дней", callback_data="admin_report:week")],
+        [InlineKeyboardButton("Этот месяц", callback_data="admin_report:month"),
+         InlineKeyboardButton("Прошлый месяц", callback_data="admin_report:prev_month")],
+        [InlineKeyboardButton("⬅️ Назад", callback_data="admin_menu")]
+    ])
+
 def admin_close_slots_menu():
     return InlineKeyboardMarkup([
         [InlineKeyboardButton("📅 Закрыть день", callback_data="close_day")],
         [InlineKeyboardButton("⏱ Закрыть время", callback_data="close_time")],
         [InlineKeyboardButton("🔓 Открыть слоты", callback_data="open_slots")],
+        [InlineKeyboardButton("📆 Закрыть период", callback_data="bulk:close"),
+         InlineKeyboardButton("📆 Открыть период", callback_data="bulk:open")],
         [InlineKeyboardButton("⬅️ Назад", callback_data="admin_menu")]
     ])
 
-def generate_calendar(year=None, month=None):
-    from datetime import datetime
-    today = datetime.today()
-    
-    if year is None:
-        year = today.year
-    if month is None:
-        month = today.month
-    
-    first_day = datetime(year, month, 1)
-    first_weekday = first_day.weekday()
-    
-    if month == 12:
-        next_month = datetime(year + 1, 1, 1)
-    else:
-        next_month = datetime(year, month + 1, 1)
-    days_in_month = (next_month - first_day).days
-    
-    month_names = ["Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
-                  "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"]
-    
-    buttons = []
-    
-    prev_month = month - 1 if month > 1 else 12
-    prev_year = year if month > 1 else year - 1
-    next_month = month + 1 if month < 12 else 1
-    next_year = year if month < 12 else year + 1
-    
-    header = [
-        InlineKeyboardButton("⬅️", callback_data=f"calendar_nav:{prev_year}:{prev_month}"),
-        InlineKeyboardButton(f"{month_names[month-1]} {year}", callback_data="ignore"),
-        InlineKeyboardButton("➡️", callback_data=f"calendar_nav:{next_year}:{next_month}")
-    ]
-    buttons.append(header)
-    
-    weekdays = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
-    buttons.append([InlineKeyboardButton(day, callback_data="ignore") for day in weekdays])
-    
-    day_buttons = []
-    for _ in range(first_weekday):
-        day_buttons.append(InlineKeyboardButton(" ", callback_data="ignore"))
-    
-    for day in range(1, days_in_month + 1):
-        date_str = f"{year}-{month:02d}-{day:02d}"
-        date_obj = datetime(year, month, day).date()
-        
-        if date_obj < today.date():
-            day_buttons.append(InlineKeyboardButton(f"❌{day}", callback_data="ignore"))
-        else:
-            day_buttons.append(InlineKeyboardButton(f"{day}", callback_data=f"calendar_select:{date_str}"))
-        
-        if len(day_buttons) == 7:
-            buttons.append(day_buttons)
-            day_buttons = []
-    
-    while len(day_buttons) < 7:
-        day_buttons.append(InlineKeyboardButton(" ", callback_data="ignore"))
-    if day_buttons:
-        buttons.append(day_buttons)
-    
-    buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data="admin_menu")])
-    
-    return InlineKeyboardMarkup(buttons)
+def generate_calendar(year=None, month=None, availability=None):
+    return render_calendar("admin", year, month, availability)
 
-def date_picker():
+def date_picker(prefix="select_date_for_close", selected=(), offset=0, back="admin_close_slots", extra_rows=()):
+    """30 дней начиная с today + offset; selected — даты, отмеченные ✅ (выбор периода)"""
     from datetime import datetime, timedelta
-    today = datetime.today().date()
+    # Сегодня в часовом поясе салона, как в календаре и в get_free_times
+    today = local_today()
     dates = []
-    for i in range(30):
+    for i in range(offset, offset + 30):
         d = today + timedelta(days=i)
         dates.append(d.strftime("%Y-%m-%d"))
     
@@ -114,58 +75,101 @@ def date_picker():
             label = f"🚫 {d[5:]}"
         else:
             label = d[5:]
+        if d in selected:
+            label = f"✅ {d[5:]}"
             
-        row.append(InlineKeyboardButton(label, callback_data=f"select_date_for_close:{d}"))
+        row.append(InlineKeyboardButton(label, callback_data=f"{prefix}:{d}"))
         if len(row) == 7:
             buttons.append(row)
             row = []
     if row:
         buttons.append(row)
     
-    buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data="admin_close_slots")])
+    buttons.extend(extra_rows)
+    buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data=back)])
     return InlineKeyboardMarkup(buttons)
 
-def time_picker():
-    from datetime import datetime
-    import sqlite3
-    from contextlib import closing
-    
-    # Получаем рабочие часы из базы данных
-    try:
-        with closing(sqlite3.connect('bot.db')) as conn:
-            row = conn.execute("SELECT start_time, end_time FROM working_hours").fetchone()
-            if row:
-                start_time, end_time = row
-            else:
-                start_time, end_time = "09:00", "19:00"
-    except:
-        start_time, end_time = "09:00", "19:00"
+def _minutes(value):
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+def _clock(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def time_picker(working_hours, prefix="select_time_for_close", selected=(), back="close_time", extra_rows=()):
+    """Времена рабочего дня; working_hours — (начало, конец) из db.get_working_hours"""
+    start_time, end_time = working_hours
     
-    # Парсим время начала и окончания
+    # Парсим время начала и окончания (в минутах)
     try:
-        start_hour = int(start_time.split(':')[0])
-        end_hour = int(end_time.split(':')[0])
+        start_minute = _minutes(start_time)
+        end_minute = _minutes(end_time)
     except:
-        start_hour, end_hour = 9, 19
+        start_minute, end_minute = 9 * 60, 19 * 60
     
-    # Генерируем время в рабочих часах
+    # Генерируем слоты в рабочих часах с шагом TIME_SLOT_MINUTES
     times = []
-    for h in range(start_hour, end_hour):
-        times.append(f"{h:02d}:00")
+    for m in range(start_minute, end_minute, TIME_SLOT_MINUTES):
+        times.append(_clock(m))
     
     buttons = []
     row = []
     for t in times:
-        row.append(InlineKeyboardButton(f"🕐 {t}", callback_data=f"select_time_for_close:{t}"))
+        label = f"✅ {t}" if t in selected else f"🕐 {t}"
+        row.append(InlineKeyboardButton(label, callback_data=f"{prefix}:{t}"))
         if len(row) == 4:
             buttons.append(row)
             row = []
     if row:
         buttons.append(row)
     
-    buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data="close_time")])
+    buttons.extend(extra_rows)
+    buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data=back)])
     return InlineKeyboardMarkup(buttons)
 
+# === Массовое закрытие/открытие ===
+WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+def bulk_date_picker(selected, offset):
+    nav = []
+    if offset > 0:
+        nav.append(InlineKeyboardButton("⬅️ Раньше", callback_data=f"bulk_dates:{offset - 30}"))
+    nav.append(InlineKeyboardButton("Позже ➡️", callback_data=f"bulk_dates:{offset + 30}"))
+    extra = [nav]
+    if selected:
+        extra.append([InlineKeyboardButton("➡️ Дни недели", callback_data="bulk_weekdays")])
+    return date_picker("bulk_date", selected, offset, extra_rows=extra)
+
+def weekday_picker(selected):
+    row = [
+        InlineKeyboardButton(f"✅ {name}" if i in selected else name, callback_data=f"bulk_weekday:{i}")
+        for i, name in enumerate(WEEKDAYS)
+    ]
+    return InlineKeyboardMarkup([
+        row,
+        [InlineKeyboardButton("➡️ Время", callback_data="bulk_times")],
+        [InlineKeyboardButton("⬅️ Даты", callback_data="bulk_dates:0")]
+    ])
+
+def bulk_time_picker(selected, working_hours):
+    extra = [[InlineKeyboardButton("📅 Весь день", callback_data="bulk_review:day")]]
+    if selected:
+        extra.append([InlineKeyboardButton("➡️ Проверить", callback_data="bulk_review:time")])
+    return time_picker(working_hours, "bulk_time", selected, back="bulk_weekdays", extra_rows=extra)
+
+def bulk_review_menu():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("✅ Применить", callback_data="bulk_apply")],
+        [InlineKeyboardButton("⬅️ Время", callback_data="bulk_times")],
+        [InlineKeyboardButton("❌ Отмена", callback_data="admin_close_slots")]
+    ])
+
+def bulk_done_menu():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("↩️ Отменить операцию", callback_data="bulk_undo")],
+        [InlineKeyboardButton("⬅️ Назад", callback_data="admin_close_slots")]
+    ])
+
 def back_to_admin():
     return InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Назад", callback_data="admin_menu")]])
 
@@ -176,23 +180,61 @@ def delete_service_menu(services):
     buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data="admin_services")])
     return InlineKeyboardMarkup(buttons)
 
-def open_slots_menu(closed_slots):
+def admin_bookings_menu(next_cursor=None, first_page=True):
+    nav = []
+    if not first_page:
+        nav.append(InlineKeyboardButton("⏮ В начало", callback_data="admin_bookings"))
+    if next_cursor:
+        nav.append(InlineKeyboardButton("➡️ Дальше", callback_data=f"admin_bookings_page:{encode_cursor(*next_cursor)}"))
+    buttons = [nav] if nav else []
+    buttons.append([InlineKeyboardButton("📤 Выгрузить в файл", callback_data="admin_export_menu:csv:0")])
+    buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data="admin_menu")])
+    return InlineKeyboardMarkup(buttons)
+
+def admin_export_menu(fmt="csv", compress=False):
+    """Формат и сжатие переключаются на месте, кнопка периода запускает выгрузку"""
+    gz = int(compress)
+    def mark(on, title):
+        return f"✅ {title}" if on else title
+    def period(title, name):
+        return InlineKeyboardButton(title, callback_data=f"admin_export:{name}:{fmt}:{gz}")
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(mark(fmt == "csv", "CSV"), callback_data=f"admin_export_menu:csv:{gz}"),
+         InlineKeyboardButton(mark(fmt == "jsonl", "JSON Lines"), callback_data=f"admin_export_menu:jsonl:{gz}")],
+        [InlineKeyboardButton(mark(compress, "Сжать (gzip)"), callback_data=f"admin_export_menu:{fmt}:{1 - gz}")],
+        [period("Сегодня", "today"), period("7 дней", "week")],
+        [period("Этот месяц", "month"), period("Прошлый месяц", "prev_month")],
+        [period("За всё время", "all")],
+        [InlineKeyboardButton("⬅️ Назад", callback_data="admin_bookings")]
+    ])
+
+def open_slots_menu(closed_intervals, working_hours, next_cursor=None, first_page=True):
+    """Закрытое время слитыми интервалами; кнопка открывает интервал целиком"""
+    open_minute, close_minute = (_minutes(value) for value in working_hours)
     buttons = []
-    for date, time in closed_slots:
-        date_obj = datetime.strptime(date, "%Y-%m-%d").date()
-        weekday = date_obj.weekday()
-        
-        # Для понедельников показываем, что они закрыты по умолчанию
-        if weekday == 0:
-            continue
-            
-        if time is None:
+    # Показываем все интервалы страницы: пропуск строк здесь разошелся бы с курсором
+    # (страница могла бы выйти пустой, но с кнопкой "Дальше")
+    for date, start, end in closed_intervals:
+        if start <= open_minute and end >= close_minute:
             label = f"📅 {date} (весь день)"
-            callback = f"open_slot:{date}:all"
         else:
-            label = f"⏱ {date} {time}"
-            callback = f"open_slot:{date}:{time}"
-        buttons.append([InlineKeyboardButton(label, callback_data=callback)])
+            # Края за пределами рабочих часов не показываем (00:00–10:00 → 09:00–10:00)
+            shown_start, shown_end = max(start, open_minute), min(end, close_minute)
+            if shown_start >= shown_end:
+                shown_start, shown_end = start, end
+            label = f"⏱ {date} {_clock(shown_start)}–{_clock(shown_end)}"
+        # Понедельник — выходной в календаре клиента: после открытия день все равно не записать
+        if datetime.strptime(date, "%Y-%m-%d").weekday() == 0:
+            label += " · Пн, выходной"
+        buttons.append([InlineKeyboardButton(label, callback_data=f"open_slot:{date}:{start}:{end}")])
+    
+    nav = []
+    if not first_page:
+        nav.append(InlineKeyboardButton("⏮ В начало", callback_data="open_slots"))
+    if next_cursor:
+        nav.append(InlineKeyboardButton("➡️ Дальше", callback_data=f"open_slots_page:{next_cursor[0]}:{next_cursor[1]}"))
+    if nav:
+        buttons.append(nav)
     
     buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data="admin_close_slots")])
     return InlineKeyboardMarkup(buttons)
@@ -0,0 +1,140 @@
+# bot/calendar_keyboard.py
+# Общий рендер календаря для пользователя и админа.
+# Готовая разметка кэшируется (LRU) по (год, месяц, сегодня, вариант, отпечаток занятости),
+# поэтому листание месяцев не пересобирает 40+ кнопок на каждый клик.
+import functools
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from telegram import InlineKeyboardMarkup, InlineKeyboardButton
+
+from config import TIMEZONE
+
+CACHE_SIZE = 128
+
+MONTH_NAMES = ["Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+               "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"]
+WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+# Настройки вариантов календаря: префиксы callback_data, кнопка "Назад",
+# считаются ли понедельники выходными
+VARIANTS = {
+    "user": {
+        "nav": "user_calendar_nav",
+        "select": "user_calendar_select",
+        "back": "book",
+        "mondays_off": True,
+    },
+    "admin": {
+        "nav": "calendar_nav",
+        "select": "calendar_select",
+        "back": "admin_menu",
+        "mondays_off": False,
+    },
+}
+
+# Отметки дней, которые нельзя выбрать
+DAY_MARKS = {
+    "closed": "🔒",
+    "full": "⛔",
+}
+
+_tz = ZoneInfo(TIMEZONE)
+_cache_day = None
+
+
+def local_today():
+    """Сегодняшняя дата в часовом поясе салона"""
+    return datetime.now(_tz).date()
+
+
+def _days_in_month(year, month):
+    if month == 12:
+        return (date(year + 1, 1, 1) - date(year, month, 1)).days
+    return (date(year, month + 1, 1) - date(year, month, 1)).days
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _render(year, month, today, variant, availability):
+    options = VARIANTS[variant]
+    statuses = dict(availability)
+
+    first_weekday = date(year, month, 1).weekday()
+    days_in_month = _days_in_month(year, month)
+
+    prev_month = month - 1 if month > 1 else 12
+    prev_year = year if month > 1 else year - 1
+    next_month = month + 1 if month < 12 else 1
+    next_year = year if month < 12 else year + 1
+
+    buttons = [
+        [
+            InlineKeyboardButton("⬅️", callback_data=f"{options['nav']}:{prev_year}:{prev_month}"),
+            InlineKeyboardButton(f"{MONTH_NAMES[month-1]} {year}", callback_data="ignore"),
+            InlineKeyboardButton("➡️", callback_data=f"{options['nav']}:{next_year}:{next_month}")
+        ],
+        [InlineKeyboardButton(day, callback_data="ignore") for day in WEEKDAYS],
+    ]
+
+    day_buttons = [InlineKeyboardButton(" ", callback_data="ignore") for _ in range(first_weekday)]
+
+    for day in range(1, days_in_month + 1):
+        date_obj = date(year, month, day)
+        status = statuses.get(day)
+
+        if date_obj < today:
+            day_buttons.append(InlineKeyboardButton(f"❌{day}", callback_data="ignore"))
+        elif options["mondays_off"] and date_obj.weekday() == 0:
+            day_buttons.append(InlineKeyboardButton(f"🚫{day}", callback_data="ignore"))
+        elif status in DAY_MARKS and variant == "user":
+            day_buttons.append(InlineKeyboardButton(f"{DAY_MARKS[status]}{day}", callback_data="ignore"))
+        else:
+            label = f"{DAY_MARKS[status]}{day}" if status in DAY_MARKS else f"{day}"
+            day_buttons.append(InlineKeyboardButton(
+                label, callback_data=f"{options['select']}:{date_obj.isoformat()}"))
+
+        if len(day_buttons) == 7:
+            buttons.append(day_buttons)
+            day_buttons = []
+
+    if day_buttons:
+        while len(day_buttons) < 7:
+            day_buttons.append(InlineKeyboardButton(" ", callback_data="ignore"))
+        buttons.append(day_buttons)
+
+    buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data=options["back"])])
+
+    return InlineKeyboardMarkup(buttons)
+
+
+def render_calendar(variant, year=None, month=None, availability=None):
+    """Клавиатура-календарь на месяц.
+
+    availability — словарь {день: статус} для отметки закрытых/занятых дней
+    (по умолчанию берется из database.get_month_availability одним запросом на месяц).
+    Пользователь такие дни выбрать не может, админ видит отметку, но может открыть день.
+    """
+    global _cache_day
+    today = local_today()
+
+    # После полуночи старые разметки больше не нужны (сдвинулись прошедшие дни)
+    if today != _cache_day:
+        _render.cache_clear()
+        _cache_day = today
+
+    if year is None:
+        year = today.year
+    if month is None:
+        month = today.month
+
+    if availability is None:
+        from database import get_month_availability
+        availability = get_month_availability(year, month)
+
+    # В отпечаток попадают только статусы, которые меняют вид календаря
+    fingerprint = tuple(sorted((day, status) for day, status in availability.items() if status in DAY_MARKS))
+    return _render(year, month, today, variant, fingerprint)
+
+
+def cache_info():
+    return _render.cache_info()
@@ -1,46 +1,795 @@
-# bot/handlers.py - УПРОЩЕННАЯ ВЕРСИЯ
+# bot/handlers.py
+import os
+import tempfile
+from datetime import date as date_cls, timedelta
+
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import ContextTypes
 from telegram.error import BadRequest
 
+import async_database as db
+import database
+import tenants
+from config import ADMINS, TIME_SLOT_MINUTES
+from bot.router import CallbackRouter
+from bot.calendar_keyboard import local_today
+from bot import admin_keyboards, monitoring, notifications, reminders, slot_holds, tenancy, user_keyboards
+from bot.notifications import notify_admins
+from bot.render_cache import MARKUP, SKIP, renders
+from bot.sessions import sessions
+from bot.pagination import PAGE_SIZE, decode_time
+
 # Глобальная переменная для уведомлений
 application = None
 
+router = CallbackRouter()
+
 def set_application(app):
     global application
     application = app
 
-# Остальные функции пока упростим до базовых
-def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+def is_admin(user_id):
+    return user_id in ADMINS
+
+async def edit(query, text, reply_markup=None):
+    """Изменить сообщение, не падая на "message is not modified".
+
+    То, что уже показано, повторно не отправляется, а при изменении одной
+    клавиатуры меняется только она (bot/render_cache.py).
+    """
+    action = renders.plan(query.message, text, reply_markup)
+    if action == SKIP:
+        return
+    try:
+        if action == MARKUP:
+            await query.edit_message_reply_markup(reply_markup)
+        else:
+            await query.edit_message_text(text, reply_markup=reply_markup)
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            renders.forget(query.message)
+            raise
+    renders.remember(query.message, text, reply_markup)
+
+
+# === Команды и сообщения ===
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    
-    if user.id in [7320702445, 800358599]:  # Ваши ID админов
-        from bot.admin_keyboards import admin_main_menu
-        menu = admin_main_menu()
-        update.message.reply_text("🛠 Добро пожаловать в панель администратора!", reply_markup=menu)
-        return
-    
-    # Для обычных пользователей - простое сообщение
-    update.message.reply_text(
-        "👋 Привет! Я бот для записи в барбершоп.\n\n"
-        "Сейчас я настраиваюсь, скоро буду готов к работе!"
+
+    if is_admin(user.id):
+        menu = admin_keyboards.admin_main_menu(tenants.is_multi())
+        await update.message.reply_text("🛠 Добро пожаловать в панель администратора!", reply_markup=menu)
+        return
+
+    await update.message.reply_text(
+        "👋 Привет! Я бот для записи в барбершоп.",
+        reply_markup=user_keyboards.user_main_menu()
     )
 
-def contact_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    update.message.reply_text("✅ Контакт получен! Спасибо.")
+async def contact_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    contact = update.message.contact
+    await db.save_user(update.effective_user.id, update.effective_user.full_name, contact.phone_number)
+    await update.message.reply_text("✅ Контакт получен! Спасибо.", reply_markup=user_keyboards.user_main_menu())
 
-def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    query.answer()
-    query.edit_message_text("⏳ Функция в разработке...")
+async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    if is_admin(user.id):
+        await update.message.reply_text(f"🛠 Админ-панель{tenancy.label()}:", reply_markup=admin_keyboards.admin_main_menu(tenants.is_multi()))
+    else:
+        await update.message.reply_text("🚫 Доступ запрещён.")
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("🚫 Доступ запрещён.")
+        return
+    extra = {
+        "🧠 Кэш справочников": database.get_cache_stats(),
+        "⏳ Брони времени": slot_holds.get_stats(),
+        "📝 Сессии записи": {"active": len(sessions)},
+    }
+    if notifications.notifier is not None:
+        extra["📬 Уведомления"] = notifications.notifier.get_stats()
+    if reminders.schedulers:
+        extra["⏰ Напоминания"] = reminders.get_stats()
+    extra["🖼 Правки сообщений"] = renders.stats
+    stats = getattr(application.update_processor, "stats", None) if application else None
+    if stats:
+        extra["🚦 Антифлуд"] = stats
+    await update.message.reply_text(monitoring.format_stats(extra))
 
-def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def rebuild_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Пересчитать сводки отчетов с нуля (после правки длительности услуг или данных вручную)"""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("🚫 Доступ запрещён.")
+        return
+    rows = await db.rebuild_booking_stats()
+    await update.message.reply_text(f"✅ Сводки пересчитаны{tenancy.label()}: {rows} строк (день × услуга)")
+
+async def text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    if user.id in [7320702445, 800358599]:  # Ваши ID админов
-        from bot.admin_keyboards import admin_main_menu
-        update.message.reply_text("🛠 Админ-панель:", reply_markup=admin_main_menu())
+    awaiting = context.user_data.pop("awaiting", None)
+    text = update.message.text.strip()
+
+    if awaiting and is_admin(user.id):
+        if awaiting == "add_service":
+            # Формат: Название; цена; минуты
+            try:
+                name, price, duration = [part.strip() for part in text.split(";")]
+                await db.add_service(name, int(price), int(duration))
+            except ValueError:
+                context.user_data["awaiting"] = awaiting
+                await update.message.reply_text("❗ Формат: Название; цена; минуты")
+                return
+            await update.message.reply_text(f"✅ Услуга «{name}» добавлена", reply_markup=admin_keyboards.admin_services_menu())
+            return
+        if awaiting == "working_hours":
+            # Формат: 09:00-19:00
+            try:
+                start_time, end_time = [part.strip() for part in text.split("-")]
+                if len(start_time) != 5 or len(end_time) != 5 or start_time >= end_time:
+                    raise ValueError
+            except ValueError:
+                context.user_data["awaiting"] = awaiting
+                await update.message.reply_text("❗ Формат: 09:00-19:00")
+                return
+            await db.set_working_hours(start_time, end_time)
+            await update.message.reply_text(f"✅ График: {start_time}–{end_time}", reply_markup=admin_keyboards.admin_working_hours_menu())
+            return
+
+    await update.message.reply_text("📝 Воспользуйтесь меню:", reply_markup=(
+        admin_keyboards.admin_main_menu(tenants.is_multi()) if is_admin(user.id) else user_keyboards.user_main_menu()
+    ))
+
+async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await router.dispatch(update, context)
+
+async def unknown_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer("⏳ Функция в разработке...")
+
+router.fallback = unknown_button
+
+
+# === Запись (пользователь) ===
+async def show_user_calendar(query, year=None, month=None):
+    today = local_today()
+    year = year or today.year
+    month = month or today.month
+    availability = await db.get_month_availability(year, month)
+    await edit(query, "📅 Выберите дату:", user_keyboards.generate_user_calendar(year, month, availability))
+
+@router.route("back_to_main")
+async def back_to_main(update, context):
+    query = update.callback_query
+    await query.answer()
+    await edit(query, "👋 Главное меню:", user_keyboards.user_main_menu())
+
+async def show_services(query):
+    services = await db.get_services()
+    await edit(query, f"✂️ Выберите услугу{tenancy.label()}:", user_keyboards.service_menu(services))
+
+async def show_masters(query, next_action):
+    back = "admin_menu" if next_action == "admin_menu" else "back_to_main"
+    await edit(query, "👤 Выберите мастера:", user_keyboards.masters_menu(tenancy.masters(), next_action, back))
+
+@router.route("book")
+async def book(update, context):
+    query = update.callback_query
+    await query.answer()
+    if tenants.is_multi():
+        await show_masters(query, "book")
     else:
-        update.message.reply_text("🚫 Доступ запрещён.")
+        await show_services(query)
+
+@router.route("select_master", str, str)
+async def select_master(update, context, tenant_id, next_action):
+    query = update.callback_query
+    user_id = update.effective_user.id
+    if tenants.get(tenant_id) is None or (next_action == "admin_menu" and not is_admin(user_id)):
+        await query.answer("Мастер не найден")
+        return
+    await query.answer()
+    await slot_holds.release(user_id)
+    tenancy.choose(user_id, context.user_data, tenant_id)
+    if next_action == "my_bookings":
+        await show_my_bookings(query, user_id)
+    elif next_action == "admin_menu":
+        await show_admin_menu(query)
+    else:
+        await show_services(query)
+
+@router.route("select_service", str)
+async def select_service(update, context, service):
+    query = update.callback_query
+    await query.answer()
+    session = sessions.get(query.from_user.id)
+    session.service = service
+    session.date = session.time = None
+    await show_user_calendar(query)
+
+@router.route("user_calendar_nav", int, int)
+async def user_calendar_nav(update, context, year, month):
+    query = update.callback_query
+    await query.answer()
+    await show_user_calendar(query, year, month)
+
+@router.route("select_date_back")
+async def select_date_back(update, context):
+    query = update.callback_query
+    await query.answer()
+    session = sessions.peek(query.from_user.id)
+    date = session.date if session else None
+    if date:
+        await show_user_calendar(query, int(date[:4]), int(date[5:7]))
+    else:
+        await show_user_calendar(query)
+
+async def service_duration(service):
+    return next((d for name, _, d in await db.get_services() if name == service), TIME_SLOT_MINUTES)
+
+async def show_times(query, session, date):
+    service = session.service
+    times = await db.get_free_times(date, service)
+    # Время, которое сейчас подтверждают другие пользователи, не показываем
+    times = await slot_holds.filter_free(date, times, await service_duration(service), query.from_user.id)
+    text = f"🕐 Свободное время на {date}:" if times else f"😔 На {date} свободного времени нет"
+    await edit(query, text, user_keyboards.time_menu(times))
+
+@router.route("user_calendar_select", str)
+async def user_calendar_select(update, context, date):
+    query = update.callback_query
+    session = sessions.get(query.from_user.id)
+    if not session.service:
+        await query.answer("Сначала выберите услугу")
+        return
+    await query.answer()
+    session.date = date
+    await show_times(query, session, date)
+
+@router.route("select_time_back")
+async def select_time_back(update, context):
+    await slot_holds.release(update.effective_user.id)
+    session = sessions.peek(update.effective_user.id)
+    if not session or not session.date or not session.service:
+        await select_date_back(update, context)
+        return
+    await user_calendar_select(update, context, session.date)
+
+@router.route("select_time", str)
+async def select_time(update, context, time):
+    query = update.callback_query
+    session = sessions.get(query.from_user.id)
+    service, date = session.service, session.date
+    if not service or not date:
+        await query.answer("Начните запись заново")
+        return
+    if not await slot_holds.hold(query.from_user.id, date, time, await service_duration(service)):
+        await query.answer("😔 Это время только что выбрал другой клиент", show_alert=True)
+        await show_times(query, session, date)
+        return
+    await query.answer()
+    session.time = time
+    await edit(query, f"Подтвердите запись:\n✂️ {service}\n📅 {date} в {time}", user_keyboards.confirm_booking_menu())
+
+@router.route("confirm_booking")
+async def confirm_booking(update, context):
+    query = update.callback_query
+    user_id = update.effective_user.id
+    session = sessions.get(user_id)
+    service, date, time = session.service, session.date, session.time
+    if not (service and date and time):
+        await query.answer("Начните запись заново")
+        return
+    # Бронь могла истечь (или пропасть при перезапуске), и время уже держит другой клиент
+    if not await slot_holds.hold(user_id, date, time, await service_duration(service)):
+        await query.answer("😔 Это время только что выбрал другой клиент", show_alert=True)
+        session.time = None
+        await show_times(query, session, date)
+        return
+    price = next((p for name, p, _ in await db.get_services() if name == service), 0)
+    booking_id = await db.book_slot(user_id, service, date, time, price)
+    await slot_holds.release(user_id)
+    if booking_id is None:
+        await query.answer("😔 Это время уже занято", show_alert=True)
+        session.time = None
+        await show_times(query, session, date)
+        return
+    notify_admins(f"🆕 Новая запись{tenancy.label()}: {service}, {date} в {time} ({update.effective_user.full_name})")
+    sessions.drop(user_id)
+    await query.answer()
+    await edit(query, f"✅ Вы записаны!\n✂️ {service}\n📅 {date} в {time}\n💰 {price}₽", user_keyboards.user_main_menu())
+
+async def show_my_bookings(query, user_id, after=None):
+    bookings, next_cursor = await db.get_user_bookings_page(user_id, after, PAGE_SIZE)
+    text = f"📋 Ваши записи{tenancy.label()}:" if bookings or after else f"📋 У вас пока нет записей{tenancy.label()}"
+    await edit(query, text, user_keyboards.user_bookings_menu(bookings, next_cursor, first_page=after is None))
+
+@router.route("my_bookings")
+async def my_bookings(update, context):
+    query = update.callback_query
+    await query.answer()
+    # Записи лежат в базе каждого мастера отдельно — сначала выбираем мастера
+    if tenants.is_multi() and not tenancy.chosen(update.effective_user.id, context.user_data):
+        await show_masters(query, "my_bookings")
+        return
+    await show_my_bookings(query, update.effective_user.id)
+
+@router.route("my_bookings_page", str, str, int)
+async def my_bookings_page(update, context, date, time, booking_id):
+    query = update.callback_query
+    await query.answer()
+    await show_my_bookings(query, update.effective_user.id, (date, decode_time(time), booking_id))
+
+@router.route("booking", int)
+async def booking_detail(update, context, booking_id):
+    query = update.callback_query
+    booking = await db.get_booking_by_id_and_user(booking_id, update.effective_user.id)
+    if not booking:
+        await query.answer("Запись не найдена")
+        return
+    await query.answer()
+    service, date, time, price = booking
+    await edit(query, f"✂️ {service}\n📅 {date} в {time}\n💰 {price}₽", user_keyboards.booking_detail_menu(booking_id))
+
+@router.route("cancel_booking", int)
+async def cancel_booking(update, context, booking_id):
+    query = update.callback_query
+    booking = await db.get_booking_by_id_and_user(booking_id, update.effective_user.id)
+    if not booking:
+        await query.answer("Запись не найдена")
+        return
+    await db.delete_booking(booking_id)
+    service, date, time, _ = booking
+    notify_admins(f"❌ Отмена записи{tenancy.label()}: {service}, {date} в {time} ({update.effective_user.full_name})")
+    await query.answer("🗑 Запись отменена")
+    await show_my_bookings(query, update.effective_user.id)
+
+
+# === Админ-панель ===
+def admin_route(prefix, *arg_types):
+    """Маршрут только для администраторов"""
+    def decorator(func):
+        async def wrapper(update, context, *args):
+            if not is_admin(update.effective_user.id):
+                await update.callback_query.answer("🚫 Доступ запрещён")
+                return
+            await func(update, context, *args)
+        wrapper.__name__ = func.__name__
+        router.add(prefix, wrapper, *arg_types)
+        return func
+    return decorator
+
+async def show_admin_menu(query):
+    await edit(query, f"🛠 Админ-панель{tenancy.label()}:", admin_keyboards.admin_main_menu(tenants.is_multi()))
+
+@admin_route("admin_menu")
+async def admin_menu(update, context):
+    query = update.callback_query
+    await query.answer()
+    context.user_data.pop("awaiting", None)
+    await show_admin_menu(query)
+
+@admin_route("admin_masters")
+async def admin_masters(update, context):
+    query = update.callback_query
+    await query.answer()
+    await show_masters(query, "admin_menu")
+
+@admin_route("admin_services")
+async def admin_services(update, context):
+    query = update.callback_query
+    await query.answer()
+    services = await db.get_services()
+    lines = [f"• {name} — {price}₽ ({duration} мин)" for name, price, duration in services]
+    await edit(query, "✂️ Услуги:\n" + ("\n".join(lines) or "нет услуг"), admin_keyboards.admin_services_menu())
+
+@admin_route("admin_add_service")
+async def admin_add_service(update, context):
+    query = update.callback_query
+    await query.answer()
+    context.user_data["awaiting"] = "add_service"
+    await edit(query, "Отправьте услугу в формате:\nНазвание; цена; минуты", admin_keyboards.back_to_admin())
+
+async def show_delete_services(query):
+    services = await db.get_services()
+    await edit(query, "🗑 Какую услугу удалить?", admin_keyboards.delete_service_menu(services))
 
-def text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    update.message.reply_text("📝 Я получил ваше сообщение. Скоро буду полностью функционален!")
+@admin_route("admin_del_service")
+async def admin_del_service(update, context):
+    query = update.callback_query
+    await query.answer()
+    await show_delete_services(query)
+
+@admin_route("del_service", str)
+async def del_service(update, context, name):
+    query = update.callback_query
+    await db.delete_service(name)
+    await query.answer(f"Услуга «{name}» удалена")
+    await show_delete_services(query)
+
+@admin_route("admin_working_hours")
+async def admin_working_hours(update, context):
+    query = update.callback_query
+    await query.answer()
+    start_time, end_time = await db.get_working_hours()
+    await edit(query, f"🕘 График работы: {start_time}–{end_time}", admin_keyboards.admin_working_hours_menu())
+
+@admin_route("edit_working_hours")
+async def edit_working_hours(update, context):
+    query = update.callback_query
+    await query.answer()
+    context.user_data["awaiting"] = "working_hours"
+    await edit(query, "Отправьте график в формате 09:00-19:00", admin_keyboards.back_to_admin())
+
+@admin_route("admin_view_calendar")
+async def admin_view_calendar(update, context, year=None, month=None):
+    query = update.callback_query
+    await query.answer()
+    today = local_today()
+    year = year or today.year
+    month = month or today.month
+    availability = await db.get_month_availability(year, month)
+    await edit(query, "📅 Календарь записей:", admin_keyboards.generate_calendar(year, month, availability))
+
+@admin_route("calendar_nav", int, int)
+async def calendar_nav(update, context, year, month):
+    await admin_view_calendar(update, context, year, month)
+
+@admin_route("calendar_select", str)
+async def calendar_select(update, context, date):
+    query = update.callback_query
+    await query.answer()
+    bookings = await db.get_bookings_by_date(date)
+    lines = []
+    for booking_id, user_id, service, _, time, price in bookings:
+        user = await db.get_user(user_id)
+        client = f"{user[0]} {user[1]}" if user else f"id {user_id}"
+        lines.append(f"🕐 {time} — {service} ({price}₽), {client}")
+    text = f"📅 {date}\n" + ("\n".join(lines) if lines else "Записей нет")
+    await edit(query, text, InlineKeyboardMarkup([
+        [InlineKeyboardButton("⬅️ К календарю", callback_data=f"calendar_nav:{date[:4]}:{int(date[5:7])}")]
+    ]))
+
+async def show_admin_bookings(query, after=None):
+    bookings, next_cursor = await db.get_all_bookings_page(after, PAGE_SIZE)
+    lines = [f"📅 {date} {time} — {service} ({price}₽), id {user_id}"
+             for _, user_id, service, date, time, price in bookings]
+    text = "📋 Записи:\n" + "\n".join(lines) if lines else "📋 Записей нет"
+    await edit(query, text, admin_keyboards.admin_bookings_menu(next_cursor, first_page=after is None))
+
+@admin_route("admin_bookings")
+async def admin_bookings(update, context):
+    query = update.callback_query
+    await query.answer()
+    await show_admin_bookings(query)
+
+@admin_route("admin_bookings_page", str, str, int)
+async def admin_bookings_page(update, context, date, time, booking_id):
+    query = update.callback_query
+    await query.answer()
+    await show_admin_bookings(query, (date, decode_time(time), booking_id))
+
+# --- Отчеты (читают только сводки booking_stats / booking_hour_stats) ---
+REPORT_TITLES = {"today": "Сегодня", "week": "7 дней", "month": "Этот месяц", "prev_month": "Прошлый месяц"}
+
+def report_period(period, today):
+    """Первый и последний день периода отчета"""
+    if period == "today":
+        return today, today
+    if period == "week":
+        return today - timedelta(days=6), today
+    first = today.replace(day=1)
+    if period == "month":
+        return first, (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    last = first - timedelta(days=1)
+    return last.replace(day=1), last
+
+def _minutes(value):
+    return f"{value // 60} ч {value % 60} мин" if value >= 60 else f"{value} мин"
+
+async def show_report(query, period):
+    date_from, date_to = report_period(period, local_today())
+    services = await db.get_service_summary(date_from.isoformat(), date_to.isoformat())
+    hours = await db.get_hour_summary(date_from.isoformat(), date_to.isoformat())
+    lines = [f"📊 {REPORT_TITLES[period]}{tenancy.label()}: {date_from:%d.%m}–{date_to:%d.%m}", ""]
+    if not services:
+        lines.append("Записей нет")
+    else:
+        count = sum(row[1] for row in services)
+        revenue = sum(row[2] for row in services)
+        minutes = sum(row[3] for row in services)
+        start_time, end_time = await db.get_working_hours()
+        day_minutes = (int(end_time[:2]) * 60 + int(end_time[3:])) - (int(start_time[:2]) * 60 + int(start_time[3:]))
+        capacity = day_minutes * ((date_to - date_from).days + 1)
+        lines += [f"💰 Выручка: {revenue}₽", f"📋 Записей: {count}", f"⏱ Занято: {_minutes(minutes)}"]
+        if capacity > 0:
+            lines[-1] += f" ({minutes * 100 // capacity}% рабочего времени)"
+        lines += ["", "✂️ По услугам:"]
+        lines += [f"• {service} — {n} шт, {sum_}₽, {_minutes(busy)}" for service, n, sum_, busy in services]
+        if hours:
+            lines += ["", "🔥 Самые загруженные часы:"]
+            lines += [f"• {hour:02d}:00 — {n} зап." for hour, n in hours]
+    await edit(query, "\n".join(lines), admin_keyboards.admin_reports_menu())
+
+@admin_route("admin_reports")
+async def admin_reports(update, context):
+    query = update.callback_query
+    await query.answer()
+    await edit(query, f"📊 Отчеты{tenancy.label()}: выберите период", admin_keyboards.admin_reports_menu())
+
+@admin_route("admin_report", str)
+async def admin_report(update, context, period):
+    query = update.callback_query
+    if period not in REPORT_TITLES:
+        await query.answer("Неизвестный период")
+        return
+    await query.answer()
+    await show_report(query, period)
+
+# --- Выгрузка записей в файл (CSV / JSON Lines, см. database.export_bookings) ---
+# Файл пишется во временный каталог потоком с курсора и удаляется после отправки.
+# Отправляемый документ PTB читает в память целиком, а Bot API принимает до 50 МБ.
+EXPORT_MAX_BYTES = 50 * 1024 * 1024
+
+@admin_route("admin_export_menu", str, int)
+async def admin_export_menu(update, context, fmt, compress):
+    query = update.callback_query
+    await query.answer()
+    if fmt not in database.EXPORT_FORMATS:
+        fmt = "csv"
+    await edit(query, f"📤 Выгрузка записей{tenancy.label()}: формат и период",
+               admin_keyboards.admin_export_menu(fmt, bool(compress)))
+
+@admin_route("admin_export", str, str, int)
+async def admin_export(update, context, period, fmt, compress):
+    query = update.callback_query
+    if fmt not in database.EXPORT_FORMATS or (period != "all" and period not in REPORT_TITLES):
+        await query.answer("Неизвестный вариант выгрузки")
+        return
+    await query.answer("⏳ Готовлю файл…")
+    if period == "all":
+        date_from = date_to = None
+        title, suffix = "за всё время", "all"
+    else:
+        first, last = report_period(period, local_today())
+        date_from, date_to = first.isoformat(), last.isoformat()
+        title, suffix = f"{first:%d.%m.%Y}–{last:%d.%m.%Y}", f"{date_from}_{date_to}"
+    filename = f"bookings_{suffix}.{fmt}" + (".gz" if compress else "")
+    fd, path = tempfile.mkstemp(prefix="bookings_", suffix=".export")
+    os.close(fd)
+    try:
+        count = await db.export_bookings(path, fmt, bool(compress), date_from, date_to, include_archive=True)
+        if not count:
+            await query.message.reply_text(f"📤 Записей {title} нет")
+            return
+        if os.path.getsize(path) > EXPORT_MAX_BYTES:
+            await query.message.reply_text("📤 Файл больше 50 МБ — выберите период короче или включите сжатие")
+            return
+        with open(path, "rb") as f:
+            await query.message.reply_document(f, filename=filename,
+                                               caption=f"📤 Записи{tenancy.label()} {title}: {count}")
+    finally:
+        os.remove(path)
+
+@admin_route("admin_close_slots")
+async def admin_close_slots(update, context):
+    query = update.callback_query
+    await query.answer()
+    await edit(query, "🔒 Закрытие времени:", admin_keyboards.admin_close_slots_menu())
+
+@admin_route("close_day")
+async def close_day_menu(update, context):
+    query = update.callback_query
+    await query.answer()
+    context.user_data["close_mode"] = "day"
+    await edit(query, "📅 Какой день закрыть?", admin_keyboards.date_picker())
+
+@admin_route("close_time")
+async def close_time_menu(update, context):
+    query = update.callback_query
+    await query.answer()
+    context.user_data["close_mode"] = "time"
+    await edit(query, "📅 Выберите дату:", admin_keyboards.date_picker())
+
+@admin_route("select_date_for_close", str)
+async def select_date_for_close(update, context, date):
+    query = update.callback_query
+    if context.user_data.get("close_mode") == "day":
+        await db.close_day(date)
+        await query.answer(f"🔒 {date} закрыт")
+        await edit(query, f"🔒 День {date} закрыт", admin_keyboards.admin_close_slots_menu())
+        return
+    await query.answer()
+    context.user_data["close_date"] = date
+    await edit(query, f"⏱ Какое время закрыть {date}?", admin_keyboards.time_picker(await db.get_working_hours()))
+
+@admin_route("select_time_for_close", str)
+async def select_time_for_close(update, context, time):
+    query = update.callback_query
+    date = context.user_data.get("close_date")
+    if not date:
+        await query.answer("Сначала выберите дату")
+        return
+    await db.close_time(date, time)
+    await query.answer(f"🔒 {date} {time} закрыто")
+
+# --- Массовое закрытие и открытие периода ---
+BULK_ACTIONS = {"close": "Закрыть", "open": "Открыть"}
+
+def _to_minutes(value):
+    return int(value[:2]) * 60 + int(value[3:5])
+
+def _clock(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def _pick_range(first, last, value):
+    """Первое нажатие — начало периода, второе — конец, третье начинает заново"""
+    if first is None or last is not None:
+        return value, None
+    return (first, value) if value >= first else (value, first)
+
+def _bulk_dates(bulk):
+    if bulk["from"] is None:
+        return set()
+    first = date_cls.fromisoformat(bulk["from"])
+    last = date_cls.fromisoformat(bulk["to"] or bulk["from"])
+    return {(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)}
+
+def _bulk_times(bulk):
+    if bulk["start"] is None:
+        return set()
+    first, last = _to_minutes(bulk["start"]), _to_minutes(bulk["end"] or bulk["start"])
+    return {_clock(m) for m in range(first, last + 1, TIME_SLOT_MINUTES)}
+
+def _bulk_summary(bulk):
+    weekdays = bulk["weekdays"]
+    lines = [
+        f"📆 {BULK_ACTIONS[bulk['action']]} период{tenancy.label()}:",
+        f"• даты: {bulk['from']} – {bulk['to'] or bulk['from']}",
+        "• дни недели: " + ("все" if len(weekdays) == 7 else ", ".join(admin_keyboards.WEEKDAYS[i] for i in sorted(weekdays))),
+    ]
+    if bulk["start"] is None:
+        lines.append("• весь день" if bulk["action"] == "close" else "• дни целиком, вместе с закрытыми часами")
+    else:
+        lines.append(f"• время: {bulk['start']}–{bulk['end'] or bulk['start']} (включительно)")
+    return "\n".join(lines)
+
+async def get_bulk(update, context):
+    bulk = context.user_data.get("bulk")
+    if bulk is None:
+        await update.callback_query.answer("Начните заново")
+        return None
+    await update.callback_query.answer()
+    return bulk
+
+async def show_bulk_dates(query, bulk):
+    text = f"📆 {BULK_ACTIONS[bulk['action']]} период: выберите первый и последний день"
+    if bulk["from"]:
+        text += f"\nВыбрано: {bulk['from']} – {bulk['to'] or bulk['from']}"
+    await edit(query, text, admin_keyboards.bulk_date_picker(_bulk_dates(bulk), bulk["offset"]))
+
+@admin_route("bulk", str)
+async def bulk_start(update, context, action):
+    query = update.callback_query
+    if action not in BULK_ACTIONS:
+        await query.answer("Неизвестное действие")
+        return
+    await query.answer()
+    bulk = context.user_data["bulk"] = {
+        "action": action, "from": None, "to": None, "weekdays": set(range(7)),
+        "start": None, "end": None, "offset": 0,
+    }
+    await show_bulk_dates(query, bulk)
+
+@admin_route("bulk_dates", int)
+async def bulk_dates(update, context, offset):
+    bulk = await get_bulk(update, context)
+    if bulk:
+        bulk["offset"] = max(0, offset)
+        await show_bulk_dates(update.callback_query, bulk)
+
+@admin_route("bulk_date", str)
+async def bulk_date(update, context, date):
+    bulk = await get_bulk(update, context)
+    if bulk:
+        bulk["from"], bulk["to"] = _pick_range(bulk["from"], bulk["to"], date)
+        await show_bulk_dates(update.callback_query, bulk)
+
+@admin_route("bulk_weekdays")
+async def bulk_weekdays(update, context):
+    bulk = await get_bulk(update, context)
+    if bulk:
+        await edit(update.callback_query, "📆 Какие дни недели?", admin_keyboards.weekday_picker(bulk["weekdays"]))
+
+@admin_route("bulk_weekday", int)
+async def bulk_weekday(update, context, weekday):
+    bulk = await get_bulk(update, context)
+    if bulk:
+        bulk["weekdays"] ^= {weekday}
+        await edit(update.callback_query, "📆 Какие дни недели?", admin_keyboards.weekday_picker(bulk["weekdays"]))
+
+@admin_route("bulk_times")
+async def bulk_times(update, context):
+    bulk = await get_bulk(update, context)
+    if bulk:
+        await edit(update.callback_query, "⏱ Весь день или первое и последнее время:",
+                   admin_keyboards.bulk_time_picker(_bulk_times(bulk), await db.get_working_hours()))
+
+@admin_route("bulk_time", str)
+async def bulk_time(update, context, time):
+    bulk = await get_bulk(update, context)
+    if bulk:
+        bulk["start"], bulk["end"] = _pick_range(bulk["start"], bulk["end"], time)
+        await edit(update.callback_query, "⏱ Весь день или первое и последнее время:",
+                   admin_keyboards.bulk_time_picker(_bulk_times(bulk), await db.get_working_hours()))
+
+@admin_route("bulk_review", str)
+async def bulk_review(update, context, mode):
+    bulk = await get_bulk(update, context)
+    if not bulk:
+        return
+    if mode == "day":
+        bulk["start"] = bulk["end"] = None
+    if not bulk["from"] or not bulk["weekdays"]:
+        await edit(update.callback_query, "❗ Не выбраны даты или дни недели", admin_keyboards.admin_close_slots_menu())
+        return
+    await edit(update.callback_query, _bulk_summary(bulk), admin_keyboards.bulk_review_menu())
+
+@admin_route("bulk_apply")
+async def bulk_apply(update, context):
+    query = update.callback_query
+    bulk = context.user_data.pop("bulk", None)
+    if bulk is None or not bulk["from"]:
+        await query.answer("Начните заново")
+        return
+    end = None
+    if bulk["start"] is not None:
+        # Последний выбранный слот входит в период
+        end = _clock(_to_minutes(bulk["end"] or bulk["start"]) + TIME_SLOT_MINUTES)
+    apply = db.close_range if bulk["action"] == "close" else db.open_range
+    weekdays = None if len(bulk["weekdays"]) == 7 else sorted(bulk["weekdays"])
+    changed = await apply(bulk["from"], bulk["to"] or bulk["from"], weekdays, bulk["start"], end)
+    # Отмена применяет обратное действие ровно к измененным интервалам
+    context.user_data["bulk_undo"] = {"action": bulk["action"], "intervals": changed, "tenant": database.current_tenant()}
+    done = "🔒 Закрыто" if bulk["action"] == "close" else "🔓 Открыто"
+    await query.answer(f"{done}: {len(changed)}")
+    await edit(query, f"{_bulk_summary(bulk)}\n\n{done} интервалов: {len(changed)}", admin_keyboards.bulk_done_menu())
+
+@admin_route("bulk_undo")
+async def bulk_undo(update, context):
+    query = update.callback_query
+    undo = context.user_data.pop("bulk_undo", None)
+    if undo is None or undo["tenant"] != database.current_tenant():
+        await query.answer("Нечего отменять")
+        return
+    if undo["action"] == "close":
+        changed = await db.open_intervals(undo["intervals"])
+    else:
+        changed = await db.close_intervals(undo["intervals"])
+    await query.answer("↩️ Отменено")
+    await edit(query, f"↩️ Операция отменена, изменено интервалов: {len(changed)}", admin_keyboards.admin_close_slots_menu())
+
+async def show_open_slots(query, after=None):
+    closed, next_cursor = await db.get_closed_intervals_page(after, PAGE_SIZE)
+    hours = await db.get_working_hours()
+    await edit(query, "🔓 Закрытое время:",
+               admin_keyboards.open_slots_menu(closed, hours, next_cursor, first_page=after is None))
+
+@admin_route("open_slots")
+async def open_slots(update, context):
+    query = update.callback_query
+    await query.answer()
+    await show_open_slots(query)
+
+@admin_route("open_slots_page", str, int)
+async def open_slots_page(update, context, date, start):
+    query = update.callback_query
+    await query.answer()
+    await show_open_slots(query, (date, start))
+
+@admin_route("open_slot", str, int, int)
+async def open_slot(update, context, date, start, end):
+    query = update.callback_query
+    await db.open_intervals([(date, start, end)])
+    await query.answer("🔓 Открыто")
+    await show_open_slots(query)
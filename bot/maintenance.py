@@ -0,0 +1,66 @@
+# bot/maintenance.py
+# Фоновое обслуживание базы: перенос прошедших записей в архив.
+# Пачки идут через поток-писатель мастера по одной, между ними успевают
+# выполниться живые запросы, поэтому перенос не блокирует бота.
+import asyncio
+import logging
+from datetime import timedelta
+
+import async_database as db
+import database
+import tenants
+from config import ARCHIVE_AFTER_DAYS
+from bot.calendar_keyboard import local_today
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_INTERVAL = 6 * 60 * 60
+# Первый проход откладываем, чтобы перенос не занимал поток-писатель сразу после старта
+FIRST_RUN_DELAY = 60
+BATCH_PAUSE = 0.05
+
+_task = None
+
+
+async def archive_once(days=ARCHIVE_AFTER_DAYS):
+    """Перенести в архив записи старше days дней; вернуть их количество"""
+    before_date = (local_today() - timedelta(days=days)).isoformat()
+    total = 0
+    while True:
+        moved = await db.archive_bookings_batch(before_date)
+        total += moved
+        if moved == 0:
+            break
+        await asyncio.sleep(BATCH_PAUSE)
+    if total:
+        logger.info(f"В архив перенесено записей: {total}")
+    return total
+
+
+async def _run():
+    await asyncio.sleep(FIRST_RUN_DELAY)
+    while True:
+        for tenant_id in tenants.all_ids():
+            try:
+                with database.use_tenant(tenant_id):
+                    await archive_once()
+            except Exception:
+                logger.exception(f"Ошибка архивации записей ({tenant_id})")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+
+def start():
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_run(), name="maintenance")
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,110 @@
+# bot/monitoring.py
+# Снятие метрик с бота: время обработчиков и вызовов Bot API, HTTP-эндпоинт
+# для Prometheus (GET /metrics) и текст для админской команды /stats.
+# Сами гистограммы и учет SQL — в metrics.py.
+import asyncio
+import functools
+import logging
+import time
+
+from telegram.request import HTTPXRequest
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Как у HTTPXRequest по умолчанию в ApplicationBuilder
+CONNECTION_POOL_SIZE = 256
+
+_server = None
+
+
+def timed_handler(name, func):
+    """Обработчик PTB, время которого попадает в bot_handler_seconds{handler=name}"""
+    @functools.wraps(func)
+    async def wrapper(update, context):
+        with metrics.timer("bot_handler_seconds", name):
+            return await func(update, context)
+    return wrapper
+
+
+class TimedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest, замеряющий каждый вызов Bot API по имени метода"""
+
+    def __init__(self, connection_pool_size=CONNECTION_POOL_SIZE, **kwargs):
+        super().__init__(connection_pool_size=connection_pool_size, **kwargs)
+
+    async def do_request(self, url, method, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        finally:
+            metrics.observe("bot_api_seconds", url.rsplit("/", 1)[-1], time.perf_counter() - start)
+
+
+# === Эндпоинт /metrics ===
+async def _handle(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        # Заголовки запроса не нужны, но их надо дочитать
+        while (await asyncio.wait_for(reader.readline(), 5)).strip():
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status, body = "200 OK", metrics.render_prometheus().encode()
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(host, port):
+    global _server
+    if _server is None:
+        _server = await asyncio.start_server(_handle, host, port)
+        logger.info(f"📈 Метрики: http://{host}:{port}/metrics")
+
+
+async def stop_server():
+    global _server
+    if _server is not None:
+        _server.close()
+        await _server.wait_closed()
+        _server = None
+
+
+# === /stats ===
+def _ms(seconds):
+    return f"{seconds * 1000:.0f}" if seconds >= 0.01 else f"{seconds * 1000:.1f}"
+
+
+def _section(title, rows, limit):
+    if not rows:
+        return []
+    lines = [title]
+    for label, count, total, p50, p95, _ in rows[:limit]:
+        lines.append(f"• {label[:60]} — {count} шт, p50 {_ms(p50)} / p95 {_ms(p95)} мс, всего {_ms(total)} мс")
+    return lines
+
+
+def format_stats(extra=None, limit=8):
+    """Краткая сводка для админа: самые затратные обработчики, запросы и методы API"""
+    lines = ["📈 Статистика с момента запуска", ""]
+    lines += _section("⚙️ Обработчики:", metrics.snapshot("bot_handler_seconds"), limit)
+    lines += _section("🗄 SQL:", metrics.snapshot("bot_sql_seconds"), limit)
+    lines += _section("📡 Bot API:", metrics.snapshot("bot_api_seconds"), limit)
+    for title, values in (extra or {}).items():
+        if values:
+            lines.append(f"{title}: " + ", ".join(f"{k} {v}" for k, v in values.items()))
+    if len(lines) == 2:
+        lines.append("Данных пока нет")
+    return "\n".join(lines)
@@ -0,0 +1,151 @@
+# bot/notifications.py
+# Фоновая очередь уведомлений админам.
+# Обработчик только кладет событие в очередь и сразу отвечает пользователю;
+# отправкой занимается отдельная задача с ограничением скорости (общий и
+# по-чатовый token bucket), а всплески событий склеиваются в одну сводку.
+import asyncio
+import logging
+import time
+
+from telegram.error import RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram: ~30 сообщений в секунду всего и ~1 в секунду в один чат
+GLOBAL_RATE = 25
+CHAT_RATE = 1
+# Окно склейки: события внутри окна уходят одной сводкой
+DIGEST_WINDOW = 60
+QUEUE_SIZE = 1000
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self):
+        while not self.try_acquire():
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdminNotifier:
+    def __init__(self, bot, admin_ids, window=DIGEST_WINDOW):
+        self.bot = bot
+        self.admin_ids = list(admin_ids)
+        self.window = window
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.global_bucket = TokenBucket(GLOBAL_RATE)
+        self.chat_buckets = {}
+        self.stats = {"queued": 0, "dropped": 0, "digests": 0, "coalesced": 0, "sent": 0, "failed": 0}
+        self._task = None
+        self._last_flush = 0.0
+
+    def notify(self, text):
+        """Поставить событие в очередь (не блокирует обработчик)"""
+        try:
+            self.queue.put_nowait(text)
+            self.stats["queued"] += 1
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            logger.warning("Очередь уведомлений переполнена, событие отброшено")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="admin-notifier")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self):
+        return dict(self.stats, pending=self.queue.qsize())
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            # Первое событие после затишья отправляем сразу, дальше — сводкой раз в окно
+            wait_until = self._last_flush + self.window
+            while time.monotonic() < wait_until:
+                # Не wait_for: в Python 3.11 он теряет отмену, если событие пришло
+                # одновременно с ней, и stop() зависает
+                getter = asyncio.ensure_future(self.queue.get())
+                try:
+                    done, _ = await asyncio.wait((getter,), timeout=wait_until - time.monotonic())
+                finally:
+                    if not getter.done():
+                        getter.cancel()
+                if not done:
+                    break
+                batch.append(getter.result())
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            self._last_flush = time.monotonic()
+            await self._send_all(self._format(batch))
+
+    def _format(self, batch):
+        if len(batch) == 1:
+            return batch[0]
+        self.stats["digests"] += 1
+        self.stats["coalesced"] += len(batch) - 1
+        minutes = max(1, round(self.window / 60))
+        lines = "\n\n".join(batch[:20])
+        more = f"\n\n…и еще {len(batch) - 20}" if len(batch) > 20 else ""
+        return f"📬 {len(batch)} событий за последние {minutes} мин:\n\n{lines}{more}"
+
+    async def _send_all(self, text):
+        for chat_id in self.admin_ids:
+            bucket = self.chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = self.chat_buckets[chat_id] = TokenBucket(CHAT_RATE)
+            await self.global_bucket.acquire()
+            await bucket.acquire()
+            await self._send(chat_id, text)
+
+    async def _send(self, chat_id, text):
+        for _ in range(2):
+            try:
+                await self.bot.send_message(chat_id, text)
+                self.stats["sent"] += 1
+                return
+            except RetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+            except TelegramError as e:
+                logger.warning(f"Не удалось уведомить админа {chat_id}: {e}")
+                break
+        self.stats["failed"] += 1
+
+
+notifier = None
+
+
+def setup_notifier(bot, admin_ids):
+    global notifier
+    notifier = AdminNotifier(bot, admin_ids)
+    notifier.start()
+    return notifier
+
+
+def notify_admins(text):
+    """Уведомить админов, если уведомления включены и очередь запущена"""
+    if notifier is not None:
+        notifier.notify(text)
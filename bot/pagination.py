@@ -0,0 +1,18 @@
+# bot/pagination.py
+# Курсоры постраничных списков в callback_data.
+# Курсор — ключ последней строки страницы: дата, время (без двоеточия, чтобы не
+# путать с разделителем аргументов) и, для записей, id. Время None — "весь день".
+PAGE_SIZE = 10
+
+
+def encode_cursor(date, time, row_id=None):
+    time_part = time.replace(":", "") if time else "all"
+    if row_id is None:
+        return f"{date}:{time_part}"
+    return f"{date}:{time_part}:{row_id}"
+
+
+def decode_time(value):
+    if value == "all":
+        return None
+    return f"{value[:2]}:{value[2:]}"
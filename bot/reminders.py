@@ -0,0 +1,244 @@
+# bot/reminders.py
+# Напоминания клиентам о записи.
+# В памяти держим только ближайшее окно записей в min-heap по времени напоминания;
+# по мере продвижения окна догружаем из bookings страницами (keyset по date, time, id).
+# Новые и отмененные записи попадают в планировщик сразу через подписку на database.
+# Отправка отмечается в reminders_sent до отправки, поэтому после перезапуска
+# напоминание не уйдет повторно.
+# У каждого мастера (tenants.py) свой планировщик: его задача работает с базой мастера.
+# При нескольких процессах-воркерах напоминания шлет только первый из них, а записи,
+# сделанные в других процессах, он раз в POLL_INTERVAL догружает по id (подписка на
+# database видит только свой процесс). Отмененную запись отсекает mark_reminder_sent.
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import async_database as db
+import database
+import tenants
+from config import TIMEZONE, REMINDER_MINUTES_BEFORE, WORKERS
+from bot.notifications import TokenBucket
+from bot.tenancy import label
+
+logger = logging.getLogger(__name__)
+
+# Сколько вперед (по времени начала записи) держать в памяти
+WINDOW = timedelta(hours=6)
+PAGE_SIZE = 500
+SEND_RATE = 20
+POLL_INTERVAL = 30
+# Ключ "все до границы окна загружено" для keyset-курсора
+_END_OF_WINDOW_ID = 2 ** 62
+
+
+def _local_now():
+    return datetime.now(ZoneInfo(TIMEZONE)).replace(tzinfo=None)
+
+
+def _start_of(date, time):
+    return datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
+
+
+class ReminderScheduler:
+    def __init__(self, send, before=None, window=WINDOW, now=_local_now, send_rate=SEND_RATE, tenant=None,
+                 poll_interval=None):
+        """send(user_id, text) — корутина отправки сообщения;
+        poll_interval — вместо подписки на database опрашивать новые записи (несколько процессов)"""
+        self.send = send
+        self.tenant = tenant or tenants.DEFAULT_ID
+        self.before = before if before is not None else timedelta(minutes=REMINDER_MINUTES_BEFORE)
+        self.window = window
+        self.now = now
+        self.heap = []
+        self.cancelled = set()
+        self.stats = {"loaded": 0, "sent": 0, "skipped": 0, "pages": 0}
+        self._bucket = TokenBucket(send_rate)
+        self.poll_interval = poll_interval
+        self._last_id = None
+        self._cursor = None
+        self._until = None
+        # id записей, пришедших через _apply_change во время refill (None — refill не идет)
+        self._arrived = None
+        self._wakeup = None
+        self._loop = None
+        self._task = None
+
+    # --- загрузка окна ---
+    def _push(self, booking_id, user_id, service, date, time):
+        start = _start_of(date, time)
+        heapq.heappush(self.heap, (start - self.before, booking_id, user_id, service, date, time))
+        self.stats["loaded"] += 1
+
+    async def refill(self):
+        """Догрузить записи, начинающиеся до now + before + window"""
+        now = self.now()
+        if self._cursor is None:
+            self._cursor = (now.strftime("%Y-%m-%d"), now.strftime("%H:%M"), _END_OF_WINDOW_ID)
+        horizon = now + self.before + self.window
+        until = (horizon.strftime("%Y-%m-%d"), horizon.strftime("%H:%M"))
+        if self._until is not None and until <= self._until:
+            return
+        # Границу окна сдвигаем до запроса: запись, сделанная во время чтения страниц,
+        # может не попасть в их снимок, но _apply_change ее уже примет. Такие записи
+        # запоминаем, чтобы не положить их в кучу второй раз, если запрос их все же увидит.
+        previous, self._until = self._until, until
+        self._arrived = set()
+        try:
+            while True:
+                rows = await db.get_upcoming_bookings(self._cursor, until, PAGE_SIZE)
+                self.stats["pages"] += 1
+                for booking_id, user_id, service, date, time in rows:
+                    if booking_id not in self._arrived:
+                        self._push(booking_id, user_id, service, date, time)
+                if len(rows) < PAGE_SIZE:
+                    break
+                last = rows[-1]
+                self._cursor = (last[3], last[4], last[0])
+        except BaseException:
+            # Следующий refill повторит чтение с того же курсора
+            self._until = previous
+            raise
+        finally:
+            self._arrived = None
+        self._cursor = (*until, _END_OF_WINDOW_ID)
+
+    def next_refill_at(self):
+        if self._until is None:
+            return self.now()
+        return _start_of(*self._until) - self.before - self.window / 2
+
+    async def poll_new(self):
+        """Догрузить в окно записи с id больше последнего виденного"""
+        if self._last_id is None:
+            self._last_id = await db.get_last_booking_id()
+            return
+        while True:
+            rows = await db.get_bookings_after_id(self._last_id, PAGE_SIZE)
+            for booking_id, user_id, service, date, time in rows:
+                # Записи за границей окна подгрузятся позже страницей
+                if self._until is not None and (date, time) <= self._until:
+                    self._push(booking_id, user_id, service, date, time)
+            if rows:
+                self._last_id = rows[-1][0]
+            if len(rows) < PAGE_SIZE:
+                break
+
+    # --- изменения записей ---
+    def on_booking_change(self, event, payload):
+        """Подписчик database: вызывается из потока записи в БД"""
+        if self._loop is None or database.current_tenant() != self.tenant:
+            return
+        self._loop.call_soon_threadsafe(self._apply_change, event, payload)
+
+    def _apply_change(self, event, payload):
+        if event == "added":
+            booking_id, user_id, service, date, time, _ = payload
+            # Записи за границей окна подгрузятся позже страницей
+            if self._until is not None and (date, time) <= self._until:
+                self._push(booking_id, user_id, service, date, time)
+                if self._arrived is not None:
+                    self._arrived.add(booking_id)
+        elif event == "deleted":
+            self.cancelled.add(payload)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # --- цикл отправки ---
+    async def pop_due(self):
+        """Отправить все наступившие напоминания; вернуть их количество"""
+        sent = 0
+        now = self.now()
+        while self.heap and self.heap[0][0] <= now:
+            _, booking_id, user_id, service, date, time = heapq.heappop(self.heap)
+            if booking_id in self.cancelled:
+                self.cancelled.discard(booking_id)
+                self.stats["skipped"] += 1
+                continue
+            if _start_of(date, time) <= now or not await db.mark_reminder_sent(booking_id):
+                self.stats["skipped"] += 1
+                continue
+            await self._bucket.acquire()
+            try:
+                await self.send(user_id, f"⏰ Напоминаем о записи{label(self.tenant)}: {service}, {date} в {time}")
+                self.stats["sent"] += 1
+                sent += 1
+            except Exception as e:
+                logger.warning(f"Не удалось отправить напоминание по записи {booking_id}: {e}")
+        # Отмененные записи, которых уже нет в куче, больше не нужны
+        if not self.heap:
+            self.cancelled.clear()
+        return sent
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            if self.poll_interval is not None:
+                await self.poll_new()
+            if self.now() >= self.next_refill_at():
+                await self.refill()
+            await self.pop_due()
+            wake_at = self.next_refill_at()
+            if self.heap:
+                wake_at = min(wake_at, self.heap[0][0])
+            timeout = min(max(0.0, (wake_at - self.now()).total_seconds()), self.poll_interval or 300)
+            self._wakeup.clear()
+            # asyncio.wait, а не wait_for: тот на 3.11 может проглотить отмену при stop()
+            waiter = asyncio.ensure_future(self._wakeup.wait())
+            try:
+                await asyncio.wait((waiter,), timeout=timeout)
+            finally:
+                waiter.cancel()
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self.poll_interval is None:
+            database.add_booking_listener(self.on_booking_change)
+        # Задача наследует контекст: все запросы цикла идут в базу своего мастера
+        with database.use_tenant(self.tenant):
+            self._task = asyncio.create_task(self.run(), name=f"reminders-{self.tenant}")
+
+    async def stop(self):
+        database.remove_booking_listener(self.on_booking_change)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self):
+        return dict(self.stats, in_memory=len(self.heap))
+
+
+schedulers = {}  # tenant_id -> ReminderScheduler
+
+
+def setup_reminders(bot):
+    async def send(user_id, text):
+        await bot.send_message(user_id, text)
+
+    for tenant_id in tenants.all_ids():
+        if tenant_id not in schedulers:
+            schedulers[tenant_id] = ReminderScheduler(
+                send, tenant=tenant_id, poll_interval=POLL_INTERVAL if WORKERS > 1 else None)
+            schedulers[tenant_id].start()
+    return schedulers
+
+
+async def stop_reminders():
+    for scheduler in schedulers.values():
+        await scheduler.stop()
+    schedulers.clear()
+
+
+def get_stats():
+    """Сводка по всем мастерам"""
+    total = {}
+    for scheduler in schedulers.values():
+        for key, value in scheduler.get_stats().items():
+            total[key] = total.get(key, 0) + value
+    return total
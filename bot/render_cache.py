@@ -0,0 +1,80 @@
+# bot/render_cache.py
+# Что сейчас показано в сообщениях бота: хэши текста и клавиатуры по (чат, сообщение).
+# handlers.edit сверяется с ними перед вызовом Bot API:
+# - текст и клавиатура те же (повторное нажатие того же меню) — ничего не отправляем;
+# - изменилась только клавиатура (листание календаря, отметки в выборе дней и времени) —
+#   editMessageReplyMarkup вместо editMessageText;
+# - иначе — обычный editMessageText.
+# Для сообщения, которого нет в кэше (после перезапуска или вытеснения), берем
+# содержимое из callback_query.message — Telegram присылает его вместе с нажатием.
+# Все обновления пользователя идут через один процесс (bot/workers.py), поэтому
+# кэш в памяти процесса не расходится с тем, что видит пользователь.
+from collections import OrderedDict
+
+import metrics
+from config import RENDER_CACHE_SIZE
+
+SKIP = "skip"
+MARKUP = "markup"
+FULL = "full"
+
+
+def _digest(text, markup):
+    return hash(text), hash(markup)
+
+
+class RenderCache:
+    def __init__(self, size=RENDER_CACHE_SIZE):
+        self.size = size
+        # (chat_id, message_id) -> (хэш текста, хэш клавиатуры), от старых к новым
+        self._shown = OrderedDict()
+        self.stats = {"full": 0, "markup_only": 0, "skipped": 0}
+
+    @staticmethod
+    def _key(message):
+        if message is None:
+            return None
+        return message.chat.id, message.message_id
+
+    def plan(self, message, text, markup):
+        """Какой вызов нужен, чтобы сообщение показало text и markup: SKIP, MARKUP или FULL"""
+        key = self._key(message) if self.size else None
+        if key is None:
+            self.stats["full"] += 1
+            return FULL
+        shown = self._shown.get(key)
+        if shown is None and message.text is not None:
+            shown = _digest(message.text, message.reply_markup)
+        wanted = _digest(text, markup)
+        if shown == wanted:
+            action = SKIP
+            self.stats["skipped"] += 1
+        elif shown is not None and shown[0] == wanted[0]:
+            action = MARKUP
+            self.stats["markup_only"] += 1
+        else:
+            self.stats["full"] += 1
+            return FULL
+        metrics.inc("bot_edits_saved_total", action)
+        return action
+
+    def remember(self, message, text, markup):
+        key = self._key(message) if self.size else None
+        if key is None:
+            return
+        self._shown[key] = _digest(text, markup)
+        self._shown.move_to_end(key)
+        if len(self._shown) > self.size:
+            self._shown.popitem(last=False)
+
+    def forget(self, message):
+        """Содержимое сообщения неизвестно (правка не прошла)"""
+        key = self._key(message)
+        if key is not None:
+            self._shown.pop(key, None)
+
+    def __len__(self):
+        return len(self._shown)
+
+
+renders = RenderCache()
@@ -0,0 +1,81 @@
+# bot/router.py
+# Маршрутизация callback-запросов по префиксу callback_data.
+# Строка разбирается один раз ("prefix:arg1:arg2"), обработчик ищется в словаре,
+# аргументы приводятся к нужным типам и передаются обработчику.
+import logging
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+IGNORE = "ignore"
+
+
+class CallbackRouter:
+    def __init__(self):
+        self._routes = {}
+        self.fallback = None
+
+    def route(self, prefix, *arg_types):
+        """Декоратор: зарегистрировать обработчик для префикса.
+
+        arg_types — типы аргументов после префикса; последний аргумент получает
+        остаток строки целиком (в нем может быть двоеточие, например время "10:00").
+        """
+        def decorator(func):
+            self.add(prefix, func, *arg_types)
+            return func
+        return decorator
+
+    def add(self, prefix, handler, *arg_types):
+        if prefix in self._routes:
+            raise ValueError(f"Маршрут {prefix!r} уже зарегистрирован")
+        self._routes[prefix] = (handler, arg_types)
+
+    def resolve(self, data):
+        """Найти обработчик и аргументы для callback_data; None, если маршрута нет"""
+        prefix, _, rest = data.partition(":")
+        route = self._routes.get(prefix)
+        if route is None:
+            return None
+        handler, arg_types = route
+        if not arg_types:
+            return handler, ()
+        parts = rest.split(":", len(arg_types) - 1)
+        if len(parts) != len(arg_types):
+            return None
+        try:
+            return handler, tuple(cast(part) for cast, part in zip(arg_types, parts))
+        except ValueError:
+            return None
+
+    async def dispatch(self, update, context):
+        """Обработчик для CallbackQueryHandler"""
+        query = update.callback_query
+        data = query.data or ""
+
+        # Служебные кнопки (заголовки календаря, пустые ячейки) — ничего не делаем
+        if data == IGNORE:
+            await query.answer()
+            return
+
+        resolved = self.resolve(data)
+        if resolved is None:
+            logger.warning(f"Неизвестный callback: {data!r}")
+            with metrics.timer("bot_handler_seconds", "button:unknown"):
+                if self.fallback is not None:
+                    await self.fallback(update, context)
+                else:
+                    await query.answer()
+            return
+
+        handler, args = resolved
+        # Метка — префикс маршрута, а не вся строка: меток не больше, чем маршрутов
+        with metrics.timer("bot_handler_seconds", "button:" + data.partition(":")[0]):
+            await handler(update, context, *args)
+
+    def __len__(self):
+        return len(self._routes)
+
+    def __contains__(self, prefix):
+        return prefix in self._routes
@@ -0,0 +1,127 @@
+# bot/sessions.py
+# Состояние сценария записи (услуга → дата → время → подтверждение) для каждого пользователя.
+# Вместо словарей PTB user_data — компактная запись со __slots__; неактивные сессии
+# истекают, изменения периодически сбрасываются в SQLite одной пачкой и
+# восстанавливаются при старте (перезапуск воркера не теряет начатую запись).
+import asyncio
+import logging
+import time
+
+import async_database as db
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL = 30 * 60
+SNAPSHOT_INTERVAL = 30
+
+
+class Session:
+    __slots__ = ("user_id", "service", "date", "time", "touched", "tenant")
+
+    def __init__(self, user_id, service=None, date=None, time=None, touched=0.0, tenant=None):
+        self.user_id = user_id
+        self.service = service
+        self.date = date
+        self.time = time
+        self.touched = touched
+        # Мастер, к которому идет запись (см. bot/tenancy.py)
+        self.tenant = tenant
+
+    def clear(self):
+        self.service = self.date = self.time = None
+
+    def as_row(self):
+        return (self.user_id, self.service, self.date, self.time, self.touched, self.tenant)
+
+
+class SessionStore:
+    def __init__(self, ttl=SESSION_TTL, clock=time.time):
+        self.ttl = ttl
+        self.clock = clock
+        self._sessions = {}
+        self._dirty = set()
+        self._removed = set()
+        self._task = None
+
+    def get(self, user_id):
+        """Сессия пользователя (создается при первом обращении); помечается измененной"""
+        session = self._sessions.get(user_id)
+        if session is None:
+            session = self._sessions[user_id] = Session(user_id)
+            self._removed.discard(user_id)
+        session.touched = self.clock()
+        self._dirty.add(user_id)
+        return session
+
+    def peek(self, user_id):
+        return self._sessions.get(user_id)
+
+    def drop(self, user_id):
+        if self._sessions.pop(user_id, None) is not None:
+            self._dirty.discard(user_id)
+            self._removed.add(user_id)
+
+    def expire(self):
+        """Удалить сессии, неактивные дольше ttl; вернуть их количество"""
+        deadline = self.clock() - self.ttl
+        expired = [user_id for user_id, s in self._sessions.items() if s.touched < deadline]
+        for user_id in expired:
+            self.drop(user_id)
+        return len(expired)
+
+    async def snapshot(self):
+        """Записать измененные и удаленные сессии одной транзакцией"""
+        if not self._dirty and not self._removed:
+            return 0
+        rows = [self._sessions[user_id].as_row() for user_id in self._dirty if user_id in self._sessions]
+        removed = list(self._removed)
+        self._dirty.clear()
+        self._removed.clear()
+        try:
+            await db.save_sessions(rows, removed)
+        except Exception:
+            # Не потерять изменения: попробуем в следующий раз
+            self._dirty.update(row[0] for row in rows)
+            self._removed.update(removed)
+            raise
+        return len(rows) + len(removed)
+
+    async def restore(self, owns=None):
+        """owns(user_id) — берет ли процесс сессию себе (при нескольких воркерах)"""
+        rows = await db.load_sessions(self.clock() - self.ttl)
+        restored = 0
+        for user_id, service, date, time_, touched, tenant in rows:
+            if owns is None or owns(user_id):
+                self._sessions[user_id] = Session(user_id, service, date, time_, touched, tenant)
+                restored += 1
+        logger.info(f"Восстановлено сессий записи: {restored}")
+        return restored
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(SNAPSHOT_INTERVAL)
+            try:
+                self.expire()
+                await self.snapshot()
+            except Exception:
+                logger.exception("Не удалось сохранить сессии")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="sessions-snapshot")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.snapshot()
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+sessions = SessionStore()
@@ -0,0 +1,185 @@
+# bot/slot_holds.py
+# Временная бронь выбранного времени в памяти (без записи в БД).
+# Пока пользователь между "select_time:" и подтверждением, время держится за ним
+# SLOT_HOLD_SECONDS секунд, и другие пользователи видят его занятым.
+# Перед записью confirm_booking берет бронь заново: за время подтверждения она могла
+# истечь, и время мог занять другой. Окончательную гарантию от двойной записи дает
+# database.book_slot; бронь лишь убирает лишние конфликты.
+# У каждого мастера свой набор броней (holds_for): одно и то же время у разных
+# мастеров не конфликтует.
+#
+# При нескольких процессах-воркерах (WORKERS > 1) пользователи разных процессов
+# должны видеть брони друг друга, поэтому брони лежат в таблице slot_holds базы
+# мастера (SharedSlotHolds). Обработчики вызывают асинхронные hold/release/filter_free
+# внизу модуля и не знают, где хранятся брони.
+import time as _time
+
+import async_database as db
+import database
+from config import SLOT_HOLD_SECONDS, WORKERS
+
+
+def _to_minutes(value):
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+class SlotHolds:
+    def __init__(self, ttl=SLOT_HOLD_SECONDS, clock=_time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        # user_id -> (date, start, end, expires); у пользователя не больше одной брони
+        self._by_user = {}
+        # date -> {user_id, ...}
+        self._by_date = {}
+        self.stats = {"held": 0, "conflicts": 0, "expired": 0}
+
+    def _drop(self, user_id):
+        hold = self._by_user.pop(user_id, None)
+        if hold is not None:
+            users = self._by_date.get(hold[0])
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self._by_date[hold[0]]
+        return hold
+
+    def _active_on(self, date):
+        now = self.clock()
+        for user_id in list(self._by_date.get(date, ())):
+            hold = self._by_user[user_id]
+            if hold[3] <= now:
+                self._drop(user_id)
+                self.stats["expired"] += 1
+            else:
+                yield user_id, hold
+
+    def _sweep(self):
+        now = self.clock()
+        for user_id, hold in list(self._by_user.items()):
+            if hold[3] <= now:
+                self._drop(user_id)
+                self.stats["expired"] += 1
+
+    def hold(self, user_id, date, time, duration):
+        """Занять время за пользователем; False, если его уже держит другой"""
+        # Брони на даты, которые больше никто не смотрит, чистим периодически
+        if self.stats["held"] % 100 == 99:
+            self._sweep()
+        start = _to_minutes(time)
+        end = start + duration
+        for other, (_, other_start, other_end, _) in self._active_on(date):
+            if other != user_id and other_start < end and start < other_end:
+                self.stats["conflicts"] += 1
+                return False
+        self._drop(user_id)
+        self._by_user[user_id] = (date, start, end, self.clock() + self.ttl)
+        self._by_date.setdefault(date, set()).add(user_id)
+        self.stats["held"] += 1
+        return True
+
+    def release(self, user_id):
+        self._drop(user_id)
+
+    def filter_free(self, date, times, duration, user_id=None):
+        """Убрать из свободных времен те, что пересекаются с чужими бронями"""
+        busy = [(start, end) for other, (_, start, end, _) in self._active_on(date) if other != user_id]
+        return _without_busy(times, duration, busy)
+
+    def __len__(self):
+        return len(self._by_user)
+
+
+def _without_busy(times, duration, busy):
+    if not busy:
+        return list(times)
+    result = []
+    for t in times:
+        start = _to_minutes(t)
+        end = start + duration
+        if all(not (b_start < end and start < b_end) for b_start, b_end in busy):
+            result.append(t)
+    return result
+
+
+class SharedSlotHolds:
+    """Те же брони, но в SQLite — общие для всех процессов-воркеров"""
+
+    def __init__(self, ttl=SLOT_HOLD_SECONDS, clock=_time.time):
+        self.ttl = ttl
+        # Настенные часы: сроки броней сравнивают разные процессы
+        self.clock = clock
+        # user_id -> expires для броней, поставленных этим процессом. Обновления
+        # пользователя всегда идут в один воркер, так что чужих здесь не бывает.
+        self._mine = {}
+        self.stats = {"held": 0, "conflicts": 0, "expired": 0}
+
+    async def hold(self, user_id, date, time, duration):
+        start = _to_minutes(time)
+        now = self.clock()
+        ok, expired = await db.hold_slot(user_id, date, start, start + duration, now, self.ttl)
+        self.stats["expired"] += expired
+        if not ok:
+            self.stats["conflicts"] += 1
+            return False
+        self._mine[user_id] = now + self.ttl
+        self.stats["held"] += 1
+        return True
+
+    async def release(self, user_id):
+        # release вызывается на каждом возврате к выбору времени — без брони в БД не ходим
+        if self._mine.pop(user_id, None) is not None:
+            await db.release_slot_hold(user_id)
+
+    async def filter_free(self, date, times, duration, user_id=None):
+        rows = await db.get_slot_holds(date, self.clock())
+        busy = [(start, end) for other, start, end in rows if other != user_id]
+        return _without_busy(times, duration, busy)
+
+    def __len__(self):
+        now = self.clock()
+        return sum(1 for expires in self._mine.values() if expires > now)
+
+
+_holds = {}
+
+
+def holds_for(tenant_id):
+    holds = _holds.get(tenant_id)
+    if holds is None:
+        holds = _holds[tenant_id] = SharedSlotHolds() if WORKERS > 1 else SlotHolds()
+    return holds
+
+
+# === Брони текущего мастера для обработчиков ===
+async def hold(user_id, date, time, duration):
+    """Занять время за пользователем; False, если его уже держит другой"""
+    holds = holds_for(database.current_tenant())
+    if WORKERS > 1:
+        return await holds.hold(user_id, date, time, duration)
+    return holds.hold(user_id, date, time, duration)
+
+
+async def release(user_id):
+    holds = holds_for(database.current_tenant())
+    if WORKERS > 1:
+        await holds.release(user_id)
+    else:
+        holds.release(user_id)
+
+
+async def filter_free(date, times, duration, user_id=None):
+    holds = holds_for(database.current_tenant())
+    if WORKERS > 1:
+        return await holds.filter_free(date, times, duration, user_id)
+    return holds.filter_free(date, times, duration, user_id)
+
+
+def get_stats():
+    """Сумма счетчиков по всем мастерам"""
+    total = {"held": 0, "conflicts": 0, "expired": 0, "active": 0}
+    for holds in _holds.values():
+        for key, value in holds.stats.items():
+            total[key] += value
+        total["active"] += len(holds)
+    return total
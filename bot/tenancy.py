@@ -0,0 +1,50 @@
+# bot/tenancy.py
+# Выбор мастера (tenant) для каждого обновления.
+# Выбранный мастер хранится в сессии записи (переживает перезапуск) и в user_data;
+# обработчик группы -1 делает его текущим для database до конца обработки обновления.
+import database
+import tenants
+from bot.sessions import sessions
+
+USER_DATA_KEY = "tenant"
+
+
+def chosen(user_id, user_data):
+    session = sessions.peek(user_id)
+    if session is not None and session.tenant:
+        return session.tenant
+    if user_data is not None:
+        return user_data.get(USER_DATA_KEY)
+    return None
+
+
+async def route_update(update, context):
+    """TypeHandler(Update) в группе -1: база мастера, выбранного пользователем"""
+    user = update.effective_user
+    if user is None:
+        return
+    tenant_id = chosen(user.id, context.user_data)
+    if not tenant_id or tenants.get(tenant_id) is None:
+        tenant_id = tenants.DEFAULT_ID
+    database.set_tenant(tenant_id)
+
+
+def choose(user_id, user_data, tenant_id):
+    """Запомнить выбор; начатый сценарий записи к другому мастеру сбрасывается"""
+    session = sessions.get(user_id)
+    if session.tenant != tenant_id:
+        session.clear()
+        session.tenant = tenant_id
+    user_data[USER_DATA_KEY] = tenant_id
+    database.set_tenant(tenant_id)
+
+
+def label(tenant_id=None):
+    """Подпись вида " — Анна (Центр)" для текстов, если мастеров несколько; иначе пусто"""
+    if not tenants.is_multi():
+        return ""
+    return f" — {tenants.title(tenant_id or database.current_tenant())}"
+
+
+def masters():
+    return [(tenant_id, tenants.title(tenant_id)) for tenant_id in tenants.all_ids()]
@@ -0,0 +1,160 @@
+# bot/update_processor.py
+# Параллельная обработка обновлений с сохранением порядка для каждого пользователя:
+# разные пользователи обслуживаются одновременно, а обновления одного
+# пользователя выполняются строго друг за другом (иначе шаги записи перемешаются).
+#
+# Здесь же защита от флуда, до обработчиков и запросов к БД:
+# - у каждого пользователя (кроме админов) корзина токенов: FLOOD_BURST нажатий
+#   подряд, дальше FLOOD_RATE в секунду; лишние обновления отбрасываются,
+#   на нажатие кнопки отвечаем answerCallbackQuery, чтобы не крутился индикатор;
+# - листание календаря (⬅️/➡️) на одном сообщении схлопывается: нажатие ждет
+#   NAV_DEBOUNCE_SECONDS, и если за это время пришло другое нажатие на том же
+#   сообщении, календарь не рисуется — промежуточные получают лишь answerCallbackQuery
+#   (NAV_DEBOUNCE_SECONDS=0 — схлопывать только ждущие в очереди, меньше нуля — выключить).
+# Обе проверки и ожидание своей очереди пользователя идут до семафора CONCURRENT_UPDATES:
+# отброшенные и ждущие обновления не занимают места обработки других пользователей.
+# Отброшенные и схлопнутые обновления считаются в метриках (bot_updates_throttled_total,
+# bot_callbacks_merged_total) и в stats.
+import asyncio
+import logging
+import time
+
+from telegram.error import TelegramError
+from telegram.ext import BaseUpdateProcessor
+
+import metrics
+from config import ADMINS, FLOOD_BURST, FLOOD_RATE, NAV_DEBOUNCE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Кнопки листания календаря, которые можно схлопывать
+NAV_PREFIXES = ("user_calendar_nav", "calendar_nav")
+# Раз в сколько обновлений убирать корзины, которые успели наполниться
+SWEEP_EVERY = 1000
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates, rate=FLOOD_RATE, burst=FLOOD_BURST,
+                 debounce=NAV_DEBOUNCE_SECONDS, exempt=ADMINS, clock=time.monotonic):
+        super().__init__(max_concurrent_updates)
+        self._locks = {}
+        self.rate = rate
+        self.burst = burst
+        self.debounce = debounce
+        self.exempt = set(exempt)
+        self.clock = clock
+        # user_id -> [токены, время последнего пополнения]
+        self._buckets = {}
+        # (user_id, message_id) -> update_id последнего нажатия на сообщении
+        self._latest = {}
+        self._seen = 0
+        self.stats = {"throttled": 0, "merged": 0}
+
+    def _allow(self, user_id):
+        """Взять токен из корзины пользователя; False — флуд"""
+        if not self.rate or user_id in self.exempt:
+            return True
+        now = self.clock()
+        self._seen += 1
+        if self._seen % SWEEP_EVERY == 0:
+            self._sweep(now)
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = [self.burst, now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def _sweep(self, now):
+        # Корзина, не тронутая дольше времени полного пополнения, равна новой
+        full_after = self.burst / self.rate
+        for user_id, (_, last) in list(self._buckets.items()):
+            if now - last >= full_after:
+                del self._buckets[user_id]
+
+    @staticmethod
+    def _message_key(update):
+        query = getattr(update, "callback_query", None)
+        if query is None or query.message is None:
+            return None
+        return query.from_user.id, query.message.message_id
+
+    @staticmethod
+    def _is_nav(update):
+        return (update.callback_query.data or "").partition(":")[0] in NAV_PREFIXES
+
+    @staticmethod
+    async def _answer(update, text=None):
+        try:
+            await update.callback_query.answer(text)
+        except TelegramError as e:
+            logger.debug(f"answerCallbackQuery не прошел: {e}")
+
+    async def process_update(self, update, coroutine):
+        user = getattr(update, "effective_user", None)
+        if user is None:
+            await super().process_update(update, coroutine)
+            return
+
+        if not self._allow(user.id):
+            coroutine.close()
+            self.stats["throttled"] += 1
+            kind = "callback" if update.callback_query is not None else "message"
+            metrics.inc("bot_updates_throttled_total", kind)
+            if update.callback_query is not None:
+                await self._answer(update, "⏳ Слишком часто, подождите немного")
+            return
+        key = self._message_key(update) if self.debounce >= 0 else None
+        if key is not None:
+            self._latest[key] = update.update_id
+            if self.debounce and self._is_nav(update):
+                # Ждем следующих нажатий, не занимая семафор и очередь пользователя
+                await asyncio.sleep(self.debounce)
+
+        # Очередь пользователя — до семафора: обновление, которое ждет предыдущее
+        # обновление того же пользователя, не занимает место обработки других
+        entry = self._locks.get(user.id)
+        if entry is None:
+            entry = self._locks[user.id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                if self._superseded(update):
+                    coroutine.close()
+                    self.stats["merged"] += 1
+                    metrics.inc("bot_callbacks_merged_total", update.callback_query.data.partition(":")[0])
+                    await self._answer(update)
+                    return
+                await super().process_update(update, coroutine)
+        finally:
+            # Убираем замок, когда обновлений этого пользователя в работе не осталось
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[user.id]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    def _superseded(self, update):
+        """Листание, после которого на том же сообщении уже нажали другую кнопку"""
+        key = self._message_key(update) if self.debounce >= 0 else None
+        if key is None:
+            return False
+        # Ключ удаляет последнее нажатие, когда доходит до обработки; если ключа
+        # уже нет, более позднее нажатие обработано раньше этого листания
+        if self._latest.get(key) == update.update_id:
+            del self._latest[key]
+            return False
+        return self._is_nav(update)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        self._locks.clear()
+        self._buckets.clear()
+        self._latest.clear()
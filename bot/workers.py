@@ -0,0 +1,173 @@
+# bot/workers.py
+# Несколько процессов-воркеров (WORKERS > 1).
+# Главный процесс (ingress) только принимает обновления — long polling или webhook,
+# как и раньше, через main.run_bot — и раздает их воркерам по effective_user.id % WORKERS.
+# Все обновления одного пользователя обрабатывает один процесс, поэтому порядок шагов,
+# сессия записи и user_data остаются согласованными. Общее для процессов лежит в SQLite
+# (WAL): записи, брони времени (bot/slot_holds.py) и версии справочников
+# (database._sync_epochs). Напоминания и архивация работают только в первом воркере.
+#
+# Обновления уходят в воркер по multiprocessing.Pipe в виде JSON. Воркеры запускаются
+# через spawn и останавливаются, когда главный процесс закрывает канал.
+import asyncio
+import json
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+
+from config import WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Номер воркера в этом процессе; None — главный процесс или работа без воркеров
+INDEX = None
+RESTART_DELAY = 1
+STOP_TIMEOUT = 30
+
+
+def worker_for(update):
+    """Номер воркера для обновления; обновления без пользователя — первому"""
+    user = update.effective_user
+    return user.id % WORKERS if user is not None else 0
+
+
+def owns(user_id):
+    """Обслуживает ли этот процесс пользователя"""
+    return INDEX is None or user_id % WORKERS == INDEX
+
+
+def is_leader():
+    """Процесс, который ведет общие фоновые задачи (напоминания, архив)"""
+    return INDEX is None or INDEX == 0
+
+
+# === Главный процесс ===
+class WorkerProcess:
+    """Процесс-воркер и поток, который пишет обновления в его канал"""
+
+    def __init__(self, index, token):
+        self.index = index
+        self.token = token
+        self.queue = queue.SimpleQueue()
+        self.process = None
+        self.conn = None
+        self._thread = None
+
+    def _spawn(self):
+        context = multiprocessing.get_context("spawn")
+        parent, child = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(self.index, self.token, child), name=f"bot-worker-{self.index}")
+        self.process.start()
+        child.close()
+        self.conn = parent
+
+    def start(self):
+        self._spawn()
+        self._thread = threading.Thread(target=self._send_loop, name=f"bot-worker-{self.index}-send", daemon=True)
+        self._thread.start()
+
+    def send(self, data):
+        self.queue.put(data)
+
+    def _send_loop(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            while True:
+                try:
+                    self.conn.send_bytes(data)
+                    break
+                except OSError:
+                    # Обновления, которые воркер успел принять, но не обработал, теряются
+                    logger.error(f"Воркер {self.index} остановился (код {self.process.exitcode}), перезапускаем")
+                    self.conn.close()
+                    self.process.join(STOP_TIMEOUT)
+                    time.sleep(RESTART_DELAY)
+                    self._spawn()
+        self.conn.close()
+
+    def stop(self):
+        """Закрыть канал и дождаться, пока воркер доработает очередь"""
+        self.queue.put(None)
+        self._thread.join(STOP_TIMEOUT)
+        self.process.join(STOP_TIMEOUT)
+        if self.process.is_alive():
+            logger.warning(f"Воркер {self.index} не остановился за {STOP_TIMEOUT} с")
+            self.process.terminate()
+
+
+def build_ingress(token):
+    """Приложение главного процесса: без обработчиков бота, только раздача обновлений"""
+    from telegram import Update
+    from telegram.ext import Application, TypeHandler
+
+    from config import BOT_API_URL
+
+    workers = [WorkerProcess(index, token) for index in range(WORKERS)]
+
+    async def forward(update, context):
+        workers[worker_for(update)].send(update.to_json().encode())
+
+    async def on_startup(application):
+        for worker in workers:
+            worker.start()
+        logger.info(f"🧩 Воркеров: {WORKERS}")
+
+    async def on_shutdown(application):
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(None, worker.stop) for worker in workers))
+
+    builder = Application.builder().token(token).post_init(on_startup).post_shutdown(on_shutdown)
+    if BOT_API_URL:
+        builder.base_url(BOT_API_URL)
+    app = builder.build()
+    app.add_handler(TypeHandler(Update, forward))
+    return app
+
+
+# === Воркер ===
+def _worker_main(index, token, conn):
+    global INDEX
+    INDEX = index
+    # Воркер останавливает главный процесс, закрывая канал; Ctrl+C и SIGTERM,
+    # которые приходят всей группе процессов, ловит только он
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    import main
+
+    asyncio.run(_serve(main.build_application(token, updater=False), conn))
+
+
+async def _serve(app, conn):
+    from telegram import Update
+
+    loop = asyncio.get_running_loop()
+    closed = asyncio.Event()
+
+    def put(data):
+        app.update_queue.put_nowait(Update.de_json(data, app.bot))
+
+    def receive():
+        # JSON разбираем в этом потоке, Update собираем в event loop (нужен app.bot)
+        try:
+            while True:
+                loop.call_soon_threadsafe(put, json.loads(conn.recv_bytes()))
+        except (EOFError, OSError):
+            loop.call_soon_threadsafe(closed.set)
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    threading.Thread(target=receive, name="bot-worker-receive", daemon=True).start()
+    logger.info(f"🧩 Воркер {INDEX} готов")
+    await closed.wait()
+    await app.stop()
+    await app.shutdown()
+    if app.post_shutdown:
+        await app.post_shutdown(app)
@@ -6,6 +6,41 @@ load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 TIMEZONE = os.getenv("TIMEZONE", "Europe/Moscow")
+DB_PATH = os.getenv("DB_PATH", "bot.db")
 ADMINS = [int(x) for x in os.getenv("ADMINS", "").split(",") if x.strip()]
+# Несколько мастеров/салонов: JSON со списком (см. tenants.py); без него — один мастер в DB_PATH
+TENANTS_FILE = os.getenv("TENANTS_FILE")
 TIME_SLOT_MINUTES = 60  # 1 час интервалы
-ENABLE_ADMIN_NOTIFICATIONS = True
\ No newline at end of file
+SLOT_HOLD_SECONDS = 300  # сколько держать выбранное время до подтверждения
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))  # через сколько дней записи уходят в архив
+REMINDER_MINUTES_BEFORE = int(os.getenv("REMINDER_MINUTES_BEFORE", "120"))  # за сколько напоминать о записи
+ENABLE_ADMIN_NOTIFICATIONS = True
+
+# Режим получения обновлений: "polling" или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", os.getenv("PORT", "8443")))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # публичный адрес, например https://example.com/telegram
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# Сколько обновлений обрабатывать параллельно
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "64"))
+# Процессов-воркеров: при WORKERS > 1 главный процесс только принимает обновления
+# и раздает их воркерам по user_id (см. bot/workers.py)
+WORKERS = int(os.getenv("WORKERS", "1"))
+# Антифлуд (bot/update_processor.py): FLOOD_BURST нажатий подряд, дальше FLOOD_RATE в секунду
+# на пользователя (FLOOD_RATE=0 — выключить); листание календаря схлопывается за NAV_DEBOUNCE_SECONDS
+# (меньше нуля — не схлопывать)
+FLOOD_RATE = float(os.getenv("FLOOD_RATE", "3"))
+FLOOD_BURST = int(os.getenv("FLOOD_BURST", "10"))
+NAV_DEBOUNCE_SECONDS = float(os.getenv("NAV_DEBOUNCE_SECONDS", "0.3"))
+# Сколько сообщений помнить, чтобы не отправлять правки без изменений (0 — выключить)
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "10000"))
+# Свой адрес Bot API (локальный сервер или заглушка для тестов), по умолчанию api.telegram.org
+BOT_API_URL = os.getenv("BOT_API_URL")
+
+# Метрики: время обработчиков, SQL и вызовов Bot API (METRICS_ENABLED=0 — выключить)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+# Эндпоинт /metrics для Prometheus; порт 0 — не поднимать
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
@@ -1,234 +1,1350 @@
 # database.py
+import bisect
+import contextlib
+import contextvars
+import csv
+import functools
+import gzip
+import json
+import logging
 import sqlite3
-from contextlib import closing
+import threading
+from datetime import date as _date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import metrics
+import tenants
+from config import DB_PATH, METRICS_ENABLED, TIME_SLOT_MINUTES, TIMEZONE, WORKERS
+
+# === Мастер (tenant) ===
+# Все функции модуля работают с базой текущего мастера. Он задается на время
+# обработки обновления (bot/tenancy.py) или блоком use_tenant(); ContextVar
+# переходит в потоки БД вместе с вызовом (см. async_database._run_in).
+_tenant = contextvars.ContextVar("tenant", default=tenants.DEFAULT_ID)
+
+
+def current_tenant():
+    return _tenant.get()
+
+
+def set_tenant(tenant_id):
+    """Сделать мастера текущим до конца задачи (обработки обновления)"""
+    if tenants.get(tenant_id) is None:
+        raise KeyError(f"Неизвестный мастер: {tenant_id!r}")
+    _tenant.set(tenant_id)
+
+
+@contextlib.contextmanager
+def use_tenant(tenant_id):
+    if tenants.get(tenant_id) is None:
+        raise KeyError(f"Неизвестный мастер: {tenant_id!r}")
+    token = _tenant.set(tenant_id)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def _db_path(tenant_id):
+    tenant = tenants.get(tenant_id)
+    return tenant.db_path if tenant is not None and tenant.db_path else DB_PATH
+
+
+# === Соединения ===
+# Каждый поток держит по одному долгоживущему соединению на мастера вместо
+# connect/close на каждый вызов. sqlite3 сам кэширует подготовленные выражения
+# в пределах соединения (cached_statements).
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_generation = 0
+
+
+def _connect(path):
+    conn = sqlite3.connect(
+        path,
+        timeout=30,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+        factory=metrics.TimedConnection if METRICS_ENABLED else sqlite3.Connection,
+    )
+    if METRICS_ENABLED:
+        metrics.instrument_connection(conn)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+def get_connection():
+    """Соединение текущего потока с базой текущего мастера (создается при первом обращении)"""
+    if getattr(_local, 'generation', None) != _generation:
+        _local.conns = {}
+        _local.data_versions = {}
+        _local.generation = _generation
+    tenant_id = _tenant.get()
+    conn = _local.conns.get(tenant_id)
+    if conn is None:
+        conn = _connect(_db_path(tenant_id))
+        with _connections_lock:
+            _connections.append(conn)
+        _local.conns[tenant_id] = conn
+    return conn
+
+
+def close_connections():
+    """Закрыть все открытые соединения (при остановке бота или смене DB_PATH)"""
+    global _generation
+    with _connections_lock:
+        _generation += 1
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _connections.clear()
+    _local.conns = {}
+    _local.data_versions = {}
+
+
+# === Кэш справочников ===
+# Услуги, мастер и рабочие часы читаются почти на каждое действие пользователя,
+# а меняются только админом — держим их в памяти и сбрасываем при записи.
+# Ключ кэша — (мастер, справочник).
+#
+# При нескольких процессах-воркерах (WORKERS > 1) справочник может изменить другой
+# процесс. Тогда invalidate_cache еще и повышает эпоху ключа в таблице cache_epochs,
+# а чтение сначала сверяет PRAGMA data_version соединения: он меняется только после
+# коммитов других соединений, и лишь в этом случае эпохи перечитываются.
+_cache = {}
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+_cache_version = 0
+_cache_keys = []
+_shared_cache = WORKERS > 1
+_epochs = {}  # мастер -> {справочник: эпоха}, как их последний раз видел процесс
+
+
+def _sync_epochs(tenant_id):
+    """Сбросить справочники, которые изменил другой процесс"""
+    global _cache_version
+    conn = get_connection()
+    data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if _local.data_versions.get(tenant_id) == data_version:
+        return
+    _local.data_versions[tenant_id] = data_version
+    epochs = dict(conn.execute("SELECT key, epoch FROM cache_epochs").fetchall())
+    with _cache_lock:
+        known = _epochs.get(tenant_id, {})
+        changed = {key for key in set(known) | set(epochs) if known.get(key) != epochs.get(key)}
+        if changed:
+            _cache_version += 1
+            for cache_key in list(_cache):
+                if cache_key[0] == tenant_id and cache_key[1] in changed:
+                    del _cache[cache_key]
+        _epochs[tenant_id] = epochs
+
+
+def _cached(key):
+    _cache_keys.append(key)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper():
+            if _shared_cache:
+                _sync_epochs(_tenant.get())
+            cache_key = (_tenant.get(), key)
+            with _cache_lock:
+                if cache_key in _cache:
+                    _cache_stats["hits"] += 1
+                    return _cache[cache_key]
+                _cache_stats["misses"] += 1
+                version = _cache_version
+            value = func()
+            with _cache_lock:
+                # Не сохраняем значение, если за время чтения кэш успели сбросить
+                if version == _cache_version:
+                    _cache[cache_key] = value
+            return value
+        return wrapper
+    return decorator
+
+
+def invalidate_cache(*keys):
+    """Сбросить справочники текущего мастера (все, если ключи не указаны)"""
+    global _cache_version
+    tenant_id = _tenant.get()
+    with _cache_lock:
+        _cache_version += 1
+        for cache_key in list(_cache):
+            if cache_key[0] == tenant_id and (not keys or cache_key[1] in keys):
+                del _cache[cache_key]
+    if _shared_cache:
+        conn = get_connection()
+        with conn:
+            conn.executemany("""
+                INSERT INTO cache_epochs (key, epoch) VALUES (?, 1)
+                ON CONFLICT (key) DO UPDATE SET epoch = epoch + 1
+            """, [(key,) for key in keys or _cache_keys])
+
+
+def get_cache_stats():
+    """Счетчики попаданий и промахов кэша справочников"""
+    with _cache_lock:
+        return dict(_cache_stats, size=len(_cache))
+
+
+# === Схема и миграции ===
+# Версия схемы хранится в PRAGMA user_version. Миграции применяются по порядку,
+# каждая в своей транзакции вместе с повышением версии, поэтому на актуальной
+# базе init_db ограничивается одним чтением версии — без DDL и начальных данных.
+# Базы, созданные до версионирования (user_version = 0), проходят все шаги:
+# они написаны через IF NOT EXISTS / OR IGNORE и безопасны для существующих таблиц.
+# Новую таблицу, индекс или колонку добавляйте новой функцией в конец MIGRATIONS.
+
+def _migration_base_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS barber (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            name TEXT DEFAULT 'Дмитрий',
+            phone TEXT DEFAULT '+79991234567'
+        )
+    """)
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS services (
+            name TEXT PRIMARY KEY,
+            price INTEGER,
+            duration INTEGER
+        )
+    """)
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            service TEXT,
+            date TEXT,
+            time TEXT,
+            price INTEGER
+        )
+    """)
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS closed_slots (
+            date TEXT,
+            time TEXT,
+            PRIMARY KEY (date, time)
+        )
+    """)
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS working_hours (
+            start_time TEXT DEFAULT '09:00',
+            end_time TEXT DEFAULT '19:00'
+        )
+    """)
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            full_name TEXT,
+            phone TEXT
+        )
+    """)
+    
+    # Инициализируем мастера, если его нет
+    conn.execute("INSERT OR IGNORE INTO barber (id, name, phone) VALUES (1, 'Мастер', '+7 951 765 9053')")
+    
+    # Инициализируем рабочее время (у таблицы нет ключа — вставляем, только если она пуста)
+    if conn.execute("SELECT 1 FROM working_hours LIMIT 1").fetchone() is None:
+        conn.execute("INSERT INTO working_hours (start_time, end_time) VALUES ('09:00', '19:00')")
+    
+    # Добавляем начальные услуги если их нет
+    initial_services = [
+        ('Мужская стрижка', 899, 60),
+        ('Детская стрижка', 799, 60),
+        ('Стрижка бороды', 699, 60)
+    ]
+    
+    for name, price, duration in initial_services:
+        conn.execute("INSERT OR IGNORE INTO services (name, price, duration) VALUES (?, ?, ?)",
+                    (name, price, duration))
+
+def _migration_booking_indexes(conn):
+    # Индексы для поиска свободного времени и записей пользователя
+    # Одно время начала — одна запись. В старой базе могут быть дубли,
+    # тогда остаемся на обычном индексе (проверка перекрытия в book_slot все равно работает)
+    conn.execute("SAVEPOINT unique_index")
+    try:
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_bookings_date_time ON bookings (date, time)")
+        conn.execute("DROP INDEX IF EXISTS idx_bookings_date_time")
+        conn.execute("RELEASE unique_index")
+    except sqlite3.IntegrityError:
+        conn.execute("ROLLBACK TO unique_index")
+        conn.execute("RELEASE unique_index")
+        logging.getLogger(__name__).warning("В bookings есть записи на одно время, уникальный индекс не создан")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_date_time ON bookings (date, time)")
+    # (user_id, date, time) заодно обслуживает постраничный список записей пользователя
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_user_date ON bookings (user_id, date, time)")
+    conn.execute("DROP INDEX IF EXISTS idx_bookings_user")
+
+def _migration_bookings_archive(conn):
+    # Архив прошедших записей (холодные данные, см. archive_bookings_batch)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bookings_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            service TEXT,
+            date TEXT,
+            time TEXT,
+            price INTEGER,
+            archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_user_date ON bookings_archive (user_id, date, time)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_date_time ON bookings_archive (date, time)")
+
+def _migration_sessions(conn):
+    # Незавершенные сценарии записи (снимки из bot/sessions.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            user_id INTEGER PRIMARY KEY,
+            service TEXT,
+            date TEXT,
+            time TEXT,
+            touched REAL
+        )
+    """)
+
+def _migration_reminders_sent(conn):
+    # Отправленные напоминания (чтобы не дублировать после перезапуска)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reminders_sent (
+            booking_id INTEGER PRIMARY KEY,
+            sent_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _migration_dedupe_working_hours(conn):
+    # До версионирования каждый запуск добавлял строку в working_hours — оставляем одну
+    conn.execute("DELETE FROM working_hours WHERE rowid <> (SELECT MIN(rowid) FROM working_hours)")
+
+def _migration_session_tenant(conn):
+    # Мастер, к которому идет начатая запись (несколько мастеров, см. tenants.py).
+    # У ADD COLUMN нет IF NOT EXISTS — проверяем колонку сами
+    if "tenant" not in {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}:
+        conn.execute("ALTER TABLE sessions ADD COLUMN tenant TEXT")
+
+def _migration_slot_holds(conn):
+    # Брони времени, общие для процессов-воркеров (WORKERS > 1, см. bot/slot_holds.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS slot_holds (
+            user_id INTEGER PRIMARY KEY,
+            date TEXT,
+            start_min INTEGER,
+            end_min INTEGER,
+            expires REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_slot_holds_date ON slot_holds (date)")
+
+def _migration_cache_epochs(conn):
+    # Версии справочников для сброса кэша в других процессах (см. _sync_epochs)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cache_epochs (
+            key TEXT PRIMARY KEY,
+            epoch INTEGER
+        )
+    """)
+
+def _migration_booking_stats(conn):
+    # Сводки для отчетов админа (см. раздел "Сводки по записям")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS booking_stats (
+            date TEXT,
+            service TEXT,
+            bookings INTEGER,
+            revenue INTEGER,
+            minutes INTEGER,
+            PRIMARY KEY (date, service)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS booking_hour_stats (
+            date TEXT,
+            hour INTEGER,
+            bookings INTEGER,
+            PRIMARY KEY (date, hour)
+        )
+    """)
+    _fill_booking_stats(conn)
+
+def _migration_closed_intervals(conn):
+    # Закрытое время интервалами минут вместо строки на каждый час (см. "Закрытые слоты").
+    # Старая строка с time = NULL — весь день, со временем — один слот текущего шага
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS closed_intervals (
+            date TEXT,
+            start_min INTEGER,
+            end_min INTEGER,
+            PRIMARY KEY (date, start_min)
+        )
+    """)
+    by_date = {}
+    for date, time in conn.execute("SELECT date, time FROM closed_slots"):
+        if time is None:
+            start, end = 0, DAY_MINUTES
+        else:
+            start = _to_minutes(time)
+            end = start + TIME_SLOT_MINUTES
+        by_date.setdefault(date, []).append((start, end))
+    conn.executemany(
+        "INSERT OR REPLACE INTO closed_intervals (date, start_min, end_min) VALUES (?, ?, ?)",
+        [(date, start, end) for date, intervals in by_date.items() for start, end in _merge(intervals)])
+    conn.execute("DROP TABLE closed_slots")
+
+MIGRATIONS = [
+    _migration_base_tables,
+    _migration_booking_indexes,
+    _migration_bookings_archive,
+    _migration_sessions,
+    _migration_reminders_sent,
+    _migration_dedupe_working_hours,
+    _migration_session_tenant,
+    _migration_slot_holds,
+    _migration_cache_epochs,
+    _migration_booking_stats,
+    _migration_closed_intervals,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def init_all_tenants():
+    """init_db для базы каждого мастера"""
+    for tenant_id in tenants.all_ids():
+        with use_tenant(tenant_id):
+            init_db()
+
+def get_schema_version():
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
 
 def init_db():
-    with closing(sqlite3.connect('bot.db')) as conn:
-        # Создаем все таблицы сначала
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS barber (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
-                name TEXT DEFAULT 'Дмитрий',
-                phone TEXT DEFAULT '+79991234567'
-            )
-        """)
-        
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS services (
-                name TEXT PRIMARY KEY,
-                price INTEGER,
-                duration INTEGER
-            )
-        """)
-        
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS bookings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                service TEXT,
-                date TEXT,
-                time TEXT,
-                price INTEGER
-            )
-        """)
-        
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS closed_slots (
-                date TEXT,
-                time TEXT,
-                PRIMARY KEY (date, time)
-            )
-        """)
-        
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS working_hours (
-                start_time TEXT DEFAULT '09:00',
-                end_time TEXT DEFAULT '19:00'
-            )
-        """)
-        
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                full_name TEXT,
-                phone TEXT
-            )
-        """)
-        
-        conn.commit()  # Коммитим создание таблиц
-        
-        # Инициализируем мастера, если его нет
-        conn.execute("INSERT OR IGNORE INTO barber (id, name, phone) VALUES (1, 'Мастер', '+7 951 765 9053')")
-        
-        # Инициализируем рабочее время
-        conn.execute("INSERT OR IGNORE INTO working_hours (start_time, end_time) VALUES ('09:00', '19:00')")
-        
-        # Добавляем начальные услуги если их нет
-        initial_services = [
-            ('Мужская стрижка', 899, 60),
-            ('Детская стрижка', 799, 60),
-            ('Стрижка бороды', 699, 60)
-        ]
-        
-        for name, price, duration in initial_services:
-            conn.execute("INSERT OR IGNORE INTO services (name, price, duration) VALUES (?, ?, ?)",
-                        (name, price, duration))
-        
-        conn.commit()
+    """Довести схему до SCHEMA_VERSION; на актуальной базе — одно чтение PRAGMA"""
+    conn = get_connection()
+    applied = []
+    while get_schema_version() < SCHEMA_VERSION:
+        # BEGIN IMMEDIATE: второй процесс, стартующий одновременно, дождется
+        # блокировки и перечитает версию, а не применит ту же миграцию повторно
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = get_schema_version()
+            if version >= SCHEMA_VERSION:
+                conn.rollback()
+                break
+            migration = MIGRATIONS[version]
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied.append(migration.__name__)
+    if applied:
+        logging.getLogger(__name__).info(f"Схема БД обновлена до версии {SCHEMA_VERSION}: {', '.join(applied)}")
+    
+    invalidate_cache()
 
 # === Мастер ===
+@_cached('barber')
 def get_barber():
-    with closing(sqlite3.connect('bot.db')) as conn:
-        return conn.execute("SELECT name, phone FROM barber WHERE id = 1").fetchone()
+    conn = get_connection()
+    return conn.execute("SELECT name, phone FROM barber WHERE id = 1").fetchone()
 
 def update_barber(name, phone):
-    with closing(sqlite3.connect('bot.db')) as conn:
+    conn = get_connection()
+    with conn:
         conn.execute("UPDATE barber SET name = ?, phone = ? WHERE id = 1", (name, phone))
-        conn.commit()
+    invalidate_cache('barber', 'barber_name')
 
+@_cached('barber_name')
 def get_barber_name():
-    with closing(sqlite3.connect('bot.db')) as conn:
-        row = conn.execute("SELECT name FROM barber WHERE id = 1").fetchone()
-        return row[0] if row else 'Мастер'
+    conn = get_connection()
+    row = conn.execute("SELECT name FROM barber WHERE id = 1").fetchone()
+    return row[0] if row else 'Мастер'
 
 
 # === Услуги ===
 def add_service(name, price, duration):
-    with closing(sqlite3.connect('bot.db')) as conn:
+    conn = get_connection()
+    with conn:
         conn.execute("INSERT OR REPLACE INTO services (name, price, duration) VALUES (?, ?, ?)",
                      (name, price, duration))
-        conn.commit()
+    invalidate_cache('services')
 
 def delete_service(name):
-    with closing(sqlite3.connect('bot.db')) as conn:
+    conn = get_connection()
+    with conn:
         conn.execute("DELETE FROM services WHERE name = ?", (name,))
-        conn.commit()
+    invalidate_cache('services')
 
+@_cached('services')
 def get_services():
-    with closing(sqlite3.connect('bot.db')) as conn:
-        return conn.execute("SELECT name, price, duration FROM services ORDER BY name").fetchall()
+    conn = get_connection()
+    return conn.execute("SELECT name, price, duration FROM services ORDER BY name").fetchall()
 
 
 # === Записи ===
+# Подписчики на изменения записей (планировщик напоминаний и т.п.).
+# Вызываются в потоке, который выполнил запись.
+_booking_listeners = []
+
+def add_booking_listener(callback):
+    """callback(event, payload): ("added", строка записи) или ("deleted", id записи)"""
+    _booking_listeners.append(callback)
+
+def remove_booking_listener(callback):
+    if callback in _booking_listeners:
+        _booking_listeners.remove(callback)
+
+def _notify_booking_listeners(event, payload):
+    for callback in list(_booking_listeners):
+        try:
+            callback(event, payload)
+        except Exception:
+            logging.getLogger(__name__).exception("Ошибка в подписчике на записи")
+
 def add_booking(user_id, service, date, time, price):
-    with closing(sqlite3.connect('bot.db')) as conn:
-        conn.execute("""
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute("""
             INSERT INTO bookings (user_id, service, date, time, price)
             VALUES (?, ?, ?, ?, ?)
         """, (user_id, service, date, time, price))
-        conn.commit()
+        _count_booking(conn, service, date, time, price)
+    booking_id = cursor.lastrowid
+    _notify_booking_listeners("added", (booking_id, user_id, service, date, time, price))
+    return booking_id
 
-def get_user_bookings(user_id):
-    with closing(sqlite3.connect('bot.db')) as conn:
+def get_user_bookings(user_id, include_archive=False):
+    conn = get_connection()
+    if include_archive:
         return conn.execute("""
+            SELECT id, service, date, time, price FROM bookings WHERE user_id = ?
+            UNION ALL
+            SELECT id, service, date, time, price FROM bookings_archive WHERE user_id = ?
+            ORDER BY date DESC, time DESC
+        """, (user_id, user_id)).fetchall()
+    return conn.execute("""
+        SELECT id, service, date, time, price
+        FROM bookings
+        WHERE user_id = ?
+        ORDER BY date DESC, time DESC
+    """, (user_id,)).fetchall()
+
+def get_all_bookings(include_archive=False):
+    conn = get_connection()
+    if include_archive:
+        return conn.execute("""
+            SELECT id, user_id, service, date, time, price FROM bookings
+            UNION ALL
+            SELECT id, user_id, service, date, time, price FROM bookings_archive
+            ORDER BY date DESC, time DESC
+        """).fetchall()
+    return conn.execute("""
+        SELECT id, user_id, service, date, time, price
+        FROM bookings
+        ORDER BY date DESC, time DESC
+    """).fetchall()
+
+# Постраничные варианты (keyset): курсор — ключ последней показанной строки,
+# поэтому стоимость страницы не зависит от размера истории.
+# Возвращают (строки, курсор следующей страницы или None).
+def _page(rows, limit, key):
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, key(rows[-1])
+    return rows, None
+
+def get_user_bookings_page(user_id, after=None, limit=10):
+    """after=(date, time, id) последней записи предыдущей страницы"""
+    conn = get_connection()
+    if after is None:
+        rows = conn.execute("""
             SELECT id, service, date, time, price
             FROM bookings
             WHERE user_id = ?
-            ORDER BY date DESC, time DESC
-        """, (user_id,)).fetchall()
+            ORDER BY date DESC, time DESC, id DESC
+            LIMIT ?
+        """, (user_id, limit + 1)).fetchall()
+    else:
+        rows = conn.execute("""
+            SELECT id, service, date, time, price
+            FROM bookings
+            WHERE user_id = ? AND (date, time, id) < (?, ?, ?)
+            ORDER BY date DESC, time DESC, id DESC
+            LIMIT ?
+        """, (user_id, *after, limit + 1)).fetchall()
+    return _page(rows, limit, lambda row: (row[2], row[3], row[0]))
 
-def get_all_bookings():
-    with closing(sqlite3.connect('bot.db')) as conn:
-        return conn.execute("""
+def get_all_bookings_page(after=None, limit=10):
+    """after=(date, time, id) последней записи предыдущей страницы"""
+    conn = get_connection()
+    if after is None:
+        rows = conn.execute("""
             SELECT id, user_id, service, date, time, price
             FROM bookings
-            ORDER BY date DESC, time DESC
-        """).fetchall()
+            ORDER BY date DESC, time DESC, id DESC
+            LIMIT ?
+        """, (limit + 1,)).fetchall()
+    else:
+        rows = conn.execute("""
+            SELECT id, user_id, service, date, time, price
+            FROM bookings
+            WHERE (date, time, id) < (?, ?, ?)
+            ORDER BY date DESC, time DESC, id DESC
+            LIMIT ?
+        """, (*after, limit + 1)).fetchall()
+    return _page(rows, limit, lambda row: (row[3], row[4], row[0]))
 
 def get_booking_by_id_and_user(booking_id, user_id):
-    with closing(sqlite3.connect('bot.db')) as conn:
-        row = conn.execute("""
-            SELECT service, date, time, price
-            FROM bookings
-            WHERE id = ? AND user_id = ?
-        """, (booking_id, user_id)).fetchone()
-        return row
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT service, date, time, price
+        FROM bookings
+        WHERE id = ? AND user_id = ?
+    """, (booking_id, user_id)).fetchone()
+    return row
 
-def get_booking_by_id(booking_id):
-    with closing(sqlite3.connect('bot.db')) as conn:
+def get_booking_by_id(booking_id, include_archive=False):
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT id, user_id, service, date, time, price
+        FROM bookings WHERE id = ?
+    """, (booking_id,)).fetchone()
+    if row is None and include_archive:
         row = conn.execute("""
             SELECT id, user_id, service, date, time, price
-            FROM bookings WHERE id = ?
+            FROM bookings_archive WHERE id = ?
         """, (booking_id,)).fetchone()
-        return row
+    return row
+
+def get_bookings_by_date(date):
+    conn = get_connection()
+    return conn.execute("""
+        SELECT id, user_id, service, date, time, price
+        FROM bookings
+        WHERE date = ?
+        ORDER BY time
+    """, (date,)).fetchall()
 
 def delete_booking(booking_id):
-    with closing(sqlite3.connect('bot.db')) as conn:
+    conn = get_connection()
+    with conn:
+        # Сводка читает удаляемую строку, поэтому вычитаем до DELETE (в той же транзакции)
+        _uncount_booking(conn, booking_id)
         conn.execute("DELETE FROM bookings WHERE id = ?", (booking_id,))
+    _notify_booking_listeners("deleted", booking_id)
+
+
+# === Архив ===
+ARCHIVE_BATCH_SIZE = 500
+
+def archive_bookings_batch(before_date, limit=ARCHIVE_BATCH_SIZE):
+    """Перенести до limit записей с датой раньше before_date в bookings_archive.
+
+    Одна короткая транзакция на пачку, чтобы не держать блокировку записи
+    и не мешать живым запросам. Возвращает число перенесенных записей.
+    """
+    conn = get_connection()
+    with conn:
+        ids = [row[0] for row in conn.execute(
+            "SELECT id FROM bookings WHERE date < ? ORDER BY date, time LIMIT ?", (before_date, limit))]
+        if not ids:
+            return 0
+        marks = ",".join("?" * len(ids))
+        conn.execute(f"""
+            INSERT OR REPLACE INTO bookings_archive (id, user_id, service, date, time, price)
+            SELECT id, user_id, service, date, time, price FROM bookings WHERE id IN ({marks})
+        """, ids)
+        conn.execute(f"DELETE FROM bookings WHERE id IN ({marks})", ids)
+        conn.execute(f"DELETE FROM reminders_sent WHERE booking_id IN ({marks})", ids)
+    return len(ids)
+
+def archive_old_bookings(before_date, limit=ARCHIVE_BATCH_SIZE):
+    """Перенести все записи раньше before_date (пачками); для скриптов"""
+    total = 0
+    while True:
+        moved = archive_bookings_batch(before_date, limit)
+        total += moved
+        if moved < limit:
+            return total
+
+
+# === Выгрузка записей ===
+# Записи с именем и телефоном клиента и длительностью услуги — для таблиц.
+# Строки идут с курсора пачками и сразу пишутся в файл, поэтому память
+# не зависит от размера истории (в отличие от get_all_bookings).
+EXPORT_COLUMNS = ("id", "date", "time", "service", "price", "duration", "user_id", "full_name", "phone")
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_BATCH_SIZE = 1000
+
+_EXPORT_SELECT = """
+    SELECT b.id, b.date, b.time, b.service, b.price, s.duration, b.user_id, u.full_name, u.phone
+    FROM {table} b
+    LEFT JOIN users u ON u.user_id = b.user_id
+    LEFT JOIN services s ON s.name = b.service
+    WHERE b.date BETWEEN :from AND :to
+"""
+
+def iter_bookings_export(date_from=None, date_to=None, include_archive=False, batch=EXPORT_BATCH_SIZE):
+    """Строки EXPORT_COLUMNS за период включительно, по дате и времени.
+
+    Генератор на курсоре соединения текущего потока: обходить в том же потоке.
+    """
+    sql = _EXPORT_SELECT.format(table="bookings")
+    if include_archive:
+        sql += " UNION ALL " + _EXPORT_SELECT.format(table="bookings_archive")
+    params = {"from": date_from or "0000-00-00", "to": date_to or "9999-12-31"}
+    cursor = get_connection().execute(sql + " ORDER BY 2, 3, 1", params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cursor.close()
+
+def export_bookings(path, fmt="csv", compress=False, date_from=None, date_to=None, include_archive=False):
+    """Записать выгрузку в файл path (CSV или JSON Lines, при compress — gzip).
+
+    Возвращает число записей.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt!r}")
+    rows = iter_bookings_export(date_from, date_to, include_archive)
+    count = 0
+    opener = gzip.open if compress else open
+    with opener(path, "wt", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            # BOM — чтобы Excel открыл кириллицу без выбора кодировки
+            f.write("\ufeff")
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_COLUMNS)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False))
+                f.write("\n")
+                count += 1
+    return count
+
+
+# === Сводки по записям ===
+# booking_stats (дата, услуга → записей, выручка, минут) и booking_hour_stats
+# (дата, час начала → записей) меняются в той же транзакции, что и bookings, поэтому
+# отчет читает только сводки и стоит одинаково при любой длине истории.
+# Архивация записи сводку не меняет: отчеты включают и архив.
+# Минуты считаются по длительности услуги на момент записи; если длительность
+# потом изменили, точные цифры вернет rebuild_booking_stats (команда /rebuild_stats).
+_DURATION_SQL = f"COALESCE((SELECT duration FROM services WHERE name = :service), {TIME_SLOT_MINUTES})"
+
+def _count_booking(conn, service, date, time, price):
+    params = {"service": service, "date": date, "hour": int(time[:2]), "price": price or 0}
+    conn.execute(f"""
+        INSERT INTO booking_stats (date, service, bookings, revenue, minutes)
+        SELECT :date, :service, 1, :price, {_DURATION_SQL} WHERE true
+        ON CONFLICT (date, service) DO UPDATE SET
+            bookings = bookings + 1,
+            revenue = revenue + excluded.revenue,
+            minutes = minutes + excluded.minutes
+    """, params)
+    conn.execute("""
+        INSERT INTO booking_hour_stats (date, hour, bookings) VALUES (:date, :hour, 1)
+        ON CONFLICT (date, hour) DO UPDATE SET bookings = bookings + 1
+    """, params)
+
+def _uncount_booking(conn, booking_id):
+    row = conn.execute("SELECT service, date, time, price FROM bookings WHERE id = ?", (booking_id,)).fetchone()
+    if row is None:
+        return
+    service, date, time, price = row
+    params = {"service": service, "date": date, "hour": int(time[:2]), "price": price or 0}
+    conn.execute(f"""
+        UPDATE booking_stats
+        SET bookings = bookings - 1, revenue = revenue - :price, minutes = minutes - {_DURATION_SQL}
+        WHERE date = :date AND service = :service
+    """, params)
+    conn.execute("""
+        UPDATE booking_hour_stats SET bookings = bookings - 1
+        WHERE date = :date AND hour = :hour
+    """, params)
+
+def _fill_booking_stats(conn):
+    conn.execute("DELETE FROM booking_stats")
+    conn.execute("DELETE FROM booking_hour_stats")
+    history = """
+        SELECT service, date, time, price FROM bookings
+        UNION ALL
+        SELECT service, date, time, price FROM bookings_archive
+    """
+    conn.execute(f"""
+        INSERT INTO booking_stats (date, service, bookings, revenue, minutes)
+        SELECT b.date, b.service, COUNT(*), SUM(COALESCE(b.price, 0)),
+               SUM(COALESCE(s.duration, {TIME_SLOT_MINUTES}))
+        FROM ({history}) b
+        LEFT JOIN services s ON s.name = b.service
+        GROUP BY b.date, b.service
+    """)
+    conn.execute(f"""
+        INSERT INTO booking_hour_stats (date, hour, bookings)
+        SELECT date, CAST(substr(time, 1, 2) AS INTEGER), COUNT(*)
+        FROM ({history})
+        GROUP BY 1, 2
+    """)
+
+def rebuild_booking_stats():
+    """Пересчитать сводки с нуля по bookings и bookings_archive; вернуть число строк сводки"""
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _fill_booking_stats(conn)
         conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return conn.execute("SELECT COUNT(*) FROM booking_stats").fetchone()[0]
+
+def get_service_summary(date_from, date_to):
+    """[(услуга, записей, выручка, минут)] за период включительно, по убыванию выручки"""
+    conn = get_connection()
+    return conn.execute("""
+        SELECT service, SUM(bookings), SUM(revenue), SUM(minutes)
+        FROM booking_stats
+        WHERE date BETWEEN ? AND ?
+        GROUP BY service
+        HAVING SUM(bookings) > 0
+        ORDER BY SUM(revenue) DESC, service
+    """, (date_from, date_to)).fetchall()
+
+def get_hour_summary(date_from, date_to, limit=3):
+    """[(час, записей)] самых загруженных часов за период"""
+    conn = get_connection()
+    return conn.execute("""
+        SELECT hour, SUM(bookings) FROM booking_hour_stats
+        WHERE date BETWEEN ? AND ?
+        GROUP BY hour
+        HAVING SUM(bookings) > 0
+        ORDER BY SUM(bookings) DESC, hour
+        LIMIT ?
+    """, (date_from, date_to, limit)).fetchall()
 
 
 # === Время работы ===
 def set_working_hours(start, end):
-    with closing(sqlite3.connect('bot.db')) as conn:
+    conn = get_connection()
+    with conn:
         conn.execute("UPDATE working_hours SET start_time = ?, end_time = ?", (start, end))
-        conn.commit()
+    invalidate_cache('working_hours')
 
+@_cached('working_hours')
 def get_working_hours():
-    with closing(sqlite3.connect('bot.db')) as conn:
-        row = conn.execute("SELECT start_time, end_time FROM working_hours").fetchone()
-        if row:
-            return row[0], row[1]
-        else:
-            return "09:00", "19:00"
+    conn = get_connection()
+    row = conn.execute("SELECT start_time, end_time FROM working_hours").fetchone()
+    if row:
+        return row[0], row[1]
+    else:
+        return "09:00", "19:00"
 
 
 # === Закрытые слоты ===
-def close_day(date):
-    with closing(sqlite3.connect('bot.db')) as conn:
-        conn.execute("INSERT OR IGNORE INTO closed_slots (date, time) VALUES (?, NULL)", (date,))
+# Закрытое время хранится интервалами минут (date, start_min, end_min): весь день —
+# (0, DAY_MINUTES), одиночный слот — [время, время + TIME_SLOT_MINUTES). Интервалы
+# одной даты не пересекаются: при закрытии пересекающиеся и смежные сливаются,
+# при открытии режутся. Поэтому проверка не зависит от шага слотов и длительности
+# услуги — достаточно пересечения [начало, конец) с интервалами даты.
+#
+# Проверки на чтение (is_closed, свободное время, календарь) идут по индексу в памяти:
+# {дата: отсортированный список интервалов}. Индекс — справочник кэша
+# 'closed_intervals', поэтому после записи он перечитывается, в том числе в других
+# процессах (см. _sync_epochs). book_slot проверяет закрытия в SQL внутри своей транзакции.
+# Хранятся закрытия любых дней, в том числе понедельников (массовое закрытие их не
+# исключает), и меню открытия (admin_keyboards.open_slots_menu) показывает их все.
+DAY_MINUTES = 24 * 60
+
+def _merge(intervals):
+    """Слить пересекающиеся и смежные интервалы; результат отсортирован"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def _subtract(intervals, removed):
+    """Части интервалов, не покрытые removed (оба списка отсортированы и слиты)"""
+    result = []
+    for start, end in intervals:
+        for r_start, r_end in removed:
+            if r_end <= start or r_start >= end:
+                continue
+            if r_start > start:
+                result.append((start, r_start))
+            start = max(start, r_end)
+            if start >= end:
+                break
+        if start < end:
+            result.append((start, end))
+    return result
+
+def _overlaps(intervals, start, end):
+    """Пересекает ли [start, end) один из отсортированных непересекающихся интервалов"""
+    # Последний интервал, начавшийся до end; более ранние заканчиваются еще раньше
+    i = bisect.bisect_left(intervals, (end,))
+    return i > 0 and intervals[i - 1][1] > start
+
+@_cached('closed_intervals')
+def _closed_index():
+    conn = get_connection()
+    index = {}
+    for date, start, end in conn.execute(
+            "SELECT date, start_min, end_min FROM closed_intervals ORDER BY date, start_min"):
+        index.setdefault(date, []).append((start, end))
+    return index
+
+def get_closed_intervals(date):
+    """[(start_min, end_min)] закрытого времени даты из индекса"""
+    return _closed_index().get(date, [])
+
+def _closed_grid(intervals, open_m, close_m):
+    """Начала слотов рабочего дня, которые пересекаются с интервалами (закрытым или занятым временем)"""
+    return [m for m in range(open_m, close_m, TIME_SLOT_MINUTES)
+            if _overlaps(intervals, m, m + TIME_SLOT_MINUTES)]
+
+def _change_intervals(items, close):
+    """Закрыть или открыть интервалы (date, start, end) одной транзакцией.
+
+    Возвращает то, что действительно изменилось: при закрытии — части, которые
+    были открыты, при открытии — части, которые были закрыты. Обратная операция
+    над этим списком возвращает базу в исходное состояние.
+    """
+    by_date = {}
+    for date, start, end in items:
+        if start < end:
+            by_date.setdefault(date, []).append((start, end))
+    if not by_date:
+        return []
+    conn = get_connection()
+    changed = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        existing = {}
+        for date, start, end in conn.execute("""
+            SELECT date, start_min, end_min FROM closed_intervals
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date, start_min
+        """, (min(by_date), max(by_date))):
+            existing.setdefault(date, []).append((start, end))
+        for date, pieces in sorted(by_date.items()):
+            old = existing.get(date, [])
+            pieces = _merge(pieces)
+            if close:
+                new = _merge(old + pieces)
+                changed += [(date, start, end) for start, end in _subtract(new, old)]
+            else:
+                new = _subtract(old, pieces)
+                changed += [(date, start, end) for start, end in _subtract(old, new)]
+            if new == old:
+                continue
+            conn.executemany("DELETE FROM closed_intervals WHERE date = ? AND start_min = ?",
+                             [(date, start) for start, end in old if (start, end) not in new])
+            conn.executemany("INSERT INTO closed_intervals (date, start_min, end_min) VALUES (?, ?, ?)",
+                             [(date, start, end) for start, end in new if (start, end) not in old])
         conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    if changed:
+        invalidate_cache('closed_intervals')
+    return changed
+
+def close_intervals(items):
+    """Закрыть интервалы (date, start_min, end_min); вернуть части, которые были открыты"""
+    return _change_intervals(items, close=True)
+
+def open_intervals(items):
+    """Открыть интервалы (date, start_min, end_min); вернуть части, которые были закрыты"""
+    return _change_intervals(items, close=False)
+
+def close_day(date):
+    close_intervals([(date, 0, DAY_MINUTES)])
 
 def close_time(date, time):
-    with closing(sqlite3.connect('bot.db')) as conn:
-        conn.execute("INSERT OR IGNORE INTO closed_slots (date, time) VALUES (?, ?)", (date, time))
-        conn.commit()
+    start = _to_minutes(time)
+    close_intervals([(date, start, start + TIME_SLOT_MINUTES)])
 
 def open_day(date):
-    with closing(sqlite3.connect('bot.db')) as conn:
-        conn.execute("DELETE FROM closed_slots WHERE date = ? AND time IS NULL", (date,))
-        conn.commit()
+    """Открыть день целиком, вместе с закрытыми часами"""
+    open_intervals([(date, 0, DAY_MINUTES)])
 
 def open_time(date, time):
-    with closing(sqlite3.connect('bot.db')) as conn:
-        conn.execute("DELETE FROM closed_slots WHERE date = ? AND time = ?", (date, time))
-        conn.commit()
+    start = _to_minutes(time)
+    open_intervals([(date, start, start + TIME_SLOT_MINUTES)])
 
 def is_closed(date, time):
-    with closing(sqlite3.connect('bot.db')) as conn:
-        # Закрыт ли весь день?
-        row = conn.execute("SELECT 1 FROM closed_slots WHERE date = ? AND time IS NULL", (date,)).fetchone()
-        if row:
-            return True
-        # Закрыто ли конкретное время?
-        if time:
-            row = conn.execute("SELECT 1 FROM closed_slots WHERE date = ? AND time = ?", (date, time)).fetchone()
-            return bool(row)
+    """Закрыт ли слот time; без времени — закрыт ли весь рабочий день"""
+    intervals = get_closed_intervals(date)
+    if not intervals:
         return False
+    if time:
+        start = _to_minutes(time)
+        return _overlaps(intervals, start, start + TIME_SLOT_MINUTES)
+    open_m, close_m = (_to_minutes(value) for value in get_working_hours())
+    return len(_closed_grid(intervals, open_m, close_m)) == len(range(open_m, close_m, TIME_SLOT_MINUTES))
+
+# --- Массовые операции ---
+# Закрытие/открытие периода — одна транзакция _change_intervals. Отмена операции
+# применяет обратное действие ровно к тем частям, которые она изменила.
+def _range_dates(date_from, date_to, weekdays=None):
+    """Даты периода включительно; weekdays — номера дней недели (0 — понедельник)"""
+    first, last = _date.fromisoformat(date_from), _date.fromisoformat(date_to)
+    if last < first:
+        first, last = last, first
+    days = (first + timedelta(days=i) for i in range((last - first).days + 1))
+    return [d.isoformat() for d in days if weekdays is None or d.weekday() in weekdays]
+
+def _range_intervals(date_from, date_to, weekdays=None, start=None, end=None):
+    """Интервалы периода: без времени — дни целиком"""
+    first, last = (0, DAY_MINUTES) if start is None else (_to_minutes(start), _to_minutes(end))
+    return [(d, first, last) for d in _range_dates(date_from, date_to, weekdays)]
+
+def close_range(date_from, date_to, weekdays=None, start=None, end=None):
+    """Закрыть дни периода (или время start–end в эти дни); вернуть закрытые части"""
+    return close_intervals(_range_intervals(date_from, date_to, weekdays, start, end))
 
-def get_closed_slots():
-    with closing(sqlite3.connect('bot.db')) as conn:
-        return conn.execute("SELECT date, time FROM closed_slots ORDER BY date, time").fetchall()
+def open_range(date_from, date_to, weekdays=None, start=None, end=None):
+    """Открыть период; без времени дни открываются целиком, вместе с закрытыми часами"""
+    return open_intervals(_range_intervals(date_from, date_to, weekdays, start, end))
+
+def get_closed_intervals_page(after=None, limit=10):
+    """[(date, start_min, end_min)]; after=(date, start_min) последнего интервала предыдущей страницы"""
+    conn = get_connection()
+    if after is None:
+        rows = conn.execute("""
+            SELECT date, start_min, end_min FROM closed_intervals
+            ORDER BY date, start_min
+            LIMIT ?
+        """, (limit + 1,)).fetchall()
+    else:
+        rows = conn.execute("""
+            SELECT date, start_min, end_min FROM closed_intervals
+            WHERE (date, start_min) > (?, ?)
+            ORDER BY date, start_min
+            LIMIT ?
+        """, (*after, limit + 1)).fetchall()
+    return _page(rows, limit, lambda row: (row[0], row[1]))
+
+
+# === Свободное время ===
+# Минуты от начала суток для строки 'HH:MM'
+_MINUTES = "(CAST(substr({0}, 1, 2) AS INTEGER) * 60 + CAST(substr({0}, 4, 2) AS INTEGER))"
+
+# Без закрытий: get_free_times проверяет их по индексу в памяти. book_slot берет
+# _BOOK_CHECK_SQL, где закрытия входят в занятость, чтобы проверка шла в его транзакции.
+_FREE_TIMES_SQL = """
+    WITH RECURSIVE
+        params (day, step, need) AS (
+            SELECT :date, :step, COALESCE((SELECT duration FROM services WHERE name = :service), :step)
+        ),
+        hours (open_m, close_m) AS (
+            SELECT {minutes_start}, {minutes_end}
+            FROM working_hours LIMIT 1
+        ),
+        slots (m) AS (
+            SELECT open_m FROM hours
+            UNION ALL
+            SELECT m + step FROM slots, params, hours WHERE m + step < close_m
+        ),
+        busy (b_start, b_end) AS (
+            SELECT {minutes_booking},
+                   {minutes_booking} + COALESCE(s.duration, params.step)
+            FROM bookings b
+            JOIN params ON b.date = params.day
+            LEFT JOIN services s ON s.name = b.service
+            {closed}
+        )
+    SELECT printf('%02d:%02d', m / 60, m % 60), m, m + need
+    FROM slots, params, hours
+    WHERE m + need <= close_m
+      AND m > :min_start
+      AND NOT EXISTS (SELECT 1 FROM busy WHERE b_start < m + need AND m < b_end)
+    ORDER BY m
+"""
+_FREE_TIMES_PARTS = {
+    "minutes_start": _MINUTES.format('start_time'),
+    "minutes_end": _MINUTES.format('end_time'),
+    "minutes_booking": _MINUTES.format('b.time'),
+}
+_BOOK_CHECK_SQL = _FREE_TIMES_SQL.format(**_FREE_TIMES_PARTS, closed="""
+            UNION ALL
+            SELECT c.start_min, c.end_min
+            FROM closed_intervals c
+            JOIN params ON c.date = params.day""")
+_FREE_TIMES_SQL = _FREE_TIMES_SQL.format(**_FREE_TIMES_PARTS, closed="")
+
+_tz = ZoneInfo(TIMEZONE)
+
+def _min_start(date, now=None):
+    """Начала не позже этой минуты уже прошли: сегодня — текущая минута,
+    прошедшая дата — весь день, будущая — ничего (-1)"""
+    now = now or datetime.now(_tz).replace(tzinfo=None)
+    today = now.date().isoformat()
+    if date > today:
+        return -1
+    if date < today:
+        return DAY_MINUTES
+    return now.hour * 60 + now.minute
+
+def get_free_times(date, service, now=None):
+    """Все свободные времена начала услуги на дату одним запросом.
+
+    Учитывает рабочие часы, закрытые дни и часы, существующие записи,
+    длительность услуги и текущее время (now — в часовом поясе салона,
+    по умолчанию сейчас). Результат можно сразу передать в time_menu.
+    """
+    closed = get_closed_intervals(date)
+    if closed and closed[0] == (0, DAY_MINUTES):
+        return []
+    conn = get_connection()
+    rows = conn.execute(_FREE_TIMES_SQL, {
+        "date": date,
+        "service": service,
+        "step": TIME_SLOT_MINUTES,
+        "min_start": _min_start(date, now),
+    }).fetchall()
+    return [time for time, start, end in rows if not _overlaps(closed, start, end)]
+
+
+# === Бронирование ===
+def book_slot(user_id, service, date, time, price, now=None):
+    """Атомарно записать клиента, если время свободно.
+
+    Проверка и вставка выполняются в одной транзакции BEGIN IMMEDIATE, поэтому
+    два одновременных запроса на одно время не пройдут оба. Возвращает id записи
+    или None, если время уже занято, закрыто или прошло.
+    """
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        free = conn.execute(_BOOK_CHECK_SQL, {
+            "date": date,
+            "service": service,
+            "step": TIME_SLOT_MINUTES,
+            "min_start": _min_start(date, now),
+        }).fetchall()
+        if all(row[0] != time for row in free):
+            conn.rollback()
+            return None
+        cursor = conn.execute("""
+            INSERT INTO bookings (user_id, service, date, time, price)
+            VALUES (?, ?, ?, ?, ?)
+        """, (user_id, service, date, time, price))
+        _count_booking(conn, service, date, time, price)
+        conn.commit()
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        return None
+    except BaseException:
+        conn.rollback()
+        raise
+    booking_id = cursor.lastrowid
+    _notify_booking_listeners("added", (booking_id, user_id, service, date, time, price))
+    return booking_id
+
+
+# === Занятость по месяцу ===
+DAY_OPEN = "open"
+DAY_PARTIAL = "partial"
+DAY_FULL = "full"
+DAY_CLOSED = "closed"
+
+_MONTH_SQL = f"""
+    SELECT CAST(substr(b.date, 9, 2) AS INTEGER),
+           {_MINUTES.format('b.time')},
+           {_MINUTES.format('b.time')} + COALESCE(s.duration, :step)
+    FROM bookings b
+    LEFT JOIN services s ON s.name = b.service
+    WHERE b.date BETWEEN :first AND :last
+"""
+
+def get_month_availability(year, month):
+    """Статус каждого дня месяца: записи — одним запросом за месяц,
+    закрытое время — по индексу в памяти.
+
+    Записи и закрытия сливаются в общие интервалы и проецируются на сетку
+    слотов рабочего дня: запись внутри закрытого времени не считается дважды.
+    Возвращает {день: статус} только для дней с записями или закрытиями;
+    отсутствующие дни свободны (DAY_OPEN).
+    """
+    open_m, close_m = (_to_minutes(value) for value in get_working_hours())
+    capacity = len(range(open_m, close_m, TIME_SLOT_MINUTES))
+
+    conn = get_connection()
+    booked = {}
+    for day, start, end in conn.execute(_MONTH_SQL, {
+        "first": f"{year}-{month:02d}-01",
+        "last": f"{year}-{month:02d}-31",
+        "step": TIME_SLOT_MINUTES,
+    }):
+        booked.setdefault(day, []).append((start, end))
+
+    index = _closed_index()
+    result = {}
+    for day in range(1, 32):
+        intervals = index.get(f"{year}-{month:02d}-{day:02d}")
+        closed = len(_closed_grid(intervals, open_m, close_m)) if intervals else 0
+        busy = booked.get(day)
+        if busy:
+            slots = len(_closed_grid(_merge(busy + (intervals or [])), open_m, close_m))
+        else:
+            slots = closed
+        if intervals and closed >= capacity:
+            result[day] = DAY_CLOSED
+        elif slots and slots >= capacity:
+            result[day] = DAY_FULL
+        elif slots:
+            result[day] = DAY_PARTIAL
+    return result
+
+
+def _to_minutes(value):
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+# === Напоминания ===
+def get_upcoming_bookings(after, until, limit=500):
+    """Страница записей строго после ключа after=(date, time, id) и не позже until=(date, time),
+    без уже отправленных напоминаний. Идет по индексу (date, time)."""
+    conn = get_connection()
+    return conn.execute("""
+        SELECT b.id, b.user_id, b.service, b.date, b.time
+        FROM bookings b
+        WHERE (b.date, b.time, b.id) > (?, ?, ?)
+          AND (b.date, b.time) <= (?, ?)
+          AND NOT EXISTS (SELECT 1 FROM reminders_sent r WHERE r.booking_id = b.id)
+        ORDER BY b.date, b.time, b.id
+        LIMIT ?
+    """, (*after, *until, limit)).fetchall()
+
+def mark_reminder_sent(booking_id):
+    """Отметить напоминание отправленным; False, если оно уже было отмечено или запись отменена"""
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute("""
+            INSERT OR IGNORE INTO reminders_sent (booking_id)
+            SELECT ? WHERE EXISTS (SELECT 1 FROM bookings WHERE id = ?)
+        """, (booking_id, booking_id))
+    return cursor.rowcount == 1
+
+def get_last_booking_id():
+    conn = get_connection()
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM bookings").fetchone()[0]
+
+def get_bookings_after_id(last_id, limit=500):
+    """Записи с id больше last_id по возрастанию id (новые записи из других процессов)"""
+    conn = get_connection()
+    return conn.execute("""
+        SELECT id, user_id, service, date, time
+        FROM bookings
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+    """, (last_id, limit)).fetchall()
+
+
+# === Общие брони времени (WORKERS > 1) ===
+def hold_slot(user_id, date, start, end, now, ttl):
+    """Занять минуты [start, end) даты за пользователем; False, если их держит другой.
+
+    Возвращает пару (удалось ли, сколько просроченных броней убрано).
+    """
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        expired = conn.execute("DELETE FROM slot_holds WHERE expires <= ?", (now,)).rowcount
+        conflict = conn.execute("""
+            SELECT 1 FROM slot_holds
+            WHERE date = ? AND user_id <> ? AND start_min < ? AND ? < end_min
+            LIMIT 1
+        """, (date, user_id, end, start)).fetchone()
+        if conflict is None:
+            conn.execute("""
+                INSERT OR REPLACE INTO slot_holds (user_id, date, start_min, end_min, expires)
+                VALUES (?, ?, ?, ?, ?)
+            """, (user_id, date, start, end, now + ttl))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return conflict is None, expired
+
+def release_slot_hold(user_id):
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM slot_holds WHERE user_id = ?", (user_id,))
+
+def get_slot_holds(date, now):
+    """[(user_id, start_min, end_min)] действующих броней на дату"""
+    conn = get_connection()
+    return conn.execute("""
+        SELECT user_id, start_min, end_min FROM slot_holds
+        WHERE date = ? AND expires > ?
+    """, (date, now)).fetchall()
+
+
+# === Сессии записи ===
+def save_sessions(rows, removed_ids):
+    """Сохранить пачку сессий (user_id, service, date, time, touched, tenant) и удалить завершенные"""
+    conn = get_connection()
+    with conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO sessions (user_id, service, date, time, touched, tenant)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.executemany("DELETE FROM sessions WHERE user_id = ?", [(user_id,) for user_id in removed_ids])
+
+def load_sessions(touched_after):
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM sessions WHERE touched < ?", (touched_after,))
+    return conn.execute("SELECT user_id, service, date, time, touched, tenant FROM sessions").fetchall()
 
 
 # === Пользователи ===
 def save_user(user_id, full_name, phone):
-    with closing(sqlite3.connect('bot.db')) as conn:
+    conn = get_connection()
+    with conn:
         conn.execute("""
             INSERT OR REPLACE INTO users (user_id, full_name, phone)
             VALUES (?, ?, ?)
         """, (user_id, full_name, phone))
-        conn.commit()
 
 def get_user(user_id):
-    with closing(sqlite3.connect('bot.db')) as conn:
-        row = conn.execute("SELECT full_name, phone FROM users WHERE user_id = ?", (user_id,)).fetchone()
-        return row
+    conn = get_connection()
+    row = conn.execute("SELECT full_name, phone FROM users WHERE user_id = ?", (user_id,)).fetchone()
+    return row
 
 def get_user_by_id(user_id):
     """Получить пользователя по ID"""
-    with closing(sqlite3.connect('bot.db')) as conn:
-        row = conn.execute("SELECT full_name, phone FROM users WHERE user_id = ?", (user_id,)).fetchone()
-        if row:
-            return row
-        return None
\ No newline at end of file
+    conn = get_connection()
+    row = conn.execute("SELECT full_name, phone FROM users WHERE user_id = ?", (user_id,)).fetchone()
+    if row:
+        return row
+    return None
\ No newline at end of file
@@ -1,8 +1,12 @@
 # main.py - РАБОЧАЯ ВЕРСИЯ
 import os
 import sys
+import time
 import logging
 
+# Отсчет времени холодного старта (см. лог "Старт занял" и benchmarks/bench_startup.py)
+_started = time.perf_counter()
+
 # Добавим заглушку для imghdr если его нет
 try:
     import imghdr
@@ -21,6 +25,104 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def run_bot(app):
+    """Запуск приема обновлений: long polling или встроенный webhook-сервер"""
+    from config import BOT_MODE, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET
+    
+    allowed_updates = ["message", "callback_query"]
+    
+    if BOT_MODE == "webhook":
+        logger.info(f"🌐 Webhook: {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}")
+        if not WEBHOOK_SECRET:
+            logger.warning("⚠️ WEBHOOK_SECRET не задан, запросы не проверяются")
+        # Очередь обновлений при перезапуске не сбрасываем — Telegram дошлет их на webhook
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=allowed_updates,
+            drop_pending_updates=False,
+        )
+    else:
+        app.run_polling(
+            drop_pending_updates=True,
+            allowed_updates=allowed_updates
+        )
+
+def build_application(token, updater=True):
+    """Приложение с фоновыми задачами и обработчиками (без запуска приема обновлений).
+
+    updater=False — для процесса-воркера, которому обновления передает главный процесс.
+    """
+    from telegram import Update
+    from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, TypeHandler, filters
+    
+    import async_database
+    from bot import maintenance, monitoring, notifications, reminders, tenancy, workers
+    from bot.sessions import sessions
+    from bot.update_processor import PerUserUpdateProcessor
+    from config import (
+        ADMINS, BOT_API_URL, CONCURRENT_UPDATES, ENABLE_ADMIN_NOTIFICATIONS,
+        METRICS_ENABLED, METRICS_HOST, METRICS_PORT,
+    )
+    
+    async def on_startup(application):
+        await sessions.restore(workers.owns)
+        sessions.start()
+        if ENABLE_ADMIN_NOTIFICATIONS and ADMINS:
+            notifications.setup_notifier(application.bot, ADMINS)
+        # Общие задачи — в одном процессе, даже если воркеров несколько
+        if workers.is_leader():
+            maintenance.start()
+            reminders.setup_reminders(application.bot)
+        if METRICS_ENABLED and METRICS_PORT:
+            # Каждому воркеру свой порт: METRICS_PORT + номер
+            await monitoring.start_server(METRICS_HOST, METRICS_PORT + (workers.INDEX or 0))
+        logger.info(f"⏱ Старт занял {time.perf_counter() - _started:.2f} с")
+    
+    async def on_shutdown(application):
+        await monitoring.stop_server()
+        await reminders.stop_reminders()
+        if notifications.notifier is not None:
+            await notifications.notifier.stop()
+        await maintenance.stop()
+        await sessions.stop()
+        await async_database.shutdown()
+    
+    builder = Application.builder().token(token).post_init(on_startup).post_shutdown(on_shutdown)
+    builder.concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+    if METRICS_ENABLED:
+        builder.request(monitoring.TimedHTTPXRequest())
+    if BOT_API_URL:
+        builder.base_url(BOT_API_URL)
+    if not updater:
+        builder.updater(None)
+    app = builder.build()
+    
+    # Обработчики импортируем ПОСЛЕ создания приложения
+    from bot.handlers import (
+        start, admin_command, stats_command, rebuild_stats_command, contact_handler, button_handler,
+        text_handler, set_application,
+    )
+    
+    # Передаем приложение для уведомлений
+    set_application(app)
+    
+    # Время кнопок меряет router по префиксу callback_data, остальных — обертка
+    timed = monitoring.timed_handler
+    # Группа -1 выполняется первой: выбираем базу мастера для всего обновления
+    app.add_handler(TypeHandler(Update, tenancy.route_update), group=-1)
+    app.add_handler(CommandHandler("start", timed("start", start)))
+    app.add_handler(CommandHandler("admin", timed("admin_command", admin_command)))
+    app.add_handler(CommandHandler("stats", timed("stats_command", stats_command)))
+    app.add_handler(CommandHandler("rebuild_stats", timed("rebuild_stats_command", rebuild_stats_command)))
+    app.add_handler(MessageHandler(filters.CONTACT, timed("contact_handler", contact_handler)))
+    app.add_handler(MessageHandler(filters.TEXT & filters.ChatType.PRIVATE, timed("text_handler", text_handler)))
+    app.add_handler(CallbackQueryHandler(button_handler))
+    return app
+
 def main():
     """Основная функция запуска"""
     try:
@@ -37,6 +139,13 @@ def main():
             if not BOT_TOKEN:
                 logger.error("❌ BOT_TOKEN не установлен!")
                 return
+            
+            from config import BOT_MODE, WEBHOOK_URL
+            if BOT_MODE == "webhook" and not WEBHOOK_URL:
+                # Без него PTB зарегистрирует в Telegram адрес вида https://0.0.0.0:8443/...,
+                # и обновления молча перестанут приходить
+                logger.error("❌ BOT_MODE=webhook, но WEBHOOK_URL не установлен!")
+                return
                 
         except ImportError as e:
             logger.error(f"❌ Ошибка загрузки config.py: {e}")
@@ -44,41 +153,23 @@ def main():
         
         # 2. Инициализация базы данных
         try:
-            from database import init_db
-            init_db()
+            from database import init_all_tenants
+            init_all_tenants()
             logger.info("✅ База данных инициализирована")
         except Exception as e:
             logger.error(f"❌ Ошибка базы данных: {e}")
             return
         
-        # 3. Создание приложения (версия 20.7)
+        # 3. Создание приложения и обработчиков (версия 20.7)
         try:
-            from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters
-            
-            app = Application.builder().token(BOT_TOKEN).build()
-            logger.info("✅ Приложение бота создано")
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка создания приложения: {e}")
-            return
-        
-        # 4. Импорт и добавление обработчиков
-        try:
-            # Импортируем обработчики ПОСЛЕ создания приложения
-            from bot.handlers import start, admin_command, contact_handler, button_handler, text_handler, set_application
-            
-            # Передаем приложение для уведомлений
-            set_application(app)
-            
-            # Добавление обработчиков
-            app.add_handler(CommandHandler("start", start))
-            app.add_handler(CommandHandler("admin", admin_command))
-            app.add_handler(MessageHandler(filters.CONTACT, contact_handler))
-            app.add_handler(MessageHandler(filters.TEXT & filters.ChatType.PRIVATE, text_handler))
-            app.add_handler(CallbackQueryHandler(button_handler))
-            
-            logger.info("✅ Обработчики добавлены")
-            
+            from config import WORKERS
+            if WORKERS > 1:
+                # Главный процесс только раздает обновления воркерам (bot/workers.py)
+                from bot.workers import build_ingress
+                app = build_ingress(BOT_TOKEN)
+            else:
+                app = build_application(BOT_TOKEN)
+            logger.info("✅ Приложение бота создано, обработчики добавлены")
         except ImportError as e:
             logger.error(f"❌ Ошибка импорта обработчиков: {e}")
             logger.error("Проверьте файлы в папке bot/:")
@@ -87,16 +178,16 @@ def main():
             logger.error("3. admin_keyboards.py")
             logger.error("4. user_keyboards.py")
             return
+        except Exception as e:
+            logger.error(f"❌ Ошибка создания приложения: {e}")
+            return
         
-        # 5. Запуск бота
+        # 4. Запуск бота
         logger.info("=" * 60)
         logger.info("🤖 БОТ ЗАПУЩЕН И ГОТОВ К РАБОТЕ!")
         logger.info("=" * 60)
         
-        app.run_polling(
-            drop_pending_updates=True,
-            allowed_updates=["message", "callback_query"]
-        )
+        run_bot(app)
         
     except Exception as e:
         logger.error(f"💥 КРИТИЧЕСКАЯ ОШИБКА: {e}", exc_info=True)
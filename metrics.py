@@ -0,0 +1,210 @@
+# metrics.py
+# Встроенные метрики: гистограммы времени обработчиков, SQL-запросов и вызовов
+# Bot API. Хранятся в памяти процесса, отдаются в текстовом формате Prometheus
+# (bot/monitoring.py) и кратко — админской командой /stats.
+#
+# Наблюдения приходят и из event loop, и из потоков БД, поэтому реестр под замком.
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from config import METRICS_ENABLED
+
+# Границы корзин в секундах (как у клиентских библиотек Prometheus, плюс мелкие для SQL)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Раз в сколько инструкций виртуальной машины sqlite вызывается progress handler
+SQL_PROGRESS_STEPS = 1000
+
+HELP = {
+    "bot_handler_seconds": "Время обработки обновления по обработчику",
+    "bot_sql_seconds": "Время выполнения SQL-выражения (execute)",
+    "bot_api_seconds": "Время вызова метода Telegram Bot API",
+    "bot_sql_statements_total": "Выполненные SQL-выражения по типу, включая неявные BEGIN/COMMIT",
+    "bot_sql_vm_steps_total": "Работа sqlite в инструкциях VM (с точностью до SQL_PROGRESS_STEPS)",
+    "bot_updates_throttled_total": "Обновления, отброшенные антифлудом",
+    "bot_callbacks_merged_total": "Нажатия листания, схлопнутые в более позднее",
+    "bot_edits_saved_total": "Правки сообщений: пропущенные (skip) и только клавиатуры (markup)",
+}
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(BUCKETS) and value > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Оценка квантиля по корзинам (линейно внутри корзины)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                low = BUCKETS[i - 1] if i > 0 else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return low + (high - low) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+_lock = threading.Lock()
+_histograms = {}  # (name, label) -> Histogram
+_counters = {}  # (name, label) -> число
+_LABEL_KEYS = {
+    "bot_handler_seconds": "handler",
+    "bot_sql_seconds": "statement",
+    "bot_api_seconds": "method",
+    "bot_sql_statements_total": "kind",
+    "bot_sql_vm_steps_total": "statement",
+    "bot_updates_throttled_total": "kind",
+    "bot_callbacks_merged_total": "callback",
+    "bot_edits_saved_total": "action",
+}
+
+
+def observe(name, label, seconds):
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        histogram = _histograms.get((name, label))
+        if histogram is None:
+            histogram = _histograms[(name, label)] = Histogram()
+        histogram.observe(seconds)
+
+
+def inc(name, label, value=1):
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _counters[(name, label)] = _counters.get((name, label), 0) + value
+
+
+@contextmanager
+def timer(name, label):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, label, time.perf_counter() - start)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def snapshot(name):
+    """[(label, count, sum, p50, p95, p99)] для одной метрики, по убыванию суммарного времени"""
+    with _lock:
+        rows = [
+            (label, h.count, h.sum, h.quantile(0.5), h.quantile(0.95), h.quantile(0.99))
+            for (metric, label), h in _histograms.items() if metric == name
+        ]
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows
+
+
+def counters(name):
+    with _lock:
+        return {label: value for (metric, label), value in _counters.items() if metric == name}
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def render_prometheus():
+    """Все метрики в текстовом формате Prometheus 0.0.4"""
+    with _lock:
+        histograms = sorted(_histograms.items())
+        counter_items = sorted(_counters.items())
+    lines = []
+    current = None
+    for (name, label), h in histograms:
+        if name != current:
+            current = name
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+        key = f'{_LABEL_KEYS.get(name, "label")}="{_escape(label)}"'
+        cumulative = 0
+        for bound, n in zip(BUCKETS, h.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{key},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{key},le="+Inf"}} {h.count}')
+        lines.append(f"{name}_sum{{{key}}} {h.sum:.6f}")
+        lines.append(f"{name}_count{{{key}}} {h.count}")
+    for (name, label), value in counter_items:
+        if name != current:
+            current = name
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f'{name}{{{_LABEL_KEYS.get(name, "label")}="{_escape(label)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+# === SQL ===
+# Время выражений меряет соединение-наследник (в execute виден исходный текст с "?",
+# а не подставленные значения — меток столько же, сколько выражений в database.py).
+# trace callback считает все выражения, включая неявные BEGIN/COMMIT, а
+# progress handler — работу sqlite, в том числе при чтении строк после execute.
+_statement_labels = {}
+_current = threading.local()
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_label(sql):
+    label = _statement_labels.get(sql)
+    if label is None:
+        label = _WHITESPACE.sub(" ", sql).strip()
+        if len(label) > 120:
+            label = label[:117] + "..."
+        _statement_labels[sql] = label
+    return label
+
+
+class TimedConnection(sqlite3.Connection):
+    def execute(self, sql, *args):
+        label = _current.statement = statement_label(sql)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            observe("bot_sql_seconds", label, time.perf_counter() - start)
+
+    def executemany(self, sql, *args):
+        label = _current.statement = statement_label(sql)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            observe("bot_sql_seconds", label, time.perf_counter() - start)
+
+
+def _trace(sql):
+    inc("bot_sql_statements_total", sql.lstrip().split(None, 1)[0].upper() if sql.strip() else "OTHER")
+
+
+def _progress():
+    inc("bot_sql_vm_steps_total", getattr(_current, "statement", "other"), SQL_PROGRESS_STEPS)
+    return 0
+
+
+def instrument_connection(conn):
+    conn.set_trace_callback(_trace)
+    conn.set_progress_handler(_progress, SQL_PROGRESS_STEPS)
+    return conn
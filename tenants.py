@@ -0,0 +1,67 @@
+# tenants.py
+# Мастера и салоны. Каждый мастер — отдельный арендатор (tenant) со своим файлом
+# SQLite: свои услуги, график, закрытые слоты и записи, свое соединение, кэш
+# справочников и поток-писатель. Запись в одном салоне не ждет блокировок другого.
+#
+# Список задается JSON-файлом TENANTS_FILE:
+#     [{"id": "center-anna", "shop": "Центр", "master": "Анна", "db": "data/center-anna.db"},
+#      {"id": "center-ivan", "shop": "Центр", "master": "Иван", "db": "data/center-ivan.db"}]
+# Без файла бот работает как раньше: один мастер в DB_PATH.
+import json
+import os
+from collections import namedtuple
+
+from config import TENANTS_FILE
+
+Tenant = namedtuple("Tenant", "id shop master db_path")
+
+DEFAULT_ID = "default"
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    result = {}
+    for item in items:
+        tenant_id = str(item["id"])
+        # id попадает в callback_data, где ":" — разделитель аргументов
+        if not tenant_id or ":" in tenant_id or len(tenant_id) > 32:
+            raise ValueError(f"Некорректный id мастера: {tenant_id!r}")
+        if tenant_id in result:
+            raise ValueError(f"Мастер {tenant_id!r} указан дважды")
+        db_path = item.get("db") or f"{tenant_id}.db"
+        if not os.path.isabs(db_path):
+            db_path = os.path.join(base, db_path)
+        result[tenant_id] = Tenant(tenant_id, item.get("shop", ""), item.get("master", tenant_id), db_path)
+    if not result:
+        raise ValueError(f"В {path} нет ни одного мастера")
+    return result
+
+
+if TENANTS_FILE:
+    TENANTS = _load(TENANTS_FILE)
+    DEFAULT_ID = next(iter(TENANTS))
+else:
+    # db_path None — берется database.DB_PATH
+    TENANTS = {DEFAULT_ID: Tenant(DEFAULT_ID, "", "", None)}
+
+
+def get(tenant_id):
+    return TENANTS.get(tenant_id)
+
+
+def all_ids():
+    return list(TENANTS)
+
+
+def is_multi():
+    return len(TENANTS) > 1
+
+
+def title(tenant_id):
+    """Подпись мастера для меню и уведомлений: "Анна (Центр)" """
+    tenant = TENANTS.get(tenant_id)
+    if tenant is None:
+        return tenant_id
+    return f"{tenant.master} ({tenant.shop})" if tenant.shop else tenant.master
@@ -0,0 +1,165 @@
+# tools/fake_bot_api.py
+# Локальная заглушка Telegram Bot API для проверки бота без настоящего Telegram.
+# Бот подключается к ней через BOT_API_URL=http://127.0.0.1:8081/bot
+# Используется и нагрузочным тестом benchmarks/load_test.py.
+#
+# Запуск: python tools/fake_bot_api.py [порт]
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Barber", "username": "fake_barber_bot"}
+
+
+class _Server(ThreadingHTTPServer):
+    # По умолчанию очередь accept — 5 соединений; при WORKERS > 1 процессы открывают
+    # десятки соединений разом, лишние сбрасываются, и ответы бота теряются с ReadError
+    request_queue_size = 1024
+
+
+class FakeBotAPI:
+    """Отвечает на методы Bot API правдоподобными результатами и считает вызовы"""
+
+    def __init__(self, host="127.0.0.1", port=8081):
+        self.calls = Counter()
+        # Ответы по адресатам: id нажатия -> answerCallbackQuery, чат -> sendMessage/sendDocument
+        self.answered = Counter()
+        self.sent_to = Counter()
+        self.first_call = {}  # метод -> time.time() первого вызова
+        self.updates = []
+        self._lock = threading.Lock()
+        self._has_updates = threading.Condition(self._lock)
+        self._message_id = 0
+        self._server = _Server((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def push_update(self, update):
+        """Положить обновление в очередь для getUpdates"""
+        self.push_updates([update])
+
+    def push_updates(self, updates):
+        with self._lock:
+            self.updates.extend(updates)
+            self._has_updates.notify_all()
+
+    def pending(self):
+        """Сколько обновлений бот еще не забрал"""
+        with self._lock:
+            return len(self.updates)
+
+    def _message(self, params):
+        with self._lock:
+            self._message_id += 1
+            message_id = self._message_id
+        chat_id = int(params.get("chat_id") or 0)
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+
+    def handle(self, method, params):
+        with self._lock:
+            self.calls[method] += 1
+            self.first_call.setdefault(method, time.time())
+            if method == "answerCallbackQuery":
+                self.answered[str(params.get("callback_query_id"))] += 1
+            elif method in ("sendMessage", "sendDocument") and params.get("chat_id"):
+                self.sent_to[int(params["chat_id"])] += 1
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            # Long polling, как у настоящего API: ждем обновлений до timeout секунд
+            offset = int(params.get("offset") or 0)
+            limit = int(params.get("limit") or 100)
+            timeout = min(float(params.get("timeout") or 0), 10)
+            with self._has_updates:
+                self.updates = [u for u in self.updates if u["update_id"] >= offset]
+                if not self.updates and timeout:
+                    self._has_updates.wait(timeout)
+                    self.updates = [u for u in self.updates if u["update_id"] >= offset]
+                return self.updates[:limit]
+        if method in ("sendMessage", "sendDocument"):
+            return self._message(params)
+        if method in ("editMessageText", "editMessageReplyMarkup"):
+            if "message_id" in params:
+                message = self._message(params)
+                message["message_id"] = int(params["message_id"])
+                return message
+            return True
+        return True
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive: клиент бота держит соединения открытыми, как с настоящим API
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                method = self.path.rstrip("/").rsplit("/", 1)[-1]
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                params = _parse_params(self.headers.get("Content-Type", ""), body)
+                payload = json.dumps({"ok": True, "result": api.handle(method, params)}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Бот остановился, не дождавшись ответа на long polling
+                    self.close_connection = True
+
+            do_GET = do_POST
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def _parse_params(content_type, body):
+    if not body:
+        return {}
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        return dict(parse_qsl(body.decode()))
+    # multipart (отправка файлов) — содержимое не разбираем
+    return {}
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    api = FakeBotAPI(port=port).start()
+    print(f"Fake Bot API: {api.base_url}")
+    try:
+        while True:
+            time.sleep(5)
+            print(dict(api.calls))
+    except KeyboardInterrupt:
+        api.stop()
@@ -0,0 +1,48 @@
+# tools/replay_updates.py
+# Отправка записанных обновлений (JSON по одному на строку) на локальный webhook бота.
+#
+# Запуск: python tools/replay_updates.py updates.jsonl [http://127.0.0.1:8443/telegram]
+# Секрет берется из WEBHOOK_SECRET.
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def post_update(url, update, secret=None):
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = secret
+    request = urllib.request.Request(url, data=json.dumps(update).encode(), headers=headers, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python tools/replay_updates.py updates.jsonl [url]")
+        sys.exit(1)
+    path = sys.argv[1]
+    port = os.getenv("WEBHOOK_PORT", "8443")
+    url = sys.argv[2] if len(sys.argv) > 2 else f"http://127.0.0.1:{port}/{os.getenv('WEBHOOK_PATH', 'telegram')}"
+    secret = os.getenv("WEBHOOK_SECRET")
+
+    statuses = {}
+    start = time.perf_counter()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                status = post_update(url, json.loads(line), secret)
+                statuses[status] = statuses.get(status, 0) + 1
+    elapsed = time.perf_counter() - start
+    total = sum(statuses.values())
+    print(f"отправлено {total} обновлений за {elapsed:.2f} с, ответы: {statuses}")
+
+
+if __name__ == "__main__":
+    main()